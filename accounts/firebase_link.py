@@ -0,0 +1,48 @@
+from typing import Optional
+
+from core.firebase_models import FirebaseUser
+from .models import UserProfile
+
+FIREBASE_USER_SESSION_KEY = 'firebase_user_id'
+
+
+def link_firebase_user(request, user) -> Optional[str]:
+    """
+    Resolve the Firebase user for a Django user and remember its id.
+
+    The id is stored on the UserProfile, so the email lookup (and lazy
+    creation) happens once per account, and cached in the session so
+    authenticated requests resolve it without touching the database.
+    """
+    try:
+        profile, _ = UserProfile.objects.get_or_create(user=user)
+        firebase_user_id = profile.firebase_user_id
+        if not firebase_user_id:
+            firebase_user = FirebaseUser.get_by_email(user.email)
+            if not firebase_user:
+                # Only the id is needed now; the document can land in the background
+                firebase_user = FirebaseUser.create_user(
+                    username=user.username,
+                    email=user.email,
+                    first_name=user.first_name,
+                    last_name=user.last_name,
+                    defer=True
+                )
+            firebase_user_id = firebase_user.id
+            profile.firebase_user_id = firebase_user_id
+            profile.save(update_fields=['firebase_user_id'])
+        request.session[FIREBASE_USER_SESSION_KEY] = firebase_user_id
+        return firebase_user_id
+    except Exception as e:
+        print(f"Error linking Firebase user for {user.email}: {e}")
+        return None
+
+
+def get_firebase_user_id(request) -> Optional[str]:
+    """Firebase user id for the logged-in user: session first, then profile, then lookup"""
+    if not request.user.is_authenticated:
+        return None
+    firebase_user_id = request.session.get(FIREBASE_USER_SESSION_KEY)
+    if firebase_user_id:
+        return firebase_user_id
+    return link_firebase_user(request, request.user)
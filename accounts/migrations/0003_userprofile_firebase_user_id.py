@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_userprofile_business_address_userprofile_gst_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='firebase_user_id',
+            field=models.CharField(blank=True, db_index=True, help_text='ID of the matching document in the Firestore users collection', max_length=64, null=True),
+        ),
+    ]
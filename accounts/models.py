@@ -12,6 +12,9 @@ class UserProfile(models.Model):
     gst_number = models.CharField(max_length=20, blank=True, null=True)
     business_address = models.TextField(blank=True, null=True)
     address = models.TextField(blank=True, null=True)
+    # Firestore user document for this account, so order paths don't query by email
+    firebase_user_id = models.CharField(max_length=64, blank=True, null=True, db_index=True,
+                                        help_text='ID of the matching document in the Firestore users collection')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -1,3 +1,98 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+
+from core.firebase_models import FirebaseOrder, FirebaseUser
+from core.firebase_service import firebase_service
+from core.tests import LocalBackendMixin, serve_uncollected_static
+from .firebase_link import FIREBASE_USER_SESSION_KEY, get_firebase_user_id, link_firebase_user
+
+
+class FirebaseLinkTests(LocalBackendMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('asha', 'asha@example.com', 'pw', first_name='Asha')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        self.request.session = {}
+
+    def test_creates_and_remembers_firebase_user(self):
+        firebase_user_id = link_firebase_user(self.request, self.user)
+        self.assertEqual(FirebaseUser.get_by_id(firebase_user_id).email, 'asha@example.com')
+        self.assertEqual(self.request.session[FIREBASE_USER_SESSION_KEY], firebase_user_id)
+        self.user.userprofile.refresh_from_db()
+        self.assertEqual(self.user.userprofile.firebase_user_id, firebase_user_id)
+        # Linked once: the next lookup reuses the profile's id
+        self.request.session = {}
+        self.assertEqual(link_firebase_user(self.request, self.user), firebase_user_id)
+        self.assertEqual(len(self.backend.query('users')), 1)
+
+    def test_reuses_existing_firebase_user(self):
+        existing = FirebaseUser.create_user(username='asha', email='asha@example.com')
+        self.assertEqual(get_firebase_user_id(self.request), existing.id)
+
+    def test_session_id_is_used_first(self):
+        self.request.session[FIREBASE_USER_SESSION_KEY] = 'from-session'
+        self.assertEqual(get_firebase_user_id(self.request), 'from-session')
+
+
+@serve_uncollected_static
+class MyOrdersTests(LocalBackendMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('asha', 'asha@example.com', 'pw')
+        self.client.force_login(self.user)
+        self.firebase_user_id = FirebaseUser.create_user(username='asha', email='asha@example.com').id
+        session = self.client.session
+        session[FIREBASE_USER_SESSION_KEY] = self.firebase_user_id
+        session.save()
+
+    def get_orders(self, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/my-orders/', params, **headers)
+
+    def test_unchanged_listing_is_not_modified(self):
+        FirebaseOrder.create_order(self.firebase_user_id, 'cnc_machining')
+        response = self.get_orders()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_orders(response['ETag']).status_code, 304)
+
+    def test_new_order_changes_listing(self):
+        FirebaseOrder.create_order(self.firebase_user_id, 'cnc_machining')
+        etag = self.get_orders()['ETag']
+        FirebaseOrder.create_order(self.firebase_user_id, 'tube_laser')
+        self.assertEqual(self.get_orders(etag).status_code, 200)
+
+    def test_deleted_order_changes_listing(self):
+        FirebaseOrder.create_order(self.firebase_user_id, 'cnc_machining')
+        older = FirebaseOrder.create_order(self.firebase_user_id, 'tube_laser')
+        self.backend.update('orders', older.id, {'updated_at': datetime.now() - timedelta(days=1)})
+        etag = self.get_orders()['ETag']
+        firebase_service.delete_document('orders', older.id)
+        self.assertEqual(self.get_orders(etag).status_code, 200)
+
+    def test_page_size_is_part_of_etag_and_kept_in_links(self):
+        for _ in range(3):
+            FirebaseOrder.create_order(self.firebase_user_id, 'cnc_machining')
+        etag = self.get_orders()['ETag']
+        response = self.get_orders(etag, page_size=2)
+        self.assertEqual(response.status_code, 200)
+        next_token = response.context['next_page_token']
+        self.assertIsNotNone(next_token)
+        self.assertContains(response, f'?page={next_token}&amp;page_size=2')
+
+    def test_bad_page_token_starts_over(self):
+        response = self.get_orders(page='not a token')
+        self.assertRedirects(response, '/my-orders/', fetch_redirect_response=False)
+
+    def test_order_cards_carry_order_ids(self):
+        orders = [FirebaseOrder.create_order(self.firebase_user_id, service_type)
+                  for service_type in ('cnc_machining', 'tube_laser')]
+        response = self.get_orders()
+        for order in orders:
+            self.assertContains(response, f'data-order-id="{order.id}"')
+            self.assertContains(response, f"viewOrderDetails('{order.id}')")
+        self.assertNotContains(response, 'data-order-id=""')
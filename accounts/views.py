@@ -2,20 +2,22 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from .models import UserProfile
-from google_auth_oauthlib.flow import Flow
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from .firebase_link import link_firebase_user
+from core.serializers import json_response, register
 import json
 import os
 
 # Create your views here.
 
+auth_user_serializer = register('auth_user', ['id', 'email'], computed={
+    'name': lambda user: f"{user.first_name} {user.last_name}".strip() or user.username,
+})
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def login_view(request):
@@ -28,28 +30,25 @@ def login_view(request):
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
-            return JsonResponse({'success': False, 'message': 'User not found'}, status=400)
+            return json_response({'success': False, 'message': 'User not found'}, status=400)
         
         # Authenticate user
         user = authenticate(username=user.username, password=password)
         if user is not None:
             login(request, user)
-            return JsonResponse({
+            link_firebase_user(request, user)
+            return json_response({
                 'success': True, 
                 'message': 'Login successful',
-                'user': {
-                    'id': user.id,
-                    'email': user.email,
-                    'name': f"{user.first_name} {user.last_name}".strip() or user.username
-                }
+                'user': auth_user_serializer.encode(user)
             })
         else:
-            return JsonResponse({'success': False, 'message': 'Invalid password'}, status=400)
+            return json_response({'success': False, 'message': 'Invalid password'}, status=400)
             
     except json.JSONDecodeError:
-        return JsonResponse({'success': False, 'message': 'Invalid JSON'}, status=400)
+        return json_response({'success': False, 'message': 'Invalid JSON'}, status=400)
     except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)}, status=500)
+        return json_response({'success': False, 'message': str(e)}, status=500)
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -67,7 +66,7 @@ def signup_view(request):
         address = data.get('address', '')
         # Check if user already exists
         if User.objects.filter(email=email).exists():
-            return JsonResponse({'success': False, 'message': 'User with this email already exists'}, status=400)
+            return json_response({'success': False, 'message': 'User with this email already exists'}, status=400)
         # Create user
         user = User.objects.create_user(
             username=email,
@@ -87,39 +86,35 @@ def signup_view(request):
         profile.save()
         # Login user
         login(request, user)
-        return JsonResponse({
+        link_firebase_user(request, user)
+        return json_response({
             'success': True,
             'message': 'Account created successfully',
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'name': f"{user.first_name} {user.last_name}".strip() or user.username
-            }
+            'user': auth_user_serializer.encode(user)
         })
     except json.JSONDecodeError:
-        return JsonResponse({'success': False, 'message': 'Invalid JSON'}, status=400)
+        return json_response({'success': False, 'message': 'Invalid JSON'}, status=400)
     except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)}, status=500)
+        return json_response({'success': False, 'message': str(e)}, status=500)
 
 def logout_view(request):
     logout(request)
-    return JsonResponse({'success': True, 'message': 'Logged out successfully'})
+    return json_response({'success': True, 'message': 'Logged out successfully'})
 
 def check_auth(request):
     if request.user.is_authenticated:
-        return JsonResponse({
+        return json_response({
             'authenticated': True,
-            'user': {
-                'id': request.user.id,
-                'email': request.user.email,
-                'name': f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username
-            }
+            'user': auth_user_serializer.encode(request.user)
         })
     else:
-        return JsonResponse({'authenticated': False})
+        return json_response({'authenticated': False})
 
 def google_login(request):
     """Initiate Google OAuth login"""
+    # Imported here so the OAuth client libraries don't load on cold start
+    from google_auth_oauthlib.flow import Flow
+    
     flow = Flow.from_client_config(
         {
             "web": {
@@ -144,6 +139,10 @@ def google_login(request):
 
 def google_callback(request):
     """Handle Google OAuth callback"""
+    from google_auth_oauthlib.flow import Flow
+    from google.oauth2 import id_token
+    from google.auth.transport import requests
+    
     try:
         flow = Flow.from_client_config(
             {
@@ -194,19 +193,16 @@ def google_callback(request):
         
         # Login user
         login(request, user)
+        link_firebase_user(request, user)
         
-        return JsonResponse({
+        return json_response({
             'success': True,
             'message': 'Google login successful',
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'name': f"{user.first_name} {user.last_name}".strip() or user.username
-            }
+            'user': auth_user_serializer.encode(user)
         })
         
     except Exception as e:
-        return JsonResponse({'success': False, 'message': f'Google login failed: {str(e)}'}, status=400)
+        return json_response({'success': False, 'message': f'Google login failed: {str(e)}'}, status=400)
 
 @login_required
 def profile_view(request):
@@ -233,6 +229,6 @@ def profile_update(request):
         if 'last_name' in data:
             request.user.last_name = data['last_name']
         request.user.save()
-        return JsonResponse({'success': True, 'message': 'Profile updated successfully'})
+        return json_response({'success': True, 'message': 'Profile updated successfully'})
     except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        return json_response({'success': False, 'message': str(e)}, status=400)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        # Registers the Firestore index system check
+        from . import checks
+        if getattr(settings, 'FIREBASE_WRITE_BEHIND', False):
+            # Replay writes journaled before the last restart
+            from .firebase_service import firebase_service
+            firebase_service.write_behind.start()
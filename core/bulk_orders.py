@@ -0,0 +1,259 @@
+import codecs
+import csv
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+ORDER_ITEMS_COLLECTION = 'order_items'
+BULK_ORDER_JOBS_COLLECTION = 'bulk_order_jobs'
+
+# Fields of the parent order a bulk submission may set
+BULK_ORDER_FIELDS = [
+    'contact_name', 'contact_email', 'contact_phone', 'pickup_location', 'delivery_location',
+    'special_instructions',
+]
+
+# Row errors reported back before validation gives up
+MAX_ROW_ERRORS = 50
+
+# Written to the job as it runs
+QUEUED, RUNNING, COMPLETED, FAILED = 'queued', 'running', 'completed', 'failed'
+
+
+def service_types() -> Dict[str, str]:
+    """Display name -> service type, and each service type to itself"""
+    from .models import OrderItem
+    types = {}
+    for value, label in OrderItem.SERVICE_CHOICES:
+        types[value] = value
+        types[label.lower()] = value
+    return types
+
+
+def _price(value: Any, field: str) -> Optional[Decimal]:
+    if value in (None, ''):
+        return None
+    try:
+        price = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"{field} must be a number")
+    if not price.is_finite() or price <= 0:
+        raise ValueError(f"{field} must be a positive number")
+    return price.quantize(Decimal('0.01'))
+
+
+def validate_item(row: Dict[str, Any], line: int, types: Dict[str, str]) -> Dict[str, Any]:
+    """One line item, normalized; raises ValueError describing what's wrong"""
+    if not isinstance(row, dict):
+        raise ValueError('must be an object')
+    service_type = types.get(str(row.get('service_type') or '').strip().lower())
+    if service_type is None:
+        raise ValueError(f"service_type must be one of {', '.join(sorted(set(types.values())))}")
+    quantity = row.get('quantity')
+    try:
+        quantity = int(str(quantity).strip()) if quantity not in (None, '') else 1
+    except ValueError:
+        raise ValueError('quantity must be a whole number')
+    if quantity < 1:
+        raise ValueError('quantity must be at least 1')
+    unit_price = _price(row.get('unit_price'), 'unit_price')
+    return {
+        'line': line,
+        'service_type': service_type,
+        'description': str(row.get('description') or '').strip(),
+        'quantity': quantity,
+        'unit_price': float(unit_price) if unit_price is not None else None,
+        'total_price': float(unit_price * quantity) if unit_price is not None else None,
+    }
+
+
+def validate_items(rows: Iterable[Dict[str, Any]], max_items: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Validate rows one at a time, as they're parsed. Returns the normalized
+    items and per-line errors; stops early after MAX_ROW_ERRORS errors or
+    when there are more than `max_items` rows.
+    """
+    types = service_types()
+    items = []
+    errors = []
+    for line, row in enumerate(rows, start=1):
+        if line > max_items:
+            errors.append({'line': line, 'error': f"at most {max_items} items per bulk order"})
+            break
+        try:
+            items.append(validate_item(row, line, types))
+        except ValueError as e:
+            errors.append({'line': line, 'error': str(e)})
+            if len(errors) >= MAX_ROW_ERRORS:
+                break
+    return items, errors
+
+
+def text_lines(stream, encoding: str = 'utf-8-sig', chunk_size: int = 64 * 1024) -> Iterator[str]:
+    """
+    Lines of a binary stream (a request or an uploaded file), decoded as
+    they're read. Line endings are kept, so csv.reader can parse quoted
+    fields that span lines.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        pending += decoder.decode(chunk, final=not chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def csv_rows(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """Rows of a CSV with a header line, keyed by lower-cased column name"""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip().lstrip('\ufeff').lower() for name in header]
+    for values in reader:
+        if any(value.strip() for value in values):
+            yield dict(zip(header, values))
+
+
+def summarize_items(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Parent order fields describing its items"""
+    services = Counter(item['service_type'] for item in items)
+    return {
+        'service_type': next(iter(services)) if len(services) == 1 else 'mixed',
+        'description': f"Bulk order: {len(items)} items",
+        'price': sum(item['total_price'] or 0.0 for item in items),
+    }
+
+
+def item_id(order_id: str, line: int) -> str:
+    return f"{order_id}-{line:05d}"
+
+
+class BulkOrderJobs:
+    """
+    Writes bulk orders in the background.
+
+    submit() records a job document and returns its id straight away; a
+    worker thread then writes the line items in batches of `batch_size`
+    (updating the job's progress after each batch) and creates the parent
+    order last, so the order never appears with only some of its items.
+    Item ids are derived from the order id and line, so rewriting a batch
+    is harmless.
+
+    Jobs run in the process that accepted them, which a serverless host may
+    freeze or recycle once the response is sent. get() therefore fails a
+    queued or running job that hasn't made progress for `stale_after`
+    seconds. A worker that was only slow checks for this before creating
+    the parent order, and gives up rather than create an order the client
+    was told had failed.
+    """
+
+    def __init__(self, service, workers: int = 2, batch_size: int = 500, stale_after: float = 600):
+        self._service = service
+        self.workers = workers
+        self.batch_size = batch_size
+        self.stale_after = stale_after
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _submit(self, *args):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='firebase-bulk-orders')
+        return self._executor.submit(self._run, *args)
+
+    def submit(self, user_id: Optional[str], order_data: Dict[str, Any], items: List[Dict[str, Any]]) -> str:
+        """Queue a parent order and its items; returns the job id"""
+        service = self._service
+        job_id = str(uuid.uuid4())
+        order_id = str(uuid.uuid4())
+        service.create_document(BULK_ORDER_JOBS_COLLECTION, {
+            'user_id': user_id,
+            'status': QUEUED,
+            'order_id': order_id,
+            'total': len(items),
+            'written': 0,
+            'error': None,
+        }, doc_id=job_id)
+        # The job must exist before a worker updates it
+        service.flush_writes(BULK_ORDER_JOBS_COLLECTION, job_id)
+        self._submit(job_id, order_id, order_data, items)
+        return job_id
+
+    def _update(self, job_id: str, data: Dict[str, Any]):
+        self._service.update_document(BULK_ORDER_JOBS_COLLECTION, job_id, data)
+
+    def _run(self, job_id: str, order_id: str, order_data: Dict[str, Any], items: List[Dict[str, Any]]):
+        service = self._service
+        try:
+            self._update(job_id, {'status': RUNNING})
+            now = datetime.now()
+            written = 0
+            for start in range(0, len(items), self.batch_size):
+                chunk = items[start:start + self.batch_size]
+                with service.batch(limit=self.batch_size) as batch:
+                    for item in chunk:
+                        doc_id = item_id(order_id, item['line'])
+                        batch.set(ORDER_ITEMS_COLLECTION, doc_id,
+                                  dict(item, id=doc_id, order_id=order_id, created_at=now))
+                failed = [result for result in batch.results if not result['success']]
+                if failed:
+                    raise RuntimeError(failed[0]['error'])
+                written += len(chunk)
+                self._update(job_id, {'written': written})
+            job = service.backend.get(BULK_ORDER_JOBS_COLLECTION, job_id)
+            if job is not None and job.get('status') == FAILED:
+                print(f"Bulk order job {job_id} timed out before its order {order_id} was created")
+                return
+            service.create_order(dict(order_data, id=order_id))
+            self._update(job_id, {'status': COMPLETED})
+        except Exception as e:
+            print(f"Error writing bulk order {order_id}: {e}")
+            try:
+                self._update(job_id, {'status': FAILED, 'error': str(e)})
+            except Exception as e:
+                print(f"Error updating bulk order job {job_id}: {e}")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        A job's progress, read past the cache (it's written by another
+        thread or process). A stale queued or running job is failed here.
+        """
+        job = self._service.backend.get(BULK_ORDER_JOBS_COLLECTION, job_id)
+        if job is None or job.get('status') not in (QUEUED, RUNNING):
+            return job
+        updated_at = job.get('updated_at')
+        if updated_at is None or datetime.now(updated_at.tzinfo) - updated_at <= timedelta(seconds=self.stale_after):
+            return job
+        failed = {'status': FAILED, 'error': f"no progress for {self.stale_after:g} seconds"}
+        self._update(job_id, dict(failed))
+        return dict(job, **failed)
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+def build_bulk_order_jobs(service) -> BulkOrderJobs:
+    """Build the job runner configured by the FIREBASE_BULK_ORDER_* settings"""
+    from django.conf import settings
+    return BulkOrderJobs(
+        service,
+        workers=getattr(settings, 'FIREBASE_BULK_ORDER_WORKERS', 2),
+        batch_size=getattr(settings, 'FIREBASE_BULK_ORDER_BATCH_SIZE', 500),
+        stale_after=getattr(settings, 'FIREBASE_BULK_ORDER_STALE_AFTER', 600),
+    )
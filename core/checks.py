@@ -0,0 +1,37 @@
+from django.core.checks import Tags, Warning, register
+
+from .firebase_queries import catalogue, indexes_path, load_manifest
+
+
+@register(Tags.database)
+def check_firestore_indexes(app_configs, **kwargs):
+    """
+    Flag catalogued query shapes with no composite index in
+    firestore.indexes.json, and ones that scan a collection unintentionally.
+    Run `manage.py check --fail-level WARNING` in CI to fail the build on these.
+    """
+    errors = []
+    path = indexes_path()
+    manifest = load_manifest(path)
+    if manifest is None:
+        errors.append(Warning(
+            f"{path} not found",
+            hint='Generate it with `python manage.py firestore_indexes`.',
+            id='core.W001',
+        ))
+        manifest = {}
+    for shape in catalogue.missing_indexes(manifest):
+        errors.append(Warning(
+            f"Query '{shape.name}' ({shape.describe()}) has no composite index in {path}",
+            hint='Regenerate it with `python manage.py firestore_indexes` and deploy the indexes.',
+            obj=shape.name,
+            id='core.W002',
+        ))
+    for shape in catalogue.unintended_scans():
+        errors.append(Warning(
+            f"Query '{shape.name}' ({shape.describe()}) reads the whole {shape.collection} collection",
+            hint='Filter it, or mark the shape allow_scan=True in core/firebase_queries.py if that is intended.',
+            obj=shape.name,
+            id='core.W003',
+        ))
+    return errors
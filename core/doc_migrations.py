@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .firebase_backends import Increment
+from .firebase_service import FIRESTORE_BATCH_LIMIT, firebase_service
+
+SCHEMA_VERSION_FIELD = 'schema_version'
+
+# One document per migrated collection, counting upgrades that failed as documents were read
+MIGRATION_FAILURES_COLLECTION = 'schema_migration_failures'
+
+# Upgrade step: takes a document at one version, returns the fields to set for the next
+MigrationStep = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class DocumentMigrations:
+    """
+    Versioned upgrades for one collection's documents.
+
+    Documents store their `schema_version` (missing means 0). Each
+    registered step takes a document at the previous version and returns
+    the fields to set; steps should only fill in or reshape fields, never
+    discard newer data, since they also run on documents being created.
+
+    Documents are upgraded lazily as models load them (see
+    SchemaModel.migrations) and the changed fields are written back with
+    any enclosing buffered_writes() block, or the write-behind queue, rather than
+    one write per read. Documents nobody reads are upgraded by migrate(),
+    a chunk at a time (see the firestore_migrate command).
+
+    A lazy upgrade or write-back that fails still returns the document as
+    stored, but is counted, in `failures` for this process and in the
+    collection's MIGRATION_FAILURES_COLLECTION document for
+    firestore_migrate to report. That document is only written with a
+    buffered_writes() block or the write-behind queue, so reads never wait
+    on it; counts kept until then are added with the next recorded failure,
+    or by record_failures().
+    """
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self._steps: List[MigrationStep] = []
+        self.failures = Counter()
+        self._unrecorded = Counter()
+        self._last_failure: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """The current schema version, which new documents are written with"""
+        return len(self._steps)
+
+    def register(self, step: MigrationStep) -> MigrationStep:
+        """Add the step from the current version to the next (usable as a decorator)"""
+        self._steps.append(step)
+        return step
+
+    def outdated(self, doc: Dict[str, Any]) -> bool:
+        return doc.get(SCHEMA_VERSION_FIELD, 0) < len(self._steps)
+
+    def changes(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """The fields an outdated document needs set to bring it to the current version"""
+        working = dict(doc)
+        changes = {}
+        for step in self._steps[working.get(SCHEMA_VERSION_FIELD, 0):]:
+            step_changes = step(working)
+            working.update(step_changes)
+            changes.update(step_changes)
+        changes[SCHEMA_VERSION_FIELD] = self.version
+        return changes
+
+    def upgrade(self, doc: Dict[str, Any], write_back: bool = True) -> Dict[str, Any]:
+        """
+        An upgraded copy of an outdated document, queueing the write-back
+        of stored ones. Pass write_back=False for documents read with a
+        field projection: steps would fill the unread fields with defaults.
+        """
+        try:
+            changes = self.changes(doc)
+        except Exception as e:
+            print(f"Error migrating {self.collection} document {doc.get('id')}: {e}")
+            self._record_failure('upgrade', doc.get('id'), e)
+            return doc
+        if write_back and doc.get('id'):
+            self._write_back(doc['id'], changes)
+        return dict(doc, **changes)
+
+    def _write_back(self, doc_id: str, changes: Dict[str, Any]):
+        try:
+            # Only when it can be batched with other writes; otherwise the
+            # document is upgraded again on its next read, or by migrate()
+            if not firebase_service._queue_write('update', self.collection, doc_id, changes):
+                firebase_service._defer_write('update', self.collection, doc_id, changes)
+        except Exception as e:
+            print(f"Error writing back migrated {self.collection} document {doc_id}: {e}")
+            self._record_failure('write_back', doc_id, e)
+
+    def _record_failure(self, kind: str, doc_id: Optional[str], error: Exception):
+        with self._lock:
+            self.failures[kind] += 1
+            self._unrecorded[kind] += 1
+            self._last_failure = {'last_doc_id': doc_id, 'last_error': str(error), 'last_failed_at': datetime.now()}
+        self.record_failures(wait=False)
+
+    def record_failures(self, wait: bool = True) -> bool:
+        """
+        Add the failures this process hasn't recorded yet to the collection's
+        MIGRATION_FAILURES_COLLECTION document. Without `wait`, only if the
+        write can be buffered or deferred. True if none are left unrecorded.
+        """
+        with self._lock:
+            if not self._unrecorded:
+                return True
+            counts, self._unrecorded = self._unrecorded, Counter()
+            data = dict({'collection': self.collection, 'version': self.version}, **self._last_failure)
+        data.update({f"{kind}_failures": Increment(count) for kind, count in counts.items()})
+        write = ('merge', MIGRATION_FAILURES_COLLECTION, self.collection, data)
+        try:
+            if wait:
+                firebase_service._write(*write)
+                recorded = True
+            else:
+                recorded = firebase_service._queue_write(*write) or firebase_service._defer_write(*write)
+        except Exception as e:
+            print(f"Error recording migration failures for {self.collection}: {e}")
+            recorded = False
+        if not recorded:
+            with self._lock:
+                self._unrecorded.update(counts)
+        return recorded
+
+    def recorded_failures(self) -> Optional[Dict[str, Any]]:
+        """Failed lazy upgrades and write-backs recorded by every process since the last clean migrate()"""
+        return firebase_service.backend.get(MIGRATION_FAILURES_COLLECTION, self.collection)
+
+    def migrate(self, chunk_size: int = 500, batch_size: int = FIRESTORE_BATCH_LIMIT,
+                pause: float = 0, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Upgrade every outdated document in the collection, committing a
+        batch of `batch_size` updates at a time (sleeping `pause` seconds
+        after each) so it can run alongside live traffic. Documents missing
+        the version field can't be queried for, so this scans the whole
+        collection in `chunk_size` pages.
+        """
+        scanned = outdated = errors = 0
+        with firebase_service.batch(limit=batch_size) as batch:
+            for doc in firebase_service.iter_collection(self.collection, chunk_size=chunk_size):
+                scanned += 1
+                if not self.outdated(doc):
+                    continue
+                outdated += 1
+                if dry_run:
+                    continue
+                try:
+                    changes = self.changes(doc)
+                except Exception as e:
+                    print(f"Error migrating {self.collection} document {doc['id']}: {e}")
+                    errors += 1
+                    continue
+                batch.update(self.collection, doc['id'], changes)
+                if pause and (outdated - errors) % batch_size == 0:
+                    time.sleep(pause)
+        batch_failed = sum(1 for result in batch.results if not result['success'])
+        if not dry_run and not errors and not batch_failed:
+            # Every document is current, including any whose lazy upgrade failed
+            with self._lock:
+                self._unrecorded.clear()
+            firebase_service.delete_document(MIGRATION_FAILURES_COLLECTION, self.collection)
+        return {'scanned': scanned, 'outdated': outdated, 'migrated': len(batch.results) - batch_failed,
+                'failed': errors + batch_failed}
+
+
+# Collection -> its migrations
+registry: Dict[str, DocumentMigrations] = {}
+
+
+def migrations_for(collection: str) -> DocumentMigrations:
+    """The migrations of a collection, created on first use"""
+    if collection not in registry:
+        registry[collection] = DocumentMigrations(collection)
+    return registry[collection]
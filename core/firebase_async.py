@@ -0,0 +1,425 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+
+from .firebase_backends import (
+    DESCENDING, FirestoreBackend, LocalBackend, aggregation_results, apply_writes, build_aggregation_query,
+    build_firestore_query, check_aggregations, initialize_firebase_app, project_fields, rpc_options,
+    snapshot_to_dict, to_firestore
+)
+from .firebase_pagination import Page, build_page
+from .firebase_resilience import AsyncResilientBackend
+from .firebase_service import GET_MANY_CHUNK_SIZE, FirebaseService, firebase_service
+from .order_stats import ORDER_STATS_COLLECTION, OrderStatsKey
+from .write_buffer import current_write_buffer, write_buffer_scope
+
+
+class AsyncFirestoreBackend:
+    """Cloud Firestore backend on the Admin SDK's AsyncClient"""
+    name = 'firestore'
+
+    def __init__(self):
+        from firebase_admin import firestore_async
+        initialize_firebase_app()
+        self._db = firestore_async.client()
+
+    def _ref(self, collection, doc_id):
+        return self._db.collection(collection).document(doc_id)
+
+    async def set(self, collection, doc_id, data, merge=False):
+        await self._ref(collection, doc_id).set(to_firestore(data), merge=merge, **rpc_options())
+
+    async def get(self, collection, doc_id, fields=None):
+        doc = await self._ref(collection, doc_id).get(field_paths=fields, **rpc_options(read=True))
+        if doc.exists:
+            return snapshot_to_dict(doc, fields)
+        return None
+
+    async def exists(self, collection, doc_id):
+        doc = await self._ref(collection, doc_id).get(field_paths=['id'], **rpc_options(read=True))
+        return doc.exists
+
+    async def get_many(self, collection, doc_ids, fields=None):
+        refs = [self._ref(collection, doc_id) for doc_id in doc_ids]
+        found = {}
+        async for doc in self._db.get_all(refs, field_paths=fields, **rpc_options(read=True)):
+            if doc.exists:
+                found[doc.id] = snapshot_to_dict(doc, fields)
+        return found
+
+    async def update(self, collection, doc_id, data):
+        await self._ref(collection, doc_id).update(to_firestore(data), **rpc_options())
+
+    async def delete(self, collection, doc_id):
+        await self._ref(collection, doc_id).delete(**rpc_options())
+
+    async def query(self, collection, filters=None, order_by=None, limit=None, start_after=None, select=None):
+        query = build_firestore_query(self._db, collection, filters, order_by, limit, start_after, select)
+        return [snapshot_to_dict(doc, select) for doc in await query.get(**rpc_options(read=True))]
+
+    async def aggregate(self, collection, aggregations, filters=None):
+        query = build_aggregation_query(build_firestore_query(self._db, collection, filters), aggregations)
+        return aggregation_results(await query.get(**rpc_options(read=True)))
+
+    async def commit(self, writes):
+        """Commit (op, collection, doc_id, data) writes as one atomic batch"""
+        batch = self._db.batch()
+        for op, collection, doc_id, data in writes:
+            ref = self._ref(collection, doc_id)
+            if op == 'delete':
+                batch.delete(ref)
+            elif op == 'update':
+                batch.update(ref, to_firestore(data))
+            else:
+                batch.set(ref, to_firestore(data), merge=op == 'merge')
+        await batch.commit(**rpc_options())
+
+
+class SyncBackendAdapter:
+    """
+    Awaitable facade over a synchronous backend.
+
+    Calls into LocalBackend are in-memory and run inline; anything else
+    is pushed to a worker thread so the event loop never blocks.
+    """
+
+    def __init__(self, backend, offload: bool = True):
+        self._backend = backend
+        self.name = backend.name
+        self._offload = offload
+
+    async def _call(self, method, *args, **kwargs):
+        if self._offload:
+            return await sync_to_async(method, thread_sensitive=False)(*args, **kwargs)
+        return method(*args, **kwargs)
+
+    async def set(self, collection, doc_id, data, merge=False):
+        return await self._call(self._backend.set, collection, doc_id, data, merge=merge)
+
+    async def get(self, collection, doc_id, fields=None):
+        return await self._call(self._backend.get, collection, doc_id, fields=fields)
+
+    async def exists(self, collection, doc_id):
+        return await self._call(self._backend.exists, collection, doc_id)
+
+    async def get_many(self, collection, doc_ids, fields=None):
+        return await self._call(self._backend.get_many, collection, doc_ids, fields=fields)
+
+    async def update(self, collection, doc_id, data):
+        return await self._call(self._backend.update, collection, doc_id, data)
+
+    async def delete(self, collection, doc_id):
+        return await self._call(self._backend.delete, collection, doc_id)
+
+    async def query(self, collection, filters=None, order_by=None, limit=None, start_after=None, select=None):
+        return await self._call(self._backend.query, collection, filters=filters, order_by=order_by,
+                                limit=limit, start_after=start_after, select=select)
+
+    async def aggregate(self, collection, aggregations, filters=None):
+        return await self._call(self._backend.aggregate, collection, aggregations, filters=filters)
+
+    async def commit(self, writes):
+        """Commit (op, collection, doc_id, data) writes as one atomic batch"""
+        return await self._call(lambda: apply_writes(self._backend.batch(), writes).commit())
+
+
+class AsyncFirebaseService:
+    """
+    Async counterpart of FirebaseService for async views.
+
+    Shares the document cache, write buffers and the code building
+    documents and writes with the synchronous service, so writes on either
+    path invalidate reads on both; methods here only add the awaits.
+
+    With FIREBASE_ASYNC_CLIENT (set by mywebsite/asgi.py) and the Firestore
+    backend, calls go through the gRPC AsyncClient, one per event loop
+    since a client is bound to the loop that created it. Otherwise (WSGI,
+    where every async view runs in a fresh event loop) they go to the
+    shared synchronous backend on a worker thread, so no client or
+    channel is built per request.
+    """
+
+    def __init__(self, service: FirebaseService):
+        self._service = service
+        self._backends = weakref.WeakKeyDictionary()
+        self._shared = None
+        self._source = None
+
+    def _uses_async_client(self) -> bool:
+        from django.conf import settings
+        if not getattr(settings, 'FIREBASE_ASYNC_CLIENT', False):
+            return False
+        backend = self._service._backend
+        if backend is None:
+            # Don't build the sync client just to find out it's Firestore
+            return getattr(settings, 'FIREBASE_BACKEND', 'firestore') == 'firestore'
+        return isinstance(backend, FirestoreBackend)
+
+    @property
+    def backend(self):
+        """Get the async backend for the running event loop"""
+        if self._source is not self._service._backend:
+            # The sync service switched backends (tests, benchmarks)
+            self._backends = weakref.WeakKeyDictionary()
+            self._shared = None
+            self._source = self._service._backend
+        if not self._uses_async_client():
+            if self._shared is None:
+                backend = self._service.backend
+                self._shared = SyncBackendAdapter(backend, offload=not isinstance(backend.inner, LocalBackend))
+                self._source = self._service._backend
+            return self._shared
+        loop = asyncio.get_running_loop()
+        backend = self._backends.get(loop)
+        if backend is None:
+            backend = self._backends[loop] = AsyncResilientBackend(
+                AsyncFirestoreBackend(), self._service.resilience, self._service.query_checker
+            )
+        return backend
+
+    @property
+    def cache(self):
+        return self._service.cache
+
+    async def _flush_pending(self, collection, doc_id=None):
+        """Commit buffered writes a read is about to depend on"""
+        if self._service.has_pending_writes(collection, doc_id):
+            await sync_to_async(self._service.flush_writes, thread_sensitive=False)(collection, doc_id)
+
+    async def _read_document(self, collection, doc_id, fields=None):
+        await self._flush_pending(collection, doc_id)
+        data = self.cache.get(collection, doc_id)
+        if data is not None:
+            return project_fields(data, fields) if fields is not None else data
+        try:
+            if fields is not None:
+                return await self.backend.get(collection, doc_id, fields=fields)
+            data = await self.backend.get(collection, doc_id)
+        except Exception as e:
+            return self._service._stale_document(collection, doc_id, fields, e)
+        if data is not None:
+            self.cache.set(collection, doc_id, data)
+        return data
+
+    @asynccontextmanager
+    async def buffered_writes(self):
+        """FirebaseService.buffered_writes for async code; the commit on exit runs on a worker thread"""
+        buffer = current_write_buffer()
+        if buffer is not None:
+            yield buffer
+            return
+        with write_buffer_scope() as buffer:
+            yield buffer
+            await sync_to_async(self._service.flush_buffer, thread_sensitive=False)(buffer)
+
+    async def _write_many(self, writes):
+        """Write several documents in one atomic batch, or queue them if writes are being buffered"""
+        if self._service._queue_writes(writes):
+            return
+        await self.backend.commit(writes)
+        for op, collection, doc_id, data in writes:
+            self._service._invalidate(collection, doc_id, data)
+
+    # User Operations
+    async def create_user(self, user_data: Dict[str, Any]) -> str:
+        """Create a new user"""
+        return await self.create_document('users', user_data)
+
+    async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get user by ID"""
+        return await self.get_document('users', user_id)
+
+    async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Get user by email"""
+        try:
+            await self._flush_pending('users')
+            users = await self.backend.query('users', filters=[('email', '==', email)], limit=1)
+            return users[0] if users else None
+        except Exception as e:
+            print(f"Error getting user by email: {e}")
+            return None
+
+    async def update_user(self, user_id: str, update_data: Dict[str, Any]) -> bool:
+        """Update user data; see FirebaseService.update_user"""
+        try:
+            update_data['updated_at'] = datetime.now()
+            await self._write_many([('update', 'users', user_id, update_data)])
+            return True
+        except Exception as e:
+            print(f"Error updating user: {e}")
+            return False
+
+    # Order Operations
+    async def create_order(self, order_data: Dict[str, Any]) -> str:
+        """Create a new order; see FirebaseService.create_order"""
+        try:
+            order_id, writes = self._service._order_create_writes(order_data)
+            await self._write_many(writes)
+            return order_id
+        except Exception as e:
+            print(f"Error creating order: {e}")
+            raise
+
+    async def get_order(self, order_id: str, fields: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Get order by ID, optionally only some fields"""
+        return await self.get_document('orders', order_id, fields=fields)
+
+    async def order_exists(self, order_id: str) -> bool:
+        """Check whether an order exists without reading its fields"""
+        return await self.document_exists('orders', order_id)
+
+    async def update_order_status(self, order_id: str, status: str, previous: OrderStatsKey = None) -> bool:
+        """Update order status; see FirebaseService.update_order for `previous`"""
+        return await self.update_order(order_id, {'status': status}, previous=previous)
+
+    async def update_order(self, order_id: str, update_data: Dict[str, Any], previous: OrderStatsKey = None) -> bool:
+        """Update an order and its order stats buckets; see FirebaseService.update_order"""
+        service = self._service
+        if service._changes_counted_fields(update_data):
+            # The transaction runs on the sync client, on a worker thread
+            return await sync_to_async(service.update_order, thread_sensitive=False)(order_id, update_data)
+        try:
+            await self._write_many(service._order_update_writes(order_id, update_data, previous))
+            return True
+        except Exception as e:
+            print(f"Error updating order: {e}")
+            return False
+
+    async def get_user_orders_version(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """The version stamp of a user's order listing; see FirebaseService.get_user_orders_version"""
+        version = self._service.order_versions.user_orders(user_id)
+        if version is not None:
+            return version
+        filters = [('user_id', '==', user_id)]
+        try:
+            await self._flush_pending('orders')
+            latest, counted = await asyncio.gather(
+                self.backend.query('orders', filters=filters, order_by=[('updated_at', DESCENDING)],
+                                   limit=1, select=['updated_at']),
+                self.backend.aggregate('orders', {'count': ('count', None)}, filters=filters)
+            )
+        except Exception as e:
+            print(f"Error getting user orders version: {e}")
+            return None
+        return self._service._set_user_orders_version(user_id, latest, counted)
+
+    async def get_order_stats(self, user_id: str = None) -> Optional[Dict[str, Any]]:
+        """Get order counts for a user, or for all orders; see FirebaseService.get_order_stats"""
+        try:
+            stats = self._service.order_stats
+            await self._flush_pending(ORDER_STATS_COLLECTION)
+            docs = await self.backend.get_many(ORDER_STATS_COLLECTION, stats.read_ids(user_id))
+            return stats.combine(docs.values())
+        except Exception as e:
+            print(f"Error getting order stats: {e}")
+            return None
+
+    async def get_user_orders_page(self, user_id: str, page_size: int = None, page_token: str = None) -> Page:
+        """Get one page of a user's orders, newest first"""
+        return await self.query_page(
+            'orders',
+            filters=[('user_id', '==', user_id)],
+            order_by=[('created_at', DESCENDING)],
+            page_size=page_size,
+            page_token=page_token
+        )
+
+    # Generic CRUD Operations
+    async def create_document(self, collection: str, data: Dict[str, Any], doc_id: str = None) -> str:
+        """Create a document in any collection"""
+        try:
+            doc_id = self._service._new_document(data, doc_id)
+            await self._write_many([('set', collection, doc_id, data)])
+            return doc_id
+        except Exception as e:
+            print(f"Error creating document in {collection}: {e}")
+            raise
+
+    async def get_document(self, collection: str, doc_id: str, fields: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a document from any collection, optionally only some fields"""
+        try:
+            return await self._read_document(collection, doc_id, fields=fields)
+        except Exception as e:
+            print(f"Error getting document from {collection}: {e}")
+            return None
+
+    async def document_exists(self, collection: str, doc_id: str) -> bool:
+        """Check whether a document exists without reading its fields"""
+        try:
+            await self._flush_pending(collection, doc_id)
+            if self.cache.get(collection, doc_id) is not None:
+                return True
+            try:
+                return await self.backend.exists(collection, doc_id)
+            except Exception as e:
+                return self._service._stale_document(collection, doc_id, [], e) is not None
+        except Exception as e:
+            print(f"Error checking document in {collection}: {e}")
+            return False
+
+    async def get_many(self, collection: str, doc_ids: List[str],
+                       fields: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Get many documents by id, reading uncached chunks concurrently; see FirebaseService.get_many"""
+        try:
+            await self._flush_pending(collection)
+        except Exception as e:
+            print(f"Error flushing writes to {collection}: {e}")
+        found, missing = self._service._cached_many(collection, doc_ids, fields)
+        chunks = [missing[start:start + GET_MANY_CHUNK_SIZE]
+                  for start in range(0, len(missing), GET_MANY_CHUNK_SIZE)]
+        results = await asyncio.gather(
+            *(self.backend.get_many(collection, chunk, fields=fields) for chunk in chunks),
+            return_exceptions=True
+        )
+        for chunk, docs in zip(chunks, results):
+            self._service._add_fetched(collection, chunk, docs, fields, found)
+        return found
+
+    async def update_document(self, collection: str, doc_id: str, update_data: Dict[str, Any]) -> bool:
+        """Update a document in any collection (orders through update_order)"""
+        if collection == 'orders':
+            return await self.update_order(doc_id, update_data)
+        try:
+            update_data['updated_at'] = datetime.now()
+            await self._write_many([('update', collection, doc_id, update_data)])
+            return True
+        except Exception as e:
+            print(f"Error updating document in {collection}: {e}")
+            return False
+
+    async def aggregate(self, collection: str, aggregations: Dict[str, Any],
+                        filters: List = None) -> Optional[Dict[str, Any]]:
+        """Compute count/sum/avg over matching documents; see FirebaseService.aggregate"""
+        check_aggregations(aggregations)
+        try:
+            await self._flush_pending(collection)
+            return await self.backend.aggregate(collection, aggregations, filters=filters)
+        except Exception as e:
+            print(f"Error aggregating {collection}: {e}")
+            return None
+
+    async def query_page(self, collection: str, filters: List = None, order_by: List = None,
+                         page_size: int = None, page_token: str = None) -> Page:
+        """Run a query one page at a time; see FirebaseService.query_page"""
+        page_size, order_by, cursor = self._service._page_query(order_by, page_size, page_token)
+        try:
+            await self._flush_pending(collection)
+            docs = await self.backend.query(
+                collection,
+                filters=filters,
+                order_by=order_by,
+                limit=page_size + 1,
+                start_after=cursor
+            )
+        except Exception as e:
+            print(f"Error getting page from {collection}: {e}")
+            return Page([])
+        return build_page(docs, page_size, order_by)
+
+
+# Create a global instance
+async_firebase_service = AsyncFirebaseService(firebase_service)
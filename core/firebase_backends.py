@@ -0,0 +1,700 @@
+import os
+import json
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+# (field, op, value) and (field, direction) tuples used by BaseBackend.query
+Filter = Tuple[str, str, Any]
+Ordering = Tuple[str, str]
+
+# (function, field) used by BaseBackend.aggregate; field is None for count
+Aggregation = Tuple[str, Optional[str]]
+AGGREGATE_FUNCTIONS = ('count', 'sum', 'avg')
+
+# Timeout for the backend call in progress, set by firebase_resilience
+call_timeout: ContextVar = ContextVar('firebase_call_timeout', default=None)
+
+
+class DocumentNotFound(Exception):
+    """Raised when updating a document that does not exist"""
+
+
+class Increment:
+    """Write value that adds to a numeric field (missing fields count as 0), like firestore.Increment"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Increment) and other.value == self.value
+
+    def __repr__(self):
+        return f"Increment({self.value!r})"
+
+
+class BaseBackend:
+    """
+    Storage interface used by FirebaseService.
+
+    Backends store plain dicts keyed by collection name and document id and
+    answer the subset of Firestore queries the service needs.
+    """
+    name = 'base'
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False) -> None:
+        """Create or overwrite a document; with merge, deep-merge into it instead"""
+        raise NotImplementedError
+
+    def get(self, collection: str, doc_id: str, fields: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a document (only `fields` plus id, if given), or None if it does not exist"""
+        raise NotImplementedError
+
+    def exists(self, collection: str, doc_id: str) -> bool:
+        """Whether a document exists, without transferring its fields"""
+        raise NotImplementedError
+
+    def get_many(self, collection: str, doc_ids: List[str],
+                 fields: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Get several documents in one round trip, keyed by id; missing ones are left out"""
+        raise NotImplementedError
+
+    def update(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        """Merge fields into an existing document"""
+        raise NotImplementedError
+
+    def delete(self, collection: str, doc_id: str) -> None:
+        """Delete a document"""
+        raise NotImplementedError
+
+    def query(self, collection: str, filters: List[Filter] = None,
+              order_by: List[Ordering] = None, limit: int = None,
+              start_after: List[Any] = None, select: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        Run a filtered, ordered and limited query.
+
+        start_after holds one value per order_by field; results begin
+        strictly after that position. select limits the returned fields
+        (the document id is always included).
+        """
+        return list(self.stream(collection, filters, order_by, limit, start_after, select))
+
+    def stream(self, collection: str, filters: List[Filter] = None,
+               order_by: List[Ordering] = None, limit: int = None,
+               start_after: List[Any] = None, select: List[str] = None) -> Iterator[Dict[str, Any]]:
+        """Like query(), but yields documents as they arrive"""
+        raise NotImplementedError
+
+    def aggregate(self, collection: str, aggregations: Dict[str, Aggregation],
+                  filters: List[Filter] = None) -> Dict[str, Any]:
+        """
+        Compute count/sum/avg over the documents matching filters without
+        reading them. Results are keyed like `aggregations`; sum and avg
+        only consider numeric values, and avg is None if there are none.
+        """
+        raise NotImplementedError
+
+    def batch(self) -> 'BaseBatch':
+        """Start an atomic write batch"""
+        raise NotImplementedError
+
+    def run_transaction(self, func: Callable[['BaseTransaction'], Any]) -> Any:
+        """
+        Call func(transaction) and commit the writes it queued atomically,
+        but only if the documents it read through transaction.get haven't
+        changed since; otherwise func is run again. Returns func's result.
+        """
+        raise NotImplementedError
+
+    def watch(self, collection: str, callback) -> Optional[Any]:
+        """
+        Call callback() whenever documents in collection change.
+
+        Returns a handle with an unsubscribe() method, or None if the
+        backend can't push changes.
+        """
+        return None
+
+
+class BaseBatch:
+    """Atomic group of writes committed together"""
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False) -> None:
+        raise NotImplementedError
+
+    def update(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def delete(self, collection: str, doc_id: str) -> None:
+        raise NotImplementedError
+
+    def commit(self) -> None:
+        raise NotImplementedError
+
+
+class BaseTransaction(BaseBatch):
+    """Writes committed together with the reads they were based on (see BaseBackend.run_transaction)"""
+
+    def get(self, collection: str, doc_id: str, fields: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Read a document; all reads must come before the first write"""
+        raise NotImplementedError
+
+
+def initialize_firebase_app():
+    """Initialize the Firebase Admin SDK app once per process"""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:
+        try:
+            # Try to get credentials from environment variable (for production)
+            firebase_config = os.environ.get('FIREBASE_CONFIG')
+            if firebase_config:
+                try:
+                    cred_dict = json.loads(firebase_config)
+                    cred = credentials.Certificate(cred_dict)
+                    print("Using Firebase credentials from environment variable")
+                except json.JSONDecodeError as e:
+                    print(f"Error parsing FIREBASE_CONFIG JSON: {e}")
+                    raise
+            else:
+                # Fallback to local file (for development)
+                from django.conf import settings
+                cred_path = os.path.join(settings.BASE_DIR, 'firebase_credentials.json')
+                if os.path.exists(cred_path):
+                    cred = credentials.Certificate(cred_path)
+                    print("Using Firebase credentials from local file")
+                else:
+                    raise FileNotFoundError("Firebase credentials not found. Please set FIREBASE_CONFIG environment variable or provide firebase_credentials.json file.")
+
+            firebase_admin.initialize_app(cred)
+            print("Firebase initialized successfully")
+        except Exception as e:
+            print(f"Error initializing Firebase: {e}")
+            raise
+
+
+def to_firestore(data):
+    """Swap backend-neutral write values (Increment) for the Firestore SDK's"""
+    if isinstance(data, dict):
+        return {key: to_firestore(value) for key, value in data.items()}
+    if isinstance(data, Increment):
+        from google.cloud import firestore
+        return firestore.Increment(data.value)
+    return data
+
+
+def rpc_options(read: bool = False) -> Dict[str, Any]:
+    """Timeout (and, for reads, retry) keyword arguments for a Firestore SDK call"""
+    timeout = call_timeout.get()
+    if timeout is None:
+        return {}
+    if read:
+        # Reads are retried by ResiliencePolicy; don't stack the SDK's retries on top
+        return {'timeout': timeout, 'retry': None}
+    return {'timeout': timeout}
+
+
+def build_firestore_query(db, collection, filters=None, order_by=None, limit=None, start_after=None,
+                          select=None):
+    """Build a Firestore query (sync or async client) from backend query arguments"""
+    query = db.collection(collection)
+    if select is not None:
+        query = query.select(select)
+    for field, op, value in filters or []:
+        query = query.where(field, op, value)
+    for field, direction in order_by or []:
+        query = query.order_by(field, direction=direction)
+    if start_after:
+        fields = [field for field, _ in order_by]
+        query = query.start_after(dict(zip(fields, start_after)))
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def check_aggregations(aggregations: Dict[str, Aggregation]):
+    """Raise ValueError for an aggregation the backends can't compute"""
+    for alias, (function, field) in aggregations.items():
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Unknown aggregation {function!r} for {alias!r}")
+        if function != 'count' and not field:
+            raise ValueError(f"Aggregation {function!r} for {alias!r} needs a field")
+
+
+def build_aggregation_query(query, aggregations: Dict[str, Aggregation]):
+    """Turn a Firestore query (sync or async) into an aggregation query"""
+    for alias, (function, field) in aggregations.items():
+        # Query and AggregationQuery both have count/sum/avg, each adding one aggregation
+        if function == 'count':
+            query = query.count(alias=alias)
+        else:
+            query = getattr(query, function)(field, alias=alias)
+    return query
+
+
+def aggregation_results(results) -> Dict[str, Any]:
+    """Read AggregationQuery.get() results into a dict keyed by alias"""
+    return {result.alias: result.value for result in results[0]}
+
+
+class FirestoreBackend(BaseBackend):
+    """Cloud Firestore backend using the Firebase Admin SDK"""
+    name = 'firestore'
+
+    def __init__(self):
+        from firebase_admin import firestore
+        initialize_firebase_app()
+        self._db = firestore.client()
+
+    @property
+    def client(self):
+        """Get Firestore database instance"""
+        return self._db
+
+    def set(self, collection, doc_id, data, merge=False):
+        self._db.collection(collection).document(doc_id).set(to_firestore(data), merge=merge, **rpc_options())
+
+    def get(self, collection, doc_id, fields=None):
+        doc = self._db.collection(collection).document(doc_id).get(field_paths=fields, **rpc_options(read=True))
+        if doc.exists:
+            return snapshot_to_dict(doc, fields)
+        return None
+
+    def get_many(self, collection, doc_ids, fields=None):
+        refs = [self._db.collection(collection).document(doc_id) for doc_id in doc_ids]
+        return {
+            doc.id: snapshot_to_dict(doc, fields)
+            for doc in self._db.get_all(refs, field_paths=fields, **rpc_options(read=True))
+            if doc.exists
+        }
+
+    def exists(self, collection, doc_id):
+        # Mask the read down to the small 'id' field; existence doesn't depend on it
+        return self._db.collection(collection).document(doc_id).get(
+            field_paths=['id'], **rpc_options(read=True)
+        ).exists
+
+    def update(self, collection, doc_id, data):
+        self._db.collection(collection).document(doc_id).update(to_firestore(data), **rpc_options())
+
+    def delete(self, collection, doc_id):
+        self._db.collection(collection).document(doc_id).delete(**rpc_options())
+
+    def query(self, collection, filters=None, order_by=None, limit=None, start_after=None, select=None):
+        query = build_firestore_query(self._db, collection, filters, order_by, limit, start_after, select)
+        docs = query.get(**rpc_options(read=True))
+        return [snapshot_to_dict(doc, select) for doc in docs]
+
+    def stream(self, collection, filters=None, order_by=None, limit=None, start_after=None, select=None):
+        for doc in build_firestore_query(self._db, collection, filters, order_by, limit, start_after, select).stream():
+            yield snapshot_to_dict(doc, select)
+
+    def aggregate(self, collection, aggregations, filters=None):
+        query = build_aggregation_query(build_firestore_query(self._db, collection, filters), aggregations)
+        return aggregation_results(query.get(**rpc_options(read=True)))
+
+    def batch(self):
+        return FirestoreBatch(self._db)
+
+    def run_transaction(self, func):
+        from google.cloud import firestore
+
+        @firestore.transactional
+        def run(transaction):
+            return func(FirestoreTransaction(self._db, transaction))
+        return run(self._db.transaction())
+
+    def watch(self, collection, callback):
+        initial = [True]
+
+        def on_snapshot(docs, changes, read_time):
+            # The first snapshot reports the documents already there, not a change
+            if initial[0]:
+                initial[0] = False
+                return
+            callback()
+
+        return self._db.collection(collection).on_snapshot(on_snapshot)
+
+
+def snapshot_to_dict(doc, select=None) -> Dict[str, Any]:
+    """Convert a Firestore DocumentSnapshot to a dict, keeping the id on projected reads"""
+    data = doc.to_dict() or {}
+    if select is not None:
+        # Projected reads don't return our stored 'id' unless asked for
+        data['id'] = doc.id
+    return data
+
+
+class FirestoreBatch(BaseBatch):
+    """Wrapper around firestore.WriteBatch"""
+
+    def __init__(self, db):
+        self._db = db
+        self._batch = db.batch()
+
+    def _ref(self, collection, doc_id):
+        return self._db.collection(collection).document(doc_id)
+
+    def set(self, collection, doc_id, data, merge=False):
+        self._batch.set(self._ref(collection, doc_id), to_firestore(data), merge=merge)
+
+    def update(self, collection, doc_id, data):
+        self._batch.update(self._ref(collection, doc_id), to_firestore(data))
+
+    def delete(self, collection, doc_id):
+        self._batch.delete(self._ref(collection, doc_id))
+
+    def commit(self):
+        self._batch.commit(**rpc_options())
+
+
+class FirestoreTransaction(FirestoreBatch, BaseTransaction):
+    """Wrapper around firestore.Transaction; firestore.transactional commits it"""
+
+    def __init__(self, db, transaction):
+        self._db = db
+        self._batch = transaction
+
+    def get(self, collection, doc_id, fields=None):
+        doc = self._ref(collection, doc_id).get(field_paths=fields, transaction=self._batch,
+                                                **rpc_options(read=True))
+        if doc.exists:
+            return snapshot_to_dict(doc, fields)
+        return None
+
+    def commit(self):
+        raise NotImplementedError("Transactions commit when the function run by run_transaction returns")
+
+
+def _copy(value):
+    """Copy nested dicts/lists so stored documents can't be mutated by callers"""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+# Firestore orders values of different types by type first
+_TYPE_RANKS = ((type(None), 0), (bool, 1), (int, 2), (float, 2), (datetime, 3), (str, 4), (bytes, 5))
+
+
+def _sort_key(value):
+    for value_type, rank in _TYPE_RANKS:
+        if isinstance(value, value_type):
+            return (rank, value)
+    return (6, repr(value))
+
+
+_MISSING = object()
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: _sort_key(a) < _sort_key(b),
+    '<=': lambda a, b: _sort_key(a) <= _sort_key(b),
+    '>': lambda a, b: _sort_key(a) > _sort_key(b),
+    '>=': lambda a, b: _sort_key(a) >= _sort_key(b),
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array-contains': lambda a, b: isinstance(a, list) and b in a,
+    'array-contains-any': lambda a, b: isinstance(a, list) and any(v in a for v in b),
+}
+
+
+def _lookup(data, field):
+    """Resolve a dotted field path, returning _MISSING if absent"""
+    value = data
+    for part in field.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def project_fields(doc: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Copy only the given (possibly dotted) fields of doc, plus its id"""
+    projected = {'id': doc.get('id')}
+    for field in fields:
+        value = _lookup(doc, field)
+        if value is _MISSING:
+            continue
+        target = projected
+        parts = field.split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = _copy(value)
+    return projected
+
+
+def _resolve(current, value):
+    """The value a field ends up with when `value` is written over `current`"""
+    if isinstance(value, Increment):
+        if isinstance(current, Increment):
+            # Two queued increments fold into one
+            return Increment(current.value + value.value)
+        if isinstance(current, (int, float)) and not isinstance(current, bool):
+            return current + value.value
+        return value.value
+    return _copy(value)
+
+
+def apply_update(doc: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """Apply update() semantics (dotted keys address nested fields) to doc in place"""
+    for field, value in data.items():
+        target = doc
+        parts = field.split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = _resolve(target.get(parts[-1]), value)
+
+
+def merge_fields(doc: Dict[str, Any], data: Dict[str, Any], partial: bool = False) -> Dict[str, Any]:
+    """
+    Apply set(merge=True) semantics (nested maps are merged, not replaced)
+    to doc in place. With `partial`, doc is itself a pending merge, so an
+    Increment of a field it doesn't hold stays an Increment.
+    """
+    for key, value in data.items():
+        current = doc.get(key)
+        if isinstance(value, dict):
+            if isinstance(current, dict):
+                doc[key] = merge_fields(current, value, partial)
+            else:
+                doc[key] = merge_fields({}, value, partial and key not in doc)
+        elif partial and key not in doc:
+            doc[key] = _copy(value)
+        else:
+            doc[key] = _resolve(current, value)
+    return doc
+
+
+def apply_writes(batch: 'BaseBatch', writes) -> 'BaseBatch':
+    """Queue (op, collection, doc_id, data) writes on a batch; op is set, merge, update or delete"""
+    for op, collection, doc_id, data in writes:
+        if op == 'delete':
+            batch.delete(collection, doc_id)
+        elif op == 'update':
+            batch.update(collection, doc_id, data)
+        else:
+            batch.set(collection, doc_id, data, merge=op == 'merge')
+    return batch
+
+
+def _is_after(doc, order_by, cursor):
+    """Whether doc sorts strictly after the cursor position"""
+    for (field, direction), cursor_value in zip(order_by, cursor):
+        value, cursor_key = _sort_key(_lookup(doc, field)), _sort_key(cursor_value)
+        if value != cursor_key:
+            return value < cursor_key if direction == DESCENDING else value > cursor_key
+    return False
+
+
+class LocalBackend(BaseBackend):
+    """
+    In-process backend that keeps documents in memory.
+
+    Mirrors Firestore semantics where they matter to callers: documents
+    missing a filtered or ordered field are left out of query results, and
+    updates to missing documents fail.
+    """
+    name = 'local'
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._watchers: Dict[str, list] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def client(self):
+        return None
+
+    def _collection(self, collection):
+        return self._collections.setdefault(collection, {})
+
+    def _notify(self, collection):
+        for callback in list(self._watchers.get(collection, [])):
+            callback()
+
+    def set(self, collection, doc_id, data, merge=False):
+        with self._lock:
+            docs = self._collection(collection)
+            if merge and doc_id in docs:
+                merge_fields(docs[doc_id], data)
+            else:
+                docs[doc_id] = merge_fields({}, data)
+        self._notify(collection)
+
+    def get(self, collection, doc_id, fields=None):
+        with self._lock:
+            doc = self._collections.get(collection, {}).get(doc_id)
+            if doc is None:
+                return None
+            if fields is not None:
+                return project_fields(doc, fields)
+            return _copy(doc)
+
+    def exists(self, collection, doc_id):
+        with self._lock:
+            return doc_id in self._collections.get(collection, {})
+
+    def get_many(self, collection, doc_ids, fields=None):
+        found = {}
+        for doc_id in doc_ids:
+            doc = self.get(collection, doc_id, fields=fields)
+            if doc is not None:
+                found[doc_id] = doc
+        return found
+
+    def update(self, collection, doc_id, data):
+        with self._lock:
+            doc = self._collections.get(collection, {}).get(doc_id)
+            if doc is None:
+                raise DocumentNotFound(f"No document to update: {collection}/{doc_id}")
+            apply_update(doc, data)
+        self._notify(collection)
+
+    def delete(self, collection, doc_id):
+        with self._lock:
+            self._collections.get(collection, {}).pop(doc_id, None)
+        self._notify(collection)
+
+    def query(self, collection, filters=None, order_by=None, limit=None, start_after=None, select=None):
+        with self._lock:
+            docs = list(self._collections.get(collection, {}).values())
+
+        for field, op, value in filters or []:
+            compare = _OPERATORS[op]
+            docs = [doc for doc in docs
+                    if _lookup(doc, field) is not _MISSING and compare(_lookup(doc, field), value)]
+
+        # Sort by the last key first so earlier keys take precedence
+        for field, direction in reversed(order_by or []):
+            docs = [doc for doc in docs if _lookup(doc, field) is not _MISSING]
+            docs.sort(key=lambda doc: _sort_key(_lookup(doc, field)),
+                      reverse=direction == DESCENDING)
+
+        if start_after:
+            docs = [doc for doc in docs if _is_after(doc, order_by, start_after)]
+
+        if limit:
+            docs = docs[:limit]
+        if select is not None:
+            return [project_fields(doc, select) for doc in docs]
+        return [_copy(doc) for doc in docs]
+
+    def stream(self, collection, filters=None, order_by=None, limit=None, start_after=None, select=None):
+        yield from self.query(collection, filters, order_by, limit, start_after, select)
+
+    def aggregate(self, collection, aggregations, filters=None):
+        docs = self.query(collection, filters=filters)
+        results = {}
+        for alias, (function, field) in aggregations.items():
+            if function == 'count':
+                results[alias] = len(docs)
+                continue
+            values = [value for value in (_lookup(doc, field) for doc in docs)
+                      if isinstance(value, (int, float)) and not isinstance(value, bool)]
+            if function == 'sum':
+                results[alias] = sum(values)
+            else:
+                results[alias] = sum(values) / len(values) if values else None
+        return results
+
+    def batch(self):
+        return LocalBatch(self)
+
+    def run_transaction(self, func):
+        # Holding the lock from the first read to the commit leaves nothing to retry
+        with self._lock:
+            transaction = LocalTransaction(self)
+            result = func(transaction)
+            transaction.commit()
+        return result
+
+    def watch(self, collection, callback):
+        watchers = self._watchers.setdefault(collection, [])
+        watchers.append(callback)
+        return _LocalWatch(watchers, callback)
+
+    def clear(self):
+        """Drop every stored document"""
+        with self._lock:
+            self._collections.clear()
+
+
+class _LocalWatch:
+    def __init__(self, watchers, callback):
+        self._watchers = watchers
+        self._callback = callback
+
+    def unsubscribe(self):
+        if self._callback in self._watchers:
+            self._watchers.remove(self._callback)
+
+
+class LocalBatch(BaseBatch):
+    """Buffers writes and applies them under the backend lock on commit"""
+
+    def __init__(self, backend: LocalBackend):
+        self._backend = backend
+        self._ops = []
+
+    def set(self, collection, doc_id, data, merge=False):
+        self._ops.append(('merge' if merge else 'set', collection, doc_id, _copy(data)))
+
+    def update(self, collection, doc_id, data):
+        self._ops.append(('update', collection, doc_id, _copy(data)))
+
+    def delete(self, collection, doc_id):
+        self._ops.append(('delete', collection, doc_id, None))
+
+    def commit(self):
+        backend = self._backend
+        with backend._lock:
+            # Check updates up front so a failing batch writes nothing
+            pending = {(c, d) for op, c, d, _ in self._ops if op in ('set', 'merge')}
+            for op, collection, doc_id, _ in self._ops:
+                if op == 'update' and (collection, doc_id) not in pending \
+                        and backend.get(collection, doc_id) is None:
+                    raise DocumentNotFound(f"No document to update: {collection}/{doc_id}")
+            for op, collection, doc_id, data in self._ops:
+                if op in ('set', 'merge'):
+                    backend.set(collection, doc_id, data, merge=op == 'merge')
+                elif op == 'update':
+                    backend.update(collection, doc_id, data)
+                else:
+                    backend.delete(collection, doc_id)
+        self._ops = []
+
+
+class LocalTransaction(LocalBatch, BaseTransaction):
+    """LocalBatch that can also read; LocalBackend.run_transaction holds the lock throughout"""
+
+    def get(self, collection, doc_id, fields=None):
+        return self._backend.get(collection, doc_id, fields=fields)
+
+
+BACKENDS = {
+    'firestore': FirestoreBackend,
+    'local': LocalBackend,
+}
+
+
+def get_backend(name: str = None) -> BaseBackend:
+    """Build the backend named in settings.FIREBASE_BACKEND (or a dotted class path)"""
+    if name is None:
+        from django.conf import settings
+        name = getattr(settings, 'FIREBASE_BACKEND', 'firestore')
+
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        from django.utils.module_loading import import_string
+        backend_class = import_string(name)
+    return backend_class()
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+
+class DocumentCache:
+    """
+    Per-process read-through cache for documents, keyed by collection and id.
+
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once `max_entries` is reached. A ttl of 0 disables the cache.
+    Expired entries are kept for a further `stale_ttl` seconds so they can
+    still be served by get_stale while the backend is unavailable.
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 1024, stale_ttl: float = 0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get a cached document, or None on a miss"""
+        if not self.enabled:
+            return None
+        key = (collection, doc_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, data = entry
+            now = time.monotonic()
+            if expires_at < now:
+                if expires_at + self.stale_ttl < now:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(data)
+
+    def get_stale(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get a cached document even if it has expired, within stale_ttl"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get((collection, doc_id))
+            if entry is None or entry[0] + self.stale_ttl < time.monotonic():
+                return None
+            self.stale_hits += 1
+            return dict(entry[1])
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        """Store a document"""
+        if not self.enabled:
+            return
+        key = (collection, doc_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(data))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, collection: str, doc_id: str) -> None:
+        """Invalidate a document"""
+        with self._lock:
+            self._entries.pop((collection, doc_id), None)
+
+    def clear(self) -> None:
+        """Invalidate everything"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'local',
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'stale_hits': self.stale_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class DjangoDocumentCache(DocumentCache):
+    """
+    Document cache stored in one of Django's CACHES, shared between processes.
+
+    Expiry and eviction are left to the Django cache backend, so evictions
+    are not counted. Entries are stored with their expiry time and kept by
+    the Django cache for ttl + stale_ttl, so stale reads work here too.
+    """
+
+    key_prefix = 'firebase:doc:v2'
+
+    def __init__(self, alias: str, ttl: float = 30, stale_ttl: float = 0):
+        super().__init__(ttl=ttl, max_entries=1, stale_ttl=stale_ttl)
+        self.alias = alias
+        self._generation = 0
+
+    @property
+    def _store(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def _key(self, collection, doc_id):
+        return f"{self.key_prefix}:{self._generation}:{collection}:{doc_id}"
+
+    def get(self, collection, doc_id):
+        if not self.enabled:
+            return None
+        entry = self._store.get(self._key(collection, doc_id))
+        data = entry[1] if entry is not None and entry[0] >= time.time() else None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def get_stale(self, collection, doc_id):
+        if not self.enabled:
+            return None
+        entry = self._store.get(self._key(collection, doc_id))
+        if entry is None:
+            return None
+        with self._lock:
+            self.stale_hits += 1
+        return entry[1]
+
+    def set(self, collection, doc_id, data):
+        if self.enabled:
+            # Wall-clock expiry, since entries are shared between processes
+            self._store.set(self._key(collection, doc_id), (time.time() + self.ttl, data),
+                            timeout=self.ttl + self.stale_ttl)
+
+    def delete(self, collection, doc_id):
+        self._store.delete(self._key(collection, doc_id))
+
+    def clear(self):
+        # Entries share the Django cache with other keys, so rather than
+        # clearing it, move this process onto a fresh key space
+        self._generation += 1
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({'backend': f"django:{self.alias}", 'entries': None, 'max_entries': None})
+        return stats
+
+
+def build_cache() -> DocumentCache:
+    """Build the document cache configured by the FIREBASE_CACHE_* settings"""
+    from django.conf import settings
+    ttl = getattr(settings, 'FIREBASE_CACHE_TTL', 30)
+    stale_ttl = getattr(settings, 'FIREBASE_CACHE_STALE_TTL', 0)
+    alias = getattr(settings, 'FIREBASE_CACHE_ALIAS', None)
+    if alias:
+        return DjangoDocumentCache(alias, ttl=ttl, stale_ttl=stale_ttl)
+    return DocumentCache(ttl=ttl, max_entries=getattr(settings, 'FIREBASE_CACHE_MAX_ENTRIES', 1024),
+                         stale_ttl=stale_ttl)
@@ -0,0 +1,155 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+CATALOG_VERSION_COLLECTION = 'meta'
+CATALOG_VERSION_DOC = 'services_catalog'
+
+
+class CatalogSnapshot:
+    """Services collection as loaded at one version, indexed for lookups"""
+
+    def __init__(self, services: List[Dict[str, Any]], version: Optional[str]):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.services = services
+        self.by_id = {service['id']: service for service in services if service.get('id')}
+        self.active = [service for service in services if service.get('is_active', True)]
+        self.by_name = {service['name']: service for service in self.active if service.get('name')}
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for service in self.active:
+            self.by_category.setdefault(service.get('category', ''), []).append(service)
+
+
+class ServiceCatalog:
+    """
+    Process-wide snapshot of the services catalog.
+
+    The whole collection is loaded once and served from memory. After `ttl`
+    seconds the snapshot is revalidated against a version stamp document,
+    which costs one read instead of a full collection scan; the collection
+    is only reloaded when the stamp has changed, or when there is no stamp
+    yet. Writes through FirebaseService bump the stamp; edits made any other
+    way (e.g. in the console) should call invalidate(). With `listen`
+    enabled a snapshot listener marks the catalog stale as soon as
+    Firestore reports a change.
+    """
+
+    def __init__(self, service, ttl: float = 300, listen: bool = False):
+        self._service = service
+        self.ttl = ttl
+        self.listen = listen
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._stale = False
+        self._watch = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return self._service.backend
+
+    def _read_version(self) -> Optional[str]:
+        stamp = self.backend.get(CATALOG_VERSION_COLLECTION, CATALOG_VERSION_DOC)
+        return stamp.get('version') if stamp else None
+
+    def _load(self) -> CatalogSnapshot:
+        version = self._read_version()
+        services = self.backend.query('services')
+        return CatalogSnapshot(services, version)
+
+    def _on_change(self):
+        self._stale = True
+
+    def _start_listener(self):
+        if self.listen and self._watch is None:
+            self._watch = self.backend.watch('services', self._on_change)
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Get the current snapshot, loading or revalidating it if needed"""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale \
+                and time.monotonic() - snapshot.loaded_at < self.ttl:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or self._stale:
+                # Listen first, so a change made during the load isn't missed
+                self._start_listener()
+                self._stale = False
+                try:
+                    self._snapshot = self._load()
+                except Exception as e:
+                    # Stay stale so the next call tries again
+                    self._stale = True
+                    if snapshot is None:
+                        raise
+                    print(f"Error reloading services catalog: {e}")
+                    return snapshot
+            elif time.monotonic() - snapshot.loaded_at >= self.ttl:
+                try:
+                    version = self._read_version()
+                except Exception as e:
+                    # Backend degraded: keep serving the snapshot we have
+                    print(f"Error revalidating services catalog: {e}")
+                    return snapshot
+                if version is not None and version == snapshot.version:
+                    snapshot.loaded_at = time.monotonic()
+                else:
+                    self._snapshot = self._load()
+            return self._snapshot
+
+    def all(self) -> List[Dict[str, Any]]:
+        """All services, including inactive ones"""
+        return [dict(service) for service in self.snapshot().services]
+
+    def active(self) -> List[Dict[str, Any]]:
+        """Services with is_active set"""
+        return [dict(service) for service in self.snapshot().active]
+
+    def by_category(self, category: str) -> List[Dict[str, Any]]:
+        """Active services in a category"""
+        return [dict(service) for service in self.snapshot().by_category.get(category, [])]
+
+    def by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Active service by its display name, or None"""
+        service = self.snapshot().by_name.get(name)
+        return dict(service) if service else None
+
+    def get(self, service_id: str) -> Optional[Dict[str, Any]]:
+        """Service by id, or None if it is not in the snapshot"""
+        service = self.snapshot().by_id.get(service_id)
+        return dict(service) if service else None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.snapshot().version
+
+    def invalidate(self):
+        """Bump the version stamp so every process reloads, and drop our snapshot"""
+        self.backend.set(CATALOG_VERSION_COLLECTION, CATALOG_VERSION_DOC, {
+            'version': uuid.uuid4().hex,
+            'updated_at': datetime.now()
+        })
+        self._stale = True
+
+    def reset(self):
+        """Forget the snapshot and any listener (after switching backends)"""
+        with self._lock:
+            if self._watch is not None:
+                self._watch.unsubscribe()
+            self._watch = None
+            self._snapshot = None
+            self._stale = False
+
+
+def build_catalog(service) -> ServiceCatalog:
+    """Build the services catalog configured by the FIREBASE_CATALOG_* settings"""
+    from django.conf import settings
+    return ServiceCatalog(
+        service,
+        ttl=getattr(settings, 'FIREBASE_CATALOG_TTL', 300),
+        listen=getattr(settings, 'FIREBASE_CATALOG_LISTEN', False),
+    )
@@ -1,330 +1,556 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Union
 from datetime import datetime
 from .firebase_service import firebase_service
+from .firebase_async import async_firebase_service
+from .bulk_orders import summarize_items
+from .doc_migrations import migrations_for
+from .firebase_pagination import Page
+from .model_schema import Field, SchemaModel
+from .order_columns import ORDER_COLUMN_FIELDS, OrderColumns
+from .order_stats import ORDER_STATS_FIELDS, order_stats_key
+from .identity_map import current_identity_map
 
-class FirebaseUser:
+class IdentityMappedModel(SchemaModel):
+    """
+    Identity-map aware lookups shared by the Firebase models.
+    
+    Inside a request (see core.middleware), an instance loaded once is
+    returned again by later lookups, and ids passed to prefetch() are
+    loaded together with the next lookup that misses.
+    """
+    collection = None
+    identity_fields = ('id',)
+    
+    @classmethod
+    def prefetch(cls, ids: List[str]) -> None:
+        """Queue ids to be loaded in one batched read with the next lookup"""
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            identity_map.queue(cls, ids)
+    
+    @classmethod
+    def _remember(cls, instance):
+        identity_map = current_identity_map()
+        if identity_map is not None and instance is not None:
+            identity_map.add(instance, cls.identity_fields)
+        return instance
+    
+    def _forget(self):
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            identity_map.forget(self)
+    
+    @classmethod
+    def _load_by_id(cls, doc_id: str, fetch) -> Optional[Any]:
+        """Load one instance via the identity map, falling back to fetch(doc_id)"""
+        identity_map = current_identity_map()
+        if identity_map is None:
+            data = fetch(doc_id)
+            return cls(data) if data else None
+        
+        instance = identity_map.get(cls, 'id', doc_id)
+        if instance is not None:
+            return instance
+        
+        pending = identity_map.take_pending(cls)
+        if pending:
+            pending.add(doc_id)
+            return cls._load_many(pending).get(doc_id)
+        
+        data = fetch(doc_id)
+        return cls._remember(cls(data)) if data else None
+    
+    @classmethod
+    def _load_many(cls, ids, fields: List[str] = None) -> Dict[str, Any]:
+        """Load several instances in one batched read, reusing mapped ones"""
+        identity_map = current_identity_map()
+        found = {}
+        missing = []
+        for doc_id in dict.fromkeys(ids):
+            instance = identity_map.get(cls, 'id', doc_id) if identity_map else None
+            if instance is None:
+                missing.append(doc_id)
+            else:
+                found[doc_id] = instance
+        
+        if missing:
+            docs = firebase_service.get_many(cls.collection, missing, fields=fields)
+            for doc_id, data in docs.items():
+                instance = cls(data, partial=fields is not None)
+                # Partially loaded instances must not satisfy later full lookups
+                found[doc_id] = cls._remember(instance) if fields is None else instance
+        return found
+
+
+    @classmethod
+    async def _aload_by_id(cls, doc_id: str, afetch) -> Optional[Any]:
+        """Async _load_by_id, falling back to await afetch(doc_id)"""
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            instance = identity_map.get(cls, 'id', doc_id)
+            if instance is not None:
+                return instance
+            pending = identity_map.take_pending(cls)
+            if pending:
+                pending.add(doc_id)
+                return (await cls._aload_many(pending)).get(doc_id)
+        
+        data = await afetch(doc_id)
+        return cls._remember(cls(data)) if data else None
+    
+    @classmethod
+    async def _aload_many(cls, ids, fields: List[str] = None) -> Dict[str, Any]:
+        """Async _load_many"""
+        identity_map = current_identity_map()
+        found = {}
+        missing = []
+        for doc_id in dict.fromkeys(ids):
+            instance = identity_map.get(cls, 'id', doc_id) if identity_map else None
+            if instance is None:
+                missing.append(doc_id)
+            else:
+                found[doc_id] = instance
+        
+        if missing:
+            docs = await async_firebase_service.get_many(cls.collection, missing, fields=fields)
+            for doc_id, data in docs.items():
+                instance = cls(data, partial=fields is not None)
+                found[doc_id] = cls._remember(instance) if fields is None else instance
+        return found
+
+
+class FirebaseUser(IdentityMappedModel):
     """Firebase-based User model"""
+    collection = 'users'
+    identity_fields = ('id', 'email')
     
-    def __init__(self, data: Dict[str, Any] = None):
-        if data:
-            self.id = data.get('id')
-            self.username = data.get('username')
-            self.email = data.get('email')
-            self.first_name = data.get('first_name', '')
-            self.last_name = data.get('last_name', '')
-            self.phone = data.get('phone', '')
-            self.is_vendor = data.get('is_vendor', False)
-            self.google_id = data.get('google_id')
-            self.profile_picture = data.get('profile_picture', '')
-            self.created_at = data.get('created_at')
-            self.updated_at = data.get('updated_at')
-        else:
-            self.id = None
-            self.username = None
-            self.email = None
-            self.first_name = ''
-            self.last_name = ''
-            self.phone = ''
-            self.is_vendor = False
-            self.google_id = None
-            self.profile_picture = ''
-            self.created_at = None
-            self.updated_at = None
+    id = Field(str, read_only=True)
+    username = Field(str)
+    email = Field(str)
+    first_name = Field(str, '')
+    last_name = Field(str, '')
+    phone = Field(str, '')
+    is_vendor = Field(bool, False)
+    google_id = Field(str)
+    profile_picture = Field(str, '')
+    created_at = Field(datetime, read_only=True)
+    updated_at = Field(datetime, read_only=True)
     
-    def save(self) -> str:
-        """Save user to Firebase"""
-        user_data = {
-            'username': self.username,
-            'email': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'phone': self.phone,
-            'is_vendor': self.is_vendor,
-            'google_id': self.google_id,
-            'profile_picture': self.profile_picture
-        }
+    def save(self, defer: bool = False) -> str:
+        """Save user to Firebase (in the background with defer=True); only changed fields are written"""
+        user_data = self._changed_data()
         
         if self.id:
             # Update existing user
-            firebase_service.update_user(self.id, user_data)
-            return self.id
+            if user_data and firebase_service.update_user(self.id, user_data, defer=defer):
+                self._mark_saved()
         else:
             # Create new user
-            self.id = firebase_service.create_user(user_data)
-            return self.id
+            self.id = firebase_service.create_user(user_data, defer=defer)
+            self._mark_saved()
+        self._remember(self)
+        return self.id
+    
+    async def asave(self) -> str:
+        """Save user to Firebase (async); only changed fields are written"""
+        user_data = self._changed_data()
+        
+        if self.id:
+            if user_data and await async_firebase_service.update_user(self.id, user_data):
+                self._mark_saved()
+        else:
+            self.id = await async_firebase_service.create_user(user_data)
+            self._mark_saved()
+        self._remember(self)
+        return self.id
     
     @classmethod
     def get_by_id(cls, user_id: str) -> Optional['FirebaseUser']:
         """Get user by ID"""
-        user_data = firebase_service.get_user(user_id)
-        if user_data:
-            return cls(user_data)
-        return None
+        return cls._load_by_id(user_id, firebase_service.get_user)
     
     @classmethod
     def get_by_email(cls, email: str) -> Optional['FirebaseUser']:
         """Get user by email"""
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            user = identity_map.get(cls, 'email', email)
+            if user is not None:
+                return user
         user_data = firebase_service.get_user_by_email(email)
         if user_data:
-            return cls(user_data)
+            return cls._remember(cls(user_data))
+        return None
+    
+    @classmethod
+    async def aget_by_id(cls, user_id: str) -> Optional['FirebaseUser']:
+        """Get user by ID (async)"""
+        return await cls._aload_by_id(user_id, async_firebase_service.get_user)
+    
+    @classmethod
+    async def aget_by_email(cls, email: str) -> Optional['FirebaseUser']:
+        """Get user by email (async)"""
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            user = identity_map.get(cls, 'email', email)
+            if user is not None:
+                return user
+        user_data = await async_firebase_service.get_user_by_email(email)
+        if user_data:
+            return cls._remember(cls(user_data))
         return None
     
     @classmethod
-    def create_user(cls, username: str, email: str, **kwargs) -> 'FirebaseUser':
-        """Create a new user"""
-        user = cls()
-        user.username = username
-        user.email = email
-        user.first_name = kwargs.get('first_name', '')
-        user.last_name = kwargs.get('last_name', '')
-        user.phone = kwargs.get('phone', '')
-        user.is_vendor = kwargs.get('is_vendor', False)
-        user.google_id = kwargs.get('google_id')
-        user.profile_picture = kwargs.get('profile_picture', '')
-        user.save()
+    def get_many(cls, user_ids: List[str]) -> Dict[str, 'FirebaseUser']:
+        """Get several users in one round trip, keyed by ID"""
+        return cls._load_many(user_ids)
+    
+    @classmethod
+    def create_user(cls, username: str, email: str, defer: bool = False, **kwargs) -> 'FirebaseUser':
+        """Create a new user (in the background with defer=True)"""
+        user = cls._build(username=username, email=email, **kwargs)
+        user.save(defer=defer)
+        return user
+    
+    @classmethod
+    async def acreate_user(cls, username: str, email: str, **kwargs) -> 'FirebaseUser':
+        """Create a new user (async)"""
+        user = cls._build(username=username, email=email, **kwargs)
+        await user.asave()
         return user
     
     def delete(self) -> bool:
         """Delete user"""
         if self.id:
+            self._forget()
             return firebase_service.delete_user(self.id)
         return False
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary"""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'phone': self.phone,
-            'is_vendor': self.is_vendor,
-            'google_id': self.google_id,
-            'profile_picture': self.profile_picture,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at
-        }
-    
     @property
     def full_name(self) -> str:
         """Get full name"""
         return f"{self.first_name} {self.last_name}".strip()
 
 
-class FirebaseOrder:
+order_migrations = migrations_for('orders')
+
+
+@order_migrations.register
+def _add_order_contact_fields(order: Dict[str, Any]) -> Dict[str, Any]:
+    # v1: create_order used to drop the order type and contact details
+    defaults = {'order_type': 'small', 'contact_name': '', 'contact_email': ''}
+    return {field: value for field, value in defaults.items() if field not in order}
+
+
+class FirebaseOrder(IdentityMappedModel):
     """Firebase-based Order model"""
+    collection = 'orders'
+    migrations = order_migrations
+    __slots__ = ('_counted',)
+    
+    id = Field(str, read_only=True)
+    user_id = Field(str)
+    service_type = Field(str)
+    description = Field(str, '')
+    pickup_location = Field(str, '')
+    delivery_location = Field(str, '')
+    pickup_date = Field()
+    delivery_date = Field()
+    price = Field(float, 0.0)
+    status = Field(str, 'pending')
+    vendor_id = Field(str)
+    special_instructions = Field(str, '')
+    order_type = Field(str, 'small')
+    contact_name = Field(str, '')
+    contact_email = Field(str, '')
+    contact_phone = Field(str, '')
+    file_url = Field(str, '')
+    schema_version = Field(int, order_migrations.version)
+    created_at = Field(datetime, read_only=True)
+    updated_at = Field(datetime, read_only=True)
     
-    def __init__(self, data: Dict[str, Any] = None):
-        if data:
-            self.id = data.get('id')
-            self.user_id = data.get('user_id')
-            self.service_type = data.get('service_type')
-            self.description = data.get('description', '')
-            self.pickup_location = data.get('pickup_location', '')
-            self.delivery_location = data.get('delivery_location', '')
-            self.pickup_date = data.get('pickup_date')
-            self.delivery_date = data.get('delivery_date')
-            self.price = data.get('price', 0.0)
-            self.status = data.get('status', 'pending')
-            self.vendor_id = data.get('vendor_id')
-            self.special_instructions = data.get('special_instructions', '')
-            self.contact_phone = data.get('contact_phone', '')
-            self.file_url = data.get('file_url', '')
-            self.created_at = data.get('created_at')
-            self.updated_at = data.get('updated_at')
+    def _loaded(self, data):
+        # (user_id, status, service_type) as counted in the order stats, if known
+        if data and all(field in data for field in ORDER_STATS_FIELDS):
+            self._counted = order_stats_key(data)
         else:
-            self.id = None
-            self.user_id = None
-            self.service_type = None
-            self.description = ''
-            self.pickup_location = ''
-            self.delivery_location = ''
-            self.pickup_date = None
-            self.delivery_date = None
-            self.price = 0.0
-            self.status = 'pending'
-            self.vendor_id = None
-            self.special_instructions = ''
-            self.contact_phone = ''
-            self.file_url = ''
-            self.created_at = None
-            self.updated_at = None
+            self._counted = None
     
     def save(self) -> str:
-        """Save order to Firebase"""
-        order_data = {
-            'user_id': self.user_id,
-            'service_type': self.service_type,
-            'description': self.description,
-            'pickup_location': self.pickup_location,
-            'delivery_location': self.delivery_location,
-            'pickup_date': self.pickup_date,
-            'delivery_date': self.delivery_date,
-            'price': self.price,
-            'status': self.status,
-            'vendor_id': self.vendor_id,
-            'special_instructions': self.special_instructions,
-            'contact_phone': self.contact_phone,
-            'file_url': self.file_url
-        }
+        """Save order to Firebase; only changed fields are written"""
+        order_data = self._changed_data()
         
         if self.id:
             # Update existing order
-            firebase_service.update_document('orders', self.id, order_data)
-            return self.id
+            if order_data and firebase_service.update_order(self.id, order_data, previous=self._counted):
+                self._recount(order_data)
+                self._mark_saved()
         else:
             # Create new order
             self.id = firebase_service.create_order(order_data)
-            return self.id
+            self._counted = order_stats_key(order_data)
+            self._mark_saved()
+        self._remember(self)
+        return self.id
+    
+    async def asave(self) -> str:
+        """Save order to Firebase (async); only changed fields are written"""
+        order_data = self._changed_data()
+        
+        if self.id:
+            if order_data and await async_firebase_service.update_order(self.id, order_data, previous=self._counted):
+                self._recount(order_data)
+                self._mark_saved()
+        else:
+            self.id = await async_firebase_service.create_order(order_data)
+            self._counted = order_stats_key(order_data)
+            self._mark_saved()
+        self._remember(self)
+        return self.id
     
     @classmethod
-    def get_by_id(cls, order_id: str) -> Optional['FirebaseOrder']:
-        """Get order by ID"""
-        order_data = firebase_service.get_order(order_id)
+    def get_by_id(cls, order_id: str, fields: List[str] = None) -> Optional['FirebaseOrder']:
+        """Get order by ID; with `fields`, the other attributes keep their defaults"""
+        if fields is None:
+            return cls._load_by_id(order_id, firebase_service.get_order)
+        
+        identity_map = current_identity_map()
+        order = identity_map.get(cls, 'id', order_id) if identity_map else None
+        if order is not None:
+            return order
+        order_data = firebase_service.get_order(order_id, fields=fields)
         if order_data:
-            return cls(order_data)
+            return cls(order_data, partial=True)
         return None
     
     @classmethod
-    def get_user_orders(cls, user_id: str) -> List['FirebaseOrder']:
+    async def aget_by_id(cls, order_id: str, fields: List[str] = None) -> Optional['FirebaseOrder']:
+        """Get order by ID (async)"""
+        if fields is None:
+            return await cls._aload_by_id(order_id, async_firebase_service.get_order)
+        
+        identity_map = current_identity_map()
+        order = identity_map.get(cls, 'id', order_id) if identity_map else None
+        if order is not None:
+            return order
+        order_data = await async_firebase_service.get_order(order_id, fields=fields)
+        if order_data:
+            return cls(order_data, partial=True)
+        return None
+    
+    @classmethod
+    async def aget_many(cls, order_ids: List[str], fields: List[str] = None) -> Dict[str, 'FirebaseOrder']:
+        """Get several orders keyed by ID (async)"""
+        return await cls._aload_many(order_ids, fields=fields)
+    
+    @classmethod
+    async def aexists(cls, order_id: str) -> bool:
+        """Check whether an order exists (async)"""
+        return await async_firebase_service.order_exists(order_id)
+    
+    @classmethod
+    def get_many(cls, order_ids: List[str], fields: List[str] = None) -> Dict[str, 'FirebaseOrder']:
+        """Get several orders in one round trip, keyed by ID; missing orders are left out"""
+        return cls._load_many(order_ids, fields=fields)
+    
+    @classmethod
+    def exists(cls, order_id: str) -> bool:
+        """Check whether an order exists"""
+        return firebase_service.order_exists(order_id)
+    
+    @classmethod
+    def get_user_orders(cls, user_id: str, limit: int = None) -> List['FirebaseOrder']:
         """Get all orders for a user"""
-        orders_data = firebase_service.get_user_orders(user_id)
+        orders_data = firebase_service.get_user_orders(user_id, limit=limit)
         return [cls(order_data) for order_data in orders_data]
     
     @classmethod
-    def get_all_orders(cls) -> List['FirebaseOrder']:
+    def get_user_orders_page(cls, user_id: str, page_size: int = None, page_token: str = None) -> Page:
+        """Get one page of a user's orders, newest first"""
+        page = firebase_service.get_user_orders_page(user_id, page_size=page_size, page_token=page_token)
+        return Page([cls(order_data) for order_data in page.items], page.next_token)
+    
+    @classmethod
+    async def aget_user_orders_page(cls, user_id: str, page_size: int = None, page_token: str = None) -> Page:
+        """Get one page of a user's orders, newest first (async)"""
+        page = await async_firebase_service.get_user_orders_page(user_id, page_size=page_size, page_token=page_token)
+        return Page([cls(order_data) for order_data in page.items], page.next_token)
+    
+    @classmethod
+    def get_all_orders(cls, limit: int = None) -> List['FirebaseOrder']:
         """Get all orders"""
-        orders_data = firebase_service.get_all_orders()
+        orders_data = firebase_service.get_all_orders(limit=limit)
         return [cls(order_data) for order_data in orders_data]
     
+    @classmethod
+    def get_all_orders_page(cls, page_size: int = None, page_token: str = None) -> Page:
+        """Get one page of all orders, newest first"""
+        page = firebase_service.get_all_orders_page(page_size=page_size, page_token=page_token)
+        return Page([cls(order_data) for order_data in page.items], page.next_token)
+    
+    @classmethod
+    def iter_orders(cls, filters: List = None, fields: List[str] = None, hydrate: bool = True,
+                    chunk_size: int = 500) -> Iterator[Union['FirebaseOrder', Dict[str, Any]]]:
+        """
+        Stream orders in constant memory for exports and backfills.
+        
+        With `fields`, only those fields are read; hydrated orders get
+        defaults for the rest. Pass hydrate=False to get plain dicts.
+        """
+        docs = firebase_service.iter_query('orders', filters=filters, fields=fields, chunk_size=chunk_size)
+        if not hydrate:
+            return docs
+        return (cls(order_data, partial=fields is not None) for order_data in docs)
+    
+    @classmethod
+    def get_user_orders_columns(cls, user_id: str, limit: int = None) -> OrderColumns:
+        """A user's orders as columns, for filtering, sorting and totals without an object per order"""
+        return OrderColumns.from_orders(firebase_service.get_user_orders(user_id, limit=limit))
+    
+    @classmethod
+    def get_all_orders_columns(cls, limit: int = None) -> OrderColumns:
+        """All orders as columns (admin function)"""
+        return OrderColumns.from_orders(firebase_service.get_all_orders(limit=limit))
+    
+    @classmethod
+    def iter_orders_columns(cls, filters: List = None, chunk_size: int = 500) -> OrderColumns:
+        """Stream matching orders, reading only the column fields, into columns"""
+        return OrderColumns.from_orders(cls.iter_orders(filters=filters, fields=ORDER_COLUMN_FIELDS,
+                                                        hydrate=False, chunk_size=chunk_size))
+    
     @classmethod
     def create_order(cls, user_id: str, service_type: str, **kwargs) -> 'FirebaseOrder':
         """Create a new order"""
-        order = cls()
-        order.user_id = user_id
-        order.service_type = service_type
-        order.description = kwargs.get('description', '')
-        order.pickup_location = kwargs.get('pickup_location', '')
-        order.delivery_location = kwargs.get('delivery_location', '')
-        order.pickup_date = kwargs.get('pickup_date')
-        order.delivery_date = kwargs.get('delivery_date')
-        order.price = kwargs.get('price', 0.0)
-        order.special_instructions = kwargs.get('special_instructions', '')
-        order.contact_phone = kwargs.get('contact_phone', '')
-        order.file_url = kwargs.get('file_url', '')
+        order = cls._build(user_id=user_id, service_type=service_type, **kwargs)
         order.save()
         return order
     
+    @classmethod
+    async def acreate_order(cls, user_id: str, service_type: str, **kwargs) -> 'FirebaseOrder':
+        """Create a new order (async)"""
+        order = cls._build(user_id=user_id, service_type=service_type, **kwargs)
+        await order.asave()
+        return order
+    
+    @classmethod
+    def bulk_create(cls, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create many orders in batched commits; returns per-order results"""
+        return firebase_service.bulk_create_orders([cls(kwargs)._save_data() for kwargs in orders])
+    
+    @classmethod
+    def submit_bulk_order(cls, user_id: str, items: List[Dict[str, Any]], **kwargs) -> str:
+        """
+        Queue a bulk order of validated line items (see bulk_orders.validate_items),
+        written in the background; returns the job id to poll with bulk_order_job().
+        """
+        order = cls._build(user_id=user_id, order_type='bulk', **dict(kwargs, **summarize_items(items)))
+        return firebase_service.bulk_orders.submit(user_id, order._save_data(), items)
+    
+    @classmethod
+    def bulk_order_job(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        """A bulk order job's status and progress"""
+        return firebase_service.get_bulk_order_job(job_id)
+    
+    def get_items(self) -> List[Dict[str, Any]]:
+        """This (bulk) order's line items"""
+        return firebase_service.get_order_items(self.id)
+    
     def update_status(self, status: str) -> bool:
         """Update order status"""
         self.status = status
-        return firebase_service.update_order_status(self.id, status)
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary"""
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'service_type': self.service_type,
-            'description': self.description,
-            'pickup_location': self.pickup_location,
-            'delivery_location': self.delivery_location,
-            'pickup_date': self.pickup_date,
-            'delivery_date': self.delivery_date,
-            'price': self.price,
-            'status': self.status,
-            'vendor_id': self.vendor_id,
-            'special_instructions': self.special_instructions,
-            'contact_phone': self.contact_phone,
-            'file_url': self.file_url,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at
-        }
-
-
-class FirebaseService:
+        updated = firebase_service.update_order_status(self.id, status, previous=self._counted)
+        self._status_updated(updated)
+        return updated
+    
+    async def aupdate_status(self, status: str) -> bool:
+        """Update order status (async)"""
+        self.status = status
+        updated = await async_firebase_service.update_order_status(self.id, status, previous=self._counted)
+        self._status_updated(updated)
+        return updated
+    
+    def _status_updated(self, updated: bool):
+        if updated:
+            self._recount({'status': self.status})
+            self._mark_saved('status')
+    
+    def _recount(self, changes: Dict[str, Any]):
+        # Track the stats key through a write, once it's known
+        if self._counted is not None or all(field in changes for field in ORDER_STATS_FIELDS):
+            self._counted = order_stats_key(changes, self._counted)
+    
+    @classmethod
+    def stats(cls, user_id: str = None) -> Optional[Dict[str, Any]]:
+        """Order counts (total, by_status, by_service_type) for a user, or for all orders"""
+        return firebase_service.get_order_stats(user_id)
+    
+    @classmethod
+    async def astats(cls, user_id: str = None) -> Optional[Dict[str, Any]]:
+        """Order counts for a user, or for all orders (async)"""
+        return await async_firebase_service.get_order_stats(user_id)
+    
+class FirebaseService(IdentityMappedModel):
     """Firebase-based Service model"""
+    collection = 'services'
     
-    def __init__(self, data: Dict[str, Any] = None):
-        if data:
-            self.id = data.get('id')
-            self.name = data.get('name')
-            self.description = data.get('description', '')
-            self.category = data.get('category', '')
-            self.base_price = data.get('base_price', 0.0)
-            self.is_active = data.get('is_active', True)
-            self.icon = data.get('icon', '')
-            self.created_at = data.get('created_at')
-            self.updated_at = data.get('updated_at')
-        else:
-            self.id = None
-            self.name = None
-            self.description = ''
-            self.category = ''
-            self.base_price = 0.0
-            self.is_active = True
-            self.icon = ''
-            self.created_at = None
-            self.updated_at = None
+    id = Field(str, read_only=True)
+    name = Field(str)
+    description = Field(str, '')
+    category = Field(str, '')
+    # The FirebaseOrder.service_type orders for this service get
+    service_type = Field(str, '')
+    base_price = Field(float, 0.0)
+    is_active = Field(bool, True)
+    icon = Field(str, '')
+    created_at = Field(datetime, read_only=True)
+    updated_at = Field(datetime, read_only=True)
     
     def save(self) -> str:
-        """Save service to Firebase"""
-        service_data = {
-            'name': self.name,
-            'description': self.description,
-            'category': self.category,
-            'base_price': self.base_price,
-            'is_active': self.is_active,
-            'icon': self.icon
-        }
+        """Save service to Firebase; only changed fields are written"""
+        service_data = self._changed_data()
         
         if self.id:
             # Update existing service
-            firebase_service.update_document('services', self.id, service_data)
-            return self.id
+            if service_data and firebase_service.update_document('services', self.id, service_data):
+                self._mark_saved()
         else:
             # Create new service
             self.id = firebase_service.create_service(service_data)
-            return self.id
+            self._mark_saved()
+        self._remember(self)
+        return self.id
     
     @classmethod
     def get_by_id(cls, service_id: str) -> Optional['FirebaseService']:
         """Get service by ID"""
-        service_data = firebase_service.get_service(service_id)
-        if service_data:
-            return cls(service_data)
-        return None
+        return cls._load_by_id(service_id, firebase_service.get_service)
     
     @classmethod
     def get_all_services(cls) -> List['FirebaseService']:
         """Get all active services"""
-        services_data = firebase_service.get_all_services()
-        return [cls(service_data) for service_data in services_data if service_data.get('is_active', True)]
+        services_data = firebase_service.get_active_services()
+        return [cls(service_data) for service_data in services_data]
+    
+    @classmethod
+    def get_by_name(cls, name: str) -> Optional['FirebaseService']:
+        """Get an active service by its display name"""
+        service_data = firebase_service.get_service_by_name(name)
+        return cls(service_data) if service_data else None
+    
+    @classmethod
+    def get_by_category(cls, category: str) -> List['FirebaseService']:
+        """Get active services in a category"""
+        services_data = firebase_service.get_services_by_category(category)
+        return [cls(service_data) for service_data in services_data]
     
     @classmethod
     def create_service(cls, name: str, **kwargs) -> 'FirebaseService':
         """Create a new service"""
-        service = cls()
-        service.name = name
-        service.description = kwargs.get('description', '')
-        service.category = kwargs.get('category', '')
-        service.base_price = kwargs.get('base_price', 0.0)
-        service.is_active = kwargs.get('is_active', True)
-        service.icon = kwargs.get('icon', '')
+        service = cls._build(name=name, **kwargs)
         service.save()
         return service
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'category': self.category,
-            'base_price': self.base_price,
-            'is_active': self.is_active,
-            'icon': self.icon,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at
-        }
+    @classmethod
+    def bulk_create_services(cls, services: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create many services in batched commits; returns per-service results"""
+        return firebase_service.bulk_create('services', [cls(kwargs)._save_data() for kwargs in services])
@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Generic, Iterator, List, Optional, TypeVar
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+T = TypeVar('T')
+
+
+class InvalidPageToken(ValueError):
+    """Raised when a page token can't be decoded"""
+
+
+class Page(Generic[T]):
+    """One page of query results plus the token for the next page"""
+
+    def __init__(self, items: List[T], next_token: Optional[str] = None):
+        self.items = items
+        self.next_token = next_token
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_token is not None
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+def clamp_page_size(page_size: Optional[int]) -> int:
+    """Keep a requested page size within 1..MAX_PAGE_SIZE"""
+    if not page_size:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+
+def with_id_tiebreak(order_by: Optional[List], default_direction: str) -> List:
+    """
+    Append the document id as a final sort key (if not already there) so a
+    cursor position is unique even when earlier keys tie.
+    """
+    order_by = list(order_by or [])
+    if not any(field == 'id' for field, _ in order_by):
+        order_by.append(('id', order_by[-1][1] if order_by else default_direction))
+    return order_by
+
+
+def page_cursor(page_token: Optional[str], order_by: List) -> Optional[List[Any]]:
+    """Decode a page token and check it fits the query's sort keys"""
+    if not page_token:
+        return None
+    cursor = decode_page_token(page_token)
+    if len(cursor) != len(order_by):
+        raise InvalidPageToken("Page token does not match this query")
+    return cursor
+
+
+def build_page(docs: List[Any], page_size: int, order_by: List) -> Page:
+    """Make a Page from up to page_size + 1 fetched documents"""
+    next_token = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        last = docs[-1]
+        next_token = encode_page_token([last.get(field) for field, _ in order_by])
+    return Page(docs, next_token)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and '$dt' in value:
+        return datetime.fromisoformat(value['$dt'])
+    return value
+
+
+def encode_page_token(cursor: List[Any]) -> str:
+    """Turn cursor values (one per order_by field) into an opaque URL-safe token"""
+    payload = json.dumps([_encode_value(value) for value in cursor], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_page_token(token: str) -> List[Any]:
+    """Reverse encode_page_token"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list):
+            raise ValueError('cursor is not a list')
+        return [_decode_value(value) for value in values]
+    except (ValueError, TypeError) as e:
+        raise InvalidPageToken(f"Invalid page token: {e}")
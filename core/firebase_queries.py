@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .firebase_backends import ASCENDING, DESCENDING
+
+EQUALITY_OPS = ('==', 'in')
+ARRAY_OPS = ('array-contains', 'array-contains-any')
+RANGE_OPS = ('<', '<=', '>', '>=', '!=', 'not-in')
+
+
+def _op_kind(op: str) -> str:
+    if op in EQUALITY_OPS:
+        return 'eq'
+    if op in ARRAY_OPS:
+        return 'array'
+    if op in RANGE_OPS:
+        return 'range'
+    raise ValueError(f"Unknown filter operator {op!r}")
+
+
+def shape_key(collection: str, filters=None, order_by=None) -> tuple:
+    """
+    What makes two queries need the same index: the collection, which
+    fields are filtered and how (values don't matter), and the sort order.
+    """
+    filtered = tuple(sorted({(filter_[0], _op_kind(filter_[1])) for filter_ in filters or []}))
+    return collection, filtered, tuple((field, direction) for field, direction in order_by or [])
+
+
+class QueryShape:
+    """
+    One kind of query FirebaseService runs.
+
+    `filters` lists (field, op) pairs and `order_by` (field, direction)
+    pairs, as passed to BaseBackend.query. Shapes with no filters read a
+    whole collection; `allow_scan` records that this is intended.
+    """
+
+    def __init__(self, name: str, collection: str, filters: List[Tuple[str, str]] = None,
+                 order_by: List[Tuple[str, str]] = None, allow_scan: bool = False, description: str = ''):
+        self.name = name
+        self.collection = collection
+        self.filters = list(filters or [])
+        self.order_by = list(order_by or [])
+        self.allow_scan = allow_scan
+        self.description = description
+        self.key = shape_key(collection, self.filters, self.order_by)
+
+    @property
+    def is_scan(self) -> bool:
+        return not self.filters
+
+    def index_fields(self) -> List[Dict[str, str]]:
+        """Fields of the composite index this shape needs, in order, or [] if built-in indexes do"""
+        _, filtered, order_by = self.key
+        fields = []
+        seen = set()
+        for field, kind in filtered:
+            if kind == 'eq' and field not in seen:
+                fields.append({'fieldPath': field, 'order': ASCENDING})
+                seen.add(field)
+        for field, kind in filtered:
+            if kind == 'array' and field not in seen:
+                fields.append({'fieldPath': field, 'arrayConfig': 'CONTAINS'})
+                seen.add(field)
+        # An inequality field sorts first unless the query orders by it itself
+        ordered = {field for field, _ in order_by}
+        for field, kind in filtered:
+            if kind == 'range' and field not in seen and field not in ordered:
+                fields.append({'fieldPath': field, 'order': ASCENDING})
+                seen.add(field)
+        for field, direction in order_by:
+            if field not in seen:
+                fields.append({'fieldPath': field, 'order': direction})
+                seen.add(field)
+
+        # Equality filters alone are served by merging single-field indexes
+        equality_only = all(kind == 'eq' for _, kind in filtered) and not order_by
+        if len(fields) < 2 or equality_only:
+            return []
+        return fields
+
+    def describe(self) -> str:
+        parts = [self.collection]
+        if self.filters:
+            parts.append('where ' + ', '.join(f"{field} {op}" for field, op in self.filters))
+        if self.order_by:
+            parts.append('order by ' + ', '.join(f"{field} {direction}" for field, direction in self.order_by))
+        return ' '.join(parts)
+
+
+def _index_key(index: Dict[str, Any]) -> tuple:
+    return index['collectionGroup'], tuple(
+        (field['fieldPath'], field.get('order') or field.get('arrayConfig')) for field in index['fields']
+    )
+
+
+class QueryCatalogue:
+    """Registry of every query shape the app runs, and the indexes they need"""
+
+    def __init__(self, shapes: List[QueryShape] = ()):
+        self._shapes: Dict[tuple, QueryShape] = {}
+        for shape in shapes:
+            self.register(shape)
+
+    def register(self, shape: QueryShape) -> QueryShape:
+        """Add a shape; registering the same shape twice keeps the first name"""
+        self._shapes.setdefault(shape.key, shape)
+        return shape
+
+    def find(self, collection: str, filters=None, order_by=None) -> Optional[QueryShape]:
+        """The catalogued shape a query has, or None"""
+        return self._shapes.get(shape_key(collection, filters, order_by))
+
+    def __iter__(self) -> Iterator[QueryShape]:
+        return iter(self._shapes.values())
+
+    def indexes(self) -> List[Dict[str, Any]]:
+        """Composite index definitions (firestore.indexes.json format) for every shape"""
+        indexes = {}
+        for shape in self:
+            fields = shape.index_fields()
+            if fields:
+                index = {'collectionGroup': shape.collection, 'queryScope': 'COLLECTION', 'fields': fields}
+                indexes.setdefault(_index_key(index), index)
+        return [indexes[key] for key in sorted(indexes)]
+
+    def manifest(self, field_overrides: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """The contents of firestore.indexes.json"""
+        return {'indexes': self.indexes(), 'fieldOverrides': list(field_overrides or [])}
+
+    def missing_indexes(self, manifest: Dict[str, Any]) -> List[QueryShape]:
+        """Shapes whose composite index isn't in a firestore.indexes.json manifest"""
+        deployed = {_index_key(index) for index in manifest.get('indexes', [])}
+        missing = []
+        for shape in self:
+            fields = shape.index_fields()
+            if fields and _index_key({'collectionGroup': shape.collection, 'fields': fields}) not in deployed:
+                missing.append(shape)
+        return missing
+
+    def unintended_scans(self) -> List[QueryShape]:
+        """Shapes that read a whole collection without saying so"""
+        return [shape for shape in self if shape.is_scan and not shape.allow_scan]
+
+
+ORDERS_BY_NEWEST = [('created_at', DESCENDING)]
+ORDERS_BY_NEWEST_PAGED = [('created_at', DESCENDING), ('id', DESCENDING)]
+CREATED_BETWEEN = [('created_at', '>='), ('created_at', '<')]
+
+# Every query FirebaseService and its callers run. Add a shape here with
+# any new query, then regenerate firestore.indexes.json:
+#   python manage.py firestore_indexes
+catalogue = QueryCatalogue([
+    QueryShape('user_by_email', 'users', filters=[('email', '==')]),
+    QueryShape('user_orders', 'orders', filters=[('user_id', '==')], order_by=ORDERS_BY_NEWEST),
+    QueryShape('user_orders_page', 'orders', filters=[('user_id', '==')], order_by=ORDERS_BY_NEWEST_PAGED),
+    QueryShape('user_orders_latest', 'orders', filters=[('user_id', '==')], order_by=[('updated_at', DESCENDING)],
+               description="Version stamp of a user's order listing (with user_orders_count)"),
+    QueryShape('user_orders_count', 'orders', filters=[('user_id', '==')],
+               description="Version stamp of a user's order listing"),
+    QueryShape('all_orders', 'orders', order_by=ORDERS_BY_NEWEST, allow_scan=True,
+               description='Admin listing'),
+    QueryShape('all_orders_page', 'orders', order_by=ORDERS_BY_NEWEST_PAGED, allow_scan=True,
+               description='Admin listing, one page at a time'),
+    QueryShape('iter_orders', 'orders', order_by=[('id', ASCENDING)], allow_scan=True,
+               description='Exports, backfills and rebuild_order_stats'),
+    QueryShape('iter_order_stats', 'order_stats', order_by=[('id', ASCENDING)], allow_scan=True,
+               description='rebuild_order_stats'),
+    QueryShape('services_catalog', 'services', allow_scan=True,
+               description='Services catalog snapshot, reloaded only when its version changes'),
+    QueryShape('orders_count', 'orders', allow_scan=True, description='Aggregations over every order'),
+    QueryShape('order_items', 'order_items', filters=[('order_id', '==')], order_by=[('line', ASCENDING)],
+               description='Line items of a bulk order'),
+    QueryShape('orders_created_between', 'orders', filters=CREATED_BETWEEN, description='Order report'),
+    QueryShape('orders_by_status_created_between', 'orders', filters=[('status', '==')] + CREATED_BETWEEN,
+               description='Order report'),
+    QueryShape('orders_by_service_type_created_between', 'orders',
+               filters=[('service_type', '==')] + CREATED_BETWEEN, description='Order report'),
+])
+
+
+class QueryChecker:
+    """
+    Checks queries against the catalogue as they run, logging each
+    uncatalogued shape once (with the index it would need) so a missing
+    index shows up in the logs before Firestore rejects the query.
+    mode 'off' skips the check.
+    """
+
+    def __init__(self, catalogue: QueryCatalogue, mode: str = 'warn'):
+        self.catalogue = catalogue
+        self.mode = mode
+        self._reported = set()
+        self._lock = threading.Lock()
+
+    def check(self, collection: str, filters=None, order_by=None):
+        if self.mode == 'off' or self.catalogue.find(collection, filters, order_by) is not None:
+            return
+        shape = QueryShape('uncatalogued', collection, [(field, op) for field, op, _ in filters or []], order_by)
+        message = f"Uncatalogued Firestore query: {shape.describe()}"
+        fields = shape.index_fields()
+        if fields:
+            message += ' (needs composite index ' + ', '.join(
+                f"{field['fieldPath']} {field.get('order') or field.get('arrayConfig')}" for field in fields) + ')'
+        elif shape.is_scan:
+            message += ' (reads the whole collection)'
+        with self._lock:
+            if shape.key in self._reported:
+                return
+            self._reported.add(shape.key)
+        print(message)
+
+
+def indexes_path() -> str:
+    from django.conf import settings
+    return str(getattr(settings, 'FIREBASE_INDEXES_PATH', None)
+               or os.path.join(settings.BASE_DIR, 'firestore.indexes.json'))
+
+
+def load_manifest(path: str = None) -> Optional[Dict[str, Any]]:
+    """Read firestore.indexes.json, or None if there isn't one"""
+    path = path or indexes_path()
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_query_checker() -> QueryChecker:
+    """Build the checker configured by FIREBASE_QUERY_CHECK"""
+    from django.conf import settings
+    return QueryChecker(catalogue, mode=getattr(settings, 'FIREBASE_QUERY_CHECK', 'warn'))
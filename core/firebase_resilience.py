@@ -0,0 +1,511 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from .firebase_backends import BaseBackend, BaseBatch, call_timeout as _call_timeout
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar('firebase_deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request's Firestore time budget has run out"""
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the backend while the circuit breaker is open"""
+
+
+@contextmanager
+def request_budget(seconds: Optional[float]):
+    """Limit the total time Firestore calls may take inside the block"""
+    if not seconds:
+        yield
+        return
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current request budget, or None if there is none"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether an error means the backend is slow or unavailable, rather than the call being wrong"""
+    if isinstance(exc, (TimeoutError, ConnectionError, concurrent.futures.TimeoutError)):
+        return True
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return False
+    return isinstance(exc, (
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.GatewayTimeout,
+        api_exceptions.InternalServerError,
+        api_exceptions.TooManyRequests,
+        api_exceptions.Aborted,
+    ))
+
+
+def is_degraded(exc: BaseException) -> bool:
+    """Whether a failed read may fall back to stale cached data"""
+    return isinstance(exc, CircuitOpen) or is_transient(exc)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` transient failures in a row the circuit opens
+    and calls fail fast for `reset_timeout` seconds. Then a single trial call
+    is let through: success closes the circuit, failure re-opens it. A
+    threshold of 0 disables the breaker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently being failed fast"""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State and counters, read together"""
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'times_opened': self.times_opened}
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; every allowed call must be recorded"""
+        if not self.failure_threshold:
+            return True
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResiliencePolicy:
+    """
+    Deadlines, retries, hedging and circuit breaking for backend calls.
+
+    Every call gets a timeout of at most `call_timeout`, cut down to what is
+    left of the request budget. Idempotent calls are retried up to
+    `read_retries` times on transient errors with full-jitter exponential
+    backoff. Hedged calls start a second, identical call if the first has not
+    answered within `hedge_delay` seconds and take whichever finishes first;
+    the other is cancelled (a thread already running it can't be stopped,
+    and ends at its own call timeout). Counters may be updated from several
+    threads, so they change under a lock.
+    """
+
+    def __init__(self, call_timeout: Optional[float] = None, read_retries: int = 0,
+                 retry_base_delay: float = 0.05, retry_max_delay: float = 1.0,
+                 hedge_delay: Optional[float] = None, hedge_workers: int = 8,
+                 breaker: CircuitBreaker = None):
+        self.call_timeout = call_timeout
+        self.read_retries = read_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.hedge_delay = hedge_delay
+        self.hedge_workers = hedge_workers
+        self.breaker = breaker or CircuitBreaker(failure_threshold=0)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+        self.deadlines_exceeded = 0
+
+    def count(self, counter: str, n: int = 1):
+        """Add to one of the stats counters"""
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def _attempt_timeout(self) -> Optional[float]:
+        """Timeout for the next attempt; raises once the request budget is spent"""
+        remaining = remaining_budget()
+        if remaining is not None and remaining <= 0:
+            self.count('deadlines_exceeded')
+            raise DeadlineExceeded("Firestore request budget exhausted")
+        if remaining is None:
+            return self.call_timeout
+        if self.call_timeout is None:
+            return remaining
+        return min(self.call_timeout, remaining)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self.count('rejected')
+            raise CircuitOpen("Firestore circuit breaker is open")
+
+    def _record(self, exc: Optional[BaseException]):
+        # Errors like NotFound come from a healthy backend
+        if exc is not None and is_transient(exc):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _should_retry(self, exc: BaseException, attempt: int, attempts: int) -> Optional[float]:
+        """Backoff delay before the next attempt, or None to give up"""
+        if attempt + 1 >= attempts or not is_transient(exc) or self.breaker.state == CircuitBreaker.OPEN:
+            return None
+        delay = self._backoff(attempt)
+        remaining = remaining_budget()
+        if remaining is not None and delay >= remaining:
+            return None
+        self.count('retries')
+        return delay
+
+    # Synchronous calls
+
+    def call(self, fn, *args, idempotent: bool = False, hedge: bool = False, **kwargs):
+        """Call fn(*args, **kwargs) under the policy"""
+        attempts = 1 + (self.read_retries if idempotent else 0)
+        for attempt in range(attempts):
+            timeout = self._attempt_timeout()
+            self._admit()
+            try:
+                if hedge and idempotent and self.hedge_delay is not None:
+                    result = self._hedged(fn, args, kwargs, timeout)
+                else:
+                    result = self._attempt(fn, args, kwargs, timeout)
+            except Exception as e:
+                self._record(e)
+                delay = self._should_retry(e, attempt, attempts)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                self._record(None)
+                return result
+
+    def _attempt(self, fn, args, kwargs, timeout):
+        token = _call_timeout.set(timeout)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _call_timeout.reset(token)
+
+    def _hedge_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.hedge_workers, thread_name_prefix='firebase-hedge'
+                    )
+        return self._executor
+
+    def _submit(self, fn, args, kwargs, timeout):
+        context = contextvars.copy_context()
+        return self._hedge_executor().submit(context.run, self._attempt, fn, args, kwargs, timeout)
+
+    def _hedged(self, fn, args, kwargs, timeout):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        futures = [self._submit(fn, args, kwargs, timeout)]
+        done, _ = concurrent.futures.wait(futures, timeout=self.hedge_delay)
+        if not done:
+            self.count('hedges')
+            futures.append(self._submit(fn, args, kwargs, timeout))
+
+        pending = set(futures)
+        error = None
+        try:
+            while pending:
+                wait_for = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=wait_for, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if not done:
+                    self.count('deadlines_exceeded')
+                    raise DeadlineExceeded(f"Firestore call took longer than {timeout:.2f}s")
+                for future in done:
+                    if future.exception() is None:
+                        if len(futures) > 1 and future is futures[1]:
+                            self.count('hedge_wins')
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    # Asynchronous calls
+
+    async def acall(self, fn, *args, idempotent: bool = False, hedge: bool = False, **kwargs):
+        """Await fn(*args, **kwargs) under the policy"""
+        attempts = 1 + (self.read_retries if idempotent else 0)
+        for attempt in range(attempts):
+            timeout = self._attempt_timeout()
+            self._admit()
+            try:
+                if hedge and idempotent and self.hedge_delay is not None:
+                    result = await self._ahedged(fn, args, kwargs, timeout)
+                else:
+                    result = await self._aattempt(fn, args, kwargs, timeout)
+            except Exception as e:
+                self._record(e)
+                delay = self._should_retry(e, attempt, attempts)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                self._record(None)
+                return result
+
+    async def _aattempt(self, fn, args, kwargs, timeout):
+        token = _call_timeout.set(timeout)
+        try:
+            return await asyncio.wait_for(fn(*args, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            self.count('deadlines_exceeded')
+            raise DeadlineExceeded(f"Firestore call took longer than {timeout:.2f}s")
+        finally:
+            _call_timeout.reset(token)
+
+    async def _ahedged(self, fn, args, kwargs, timeout):
+        tasks = [asyncio.ensure_future(self._aattempt(fn, args, kwargs, timeout))]
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+        if not done:
+            self.count('hedges')
+            tasks.append(asyncio.ensure_future(self._aattempt(fn, args, kwargs, timeout)))
+
+        pending = set(tasks)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1 and task is tasks[1]:
+                            self.count('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state and retry/hedge counters"""
+        breaker = self.breaker.snapshot()
+        with self._counter_lock:
+            return {
+                'breaker_state': breaker['state'],
+                'consecutive_failures': breaker['failures'],
+                'times_opened': breaker['times_opened'],
+                'rejected': self.rejected,
+                'retries': self.retries,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'deadlines_exceeded': self.deadlines_exceeded,
+            }
+
+
+class ResilientBackend(BaseBackend):
+    """
+    Backend wrapper that runs every call through a ResiliencePolicy, and
+    queries past the query catalogue's checker if one is given.
+    """
+
+    def __init__(self, backend: BaseBackend, policy: ResiliencePolicy, checker=None):
+        self.inner = backend
+        self.policy = policy
+        self.checker = checker
+        self.name = backend.name
+
+    def _check(self, collection, filters, order_by):
+        if self.checker is not None:
+            self.checker.check(collection, filters, order_by)
+
+    @property
+    def client(self):
+        return self.inner.client
+
+    def set(self, collection, doc_id, data, merge=False):
+        return self.policy.call(self.inner.set, collection, doc_id, data, merge=merge)
+
+    def get(self, collection, doc_id, fields=None):
+        return self.policy.call(self.inner.get, collection, doc_id, fields=fields, idempotent=True, hedge=True)
+
+    def exists(self, collection, doc_id):
+        return self.policy.call(self.inner.exists, collection, doc_id, idempotent=True, hedge=True)
+
+    def get_many(self, collection, doc_ids, fields=None):
+        return self.policy.call(self.inner.get_many, collection, doc_ids, fields=fields,
+                                idempotent=True, hedge=True)
+
+    def update(self, collection, doc_id, data):
+        return self.policy.call(self.inner.update, collection, doc_id, data)
+
+    def delete(self, collection, doc_id):
+        return self.policy.call(self.inner.delete, collection, doc_id)
+
+    def query(self, collection, filters=None, order_by=None, limit=None, start_after=None, select=None):
+        self._check(collection, filters, order_by)
+        return self.policy.call(self.inner.query, collection, filters=filters, order_by=order_by,
+                                limit=limit, start_after=start_after, select=select,
+                                idempotent=True, hedge=True)
+
+    def stream(self, collection, filters=None, order_by=None, limit=None, start_after=None, select=None):
+        self._check(collection, filters, order_by)
+        # Streams are consumed lazily, so only an open breaker applies
+        if self.policy.breaker.is_open:
+            self.policy.count('rejected')
+            raise CircuitOpen("Firestore circuit breaker is open")
+        return self.inner.stream(collection, filters=filters, order_by=order_by, limit=limit,
+                                 start_after=start_after, select=select)
+
+    def aggregate(self, collection, aggregations, filters=None):
+        self._check(collection, filters, None)
+        return self.policy.call(self.inner.aggregate, collection, aggregations, filters=filters,
+                                idempotent=True, hedge=True)
+
+    def batch(self):
+        return ResilientBatch(self.inner.batch(), self.policy)
+
+    def run_transaction(self, func):
+        # Never retried here: the backend reruns func itself on contention
+        return self.policy.call(self.inner.run_transaction, func)
+
+    def watch(self, collection, callback):
+        return self.inner.watch(collection, callback)
+
+
+class ResilientBatch(BaseBatch):
+    """Batch whose commit runs through a ResiliencePolicy (never retried)"""
+
+    def __init__(self, batch: BaseBatch, policy: ResiliencePolicy):
+        self._batch = batch
+        self._policy = policy
+
+    def set(self, collection, doc_id, data, merge=False):
+        self._batch.set(collection, doc_id, data, merge=merge)
+
+    def update(self, collection, doc_id, data):
+        self._batch.update(collection, doc_id, data)
+
+    def delete(self, collection, doc_id):
+        self._batch.delete(collection, doc_id)
+
+    def commit(self):
+        return self._policy.call(self._batch.commit)
+
+
+class AsyncResilientBackend:
+    """Async counterpart of ResilientBackend"""
+
+    def __init__(self, backend, policy: ResiliencePolicy, checker=None):
+        self.inner = backend
+        self.policy = policy
+        self.checker = checker
+        self.name = backend.name
+
+    def _check(self, collection, filters, order_by):
+        if self.checker is not None:
+            self.checker.check(collection, filters, order_by)
+
+    async def set(self, collection, doc_id, data, merge=False):
+        return await self.policy.acall(self.inner.set, collection, doc_id, data, merge=merge)
+
+    async def get(self, collection, doc_id, fields=None):
+        return await self.policy.acall(self.inner.get, collection, doc_id, fields=fields,
+                                       idempotent=True, hedge=True)
+
+    async def exists(self, collection, doc_id):
+        return await self.policy.acall(self.inner.exists, collection, doc_id, idempotent=True, hedge=True)
+
+    async def get_many(self, collection, doc_ids, fields=None):
+        return await self.policy.acall(self.inner.get_many, collection, doc_ids, fields=fields,
+                                       idempotent=True, hedge=True)
+
+    async def update(self, collection, doc_id, data):
+        return await self.policy.acall(self.inner.update, collection, doc_id, data)
+
+    async def delete(self, collection, doc_id):
+        return await self.policy.acall(self.inner.delete, collection, doc_id)
+
+    async def query(self, collection, filters=None, order_by=None, limit=None, start_after=None, select=None):
+        self._check(collection, filters, order_by)
+        return await self.policy.acall(self.inner.query, collection, filters=filters, order_by=order_by,
+                                       limit=limit, start_after=start_after, select=select,
+                                       idempotent=True, hedge=True)
+
+    async def aggregate(self, collection, aggregations, filters=None):
+        self._check(collection, filters, None)
+        return await self.policy.acall(self.inner.aggregate, collection, aggregations, filters=filters,
+                                       idempotent=True, hedge=True)
+
+    async def commit(self, writes):
+        return await self.policy.acall(self.inner.commit, writes)
+
+
+def build_resilience() -> ResiliencePolicy:
+    """Build the policy configured by the FIREBASE_CALL_*, _RETRY_*, _HEDGE_* and _BREAKER_* settings"""
+    from django.conf import settings
+    return ResiliencePolicy(
+        call_timeout=getattr(settings, 'FIREBASE_CALL_TIMEOUT', None),
+        read_retries=getattr(settings, 'FIREBASE_READ_RETRIES', 0),
+        retry_base_delay=getattr(settings, 'FIREBASE_RETRY_BASE_DELAY', 0.05),
+        retry_max_delay=getattr(settings, 'FIREBASE_RETRY_MAX_DELAY', 1.0),
+        hedge_delay=getattr(settings, 'FIREBASE_HEDGE_DELAY', None),
+        hedge_workers=getattr(settings, 'FIREBASE_HEDGE_WORKERS', 8),
+        breaker=CircuitBreaker(
+            failure_threshold=getattr(settings, 'FIREBASE_BREAKER_THRESHOLD', 0),
+            reset_timeout=getattr(settings, 'FIREBASE_BREAKER_RESET', 30),
+        ),
+    )
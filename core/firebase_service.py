@@ -1,75 +1,552 @@
-import os
-import json
-import firebase_admin
-from firebase_admin import credentials, firestore
-from django.conf import settings
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+import atexit
+import threading
 import uuid
+from .bulk_orders import ORDER_ITEMS_COLLECTION, BulkOrderJobs, build_bulk_order_jobs
+from .firebase_backends import (
+    BaseBackend, ASCENDING, DESCENDING, Aggregation, apply_writes, check_aggregations, get_backend, project_fields
+)
+from .firebase_cache import DocumentCache, build_cache
+from .firebase_catalog import ServiceCatalog, build_catalog
+from .firebase_pagination import Page, build_page, clamp_page_size, page_cursor, with_id_tiebreak
+from .firebase_queries import QueryChecker, build_query_checker
+from .firebase_resilience import ResiliencePolicy, ResilientBackend, build_resilience, is_degraded
+from .order_stats import ORDER_STATS_FIELDS, OrderStats, OrderStatsKey, build_order_stats, order_stats_key
+from .order_versions import OrderVersions, build_order_versions
+from .write_behind import WriteBehindQueue, build_write_behind
+from .write_buffer import (
+    BufferedWrite, WindowedWriteBuffer, WriteBuffer, WriteFlushError, current_write_buffer, write_buffer_scope
+)
+
+# Firestore rejects batches with more than 500 writes
+FIRESTORE_BATCH_LIMIT = 500
+
+# Documents requested per get_all round trip
+GET_MANY_CHUNK_SIZE = 300
+
+class WriteBatch:
+    """
+    Groups writes into Firestore batches.
+
+    Operations are committed in chunks of at most `limit` writes, so any
+    number of writes can be queued. Each chunk is atomic; a failed chunk
+    marks only its own items as failed. Use it as a context manager to
+    commit on exit, or call commit() yourself.
+    """
+    
+    def __init__(self, service: 'FirebaseService', limit: int = FIRESTORE_BATCH_LIMIT):
+        self._service = service
+        self.limit = limit
+        self._pending = []
+        self.results: List[Dict[str, Any]] = []
+    
+    def __enter__(self) -> 'WriteBatch':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
+    
+    def _add(self, op: str, collection: str, doc_id: str, data: Optional[Dict[str, Any]]):
+        self._pending.append((op, collection, doc_id, data))
+        if len(self._pending) >= self.limit:
+            self._commit_chunk()
+    
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        """Queue a create/overwrite, or with `merge` a deep merge into the document"""
+        self._add('merge' if merge else 'set', collection, doc_id, data)
+    
+    def update(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        """Queue a partial update"""
+        self._add('update', collection, doc_id, data)
+    
+    def delete(self, collection: str, doc_id: str):
+        """Queue a delete"""
+        self._add('delete', collection, doc_id, None)
+    
+    def _commit_chunk(self):
+        chunk, self._pending = self._pending, []
+        if not chunk:
+            return
+        error = None
+        try:
+            apply_writes(self._service.backend.batch(), chunk).commit()
+        except Exception as e:
+            print(f"Error committing batch of {len(chunk)} writes: {e}")
+            error = str(e)
+        
+        collections = set()
+        for op, collection, doc_id, data in chunk:
+            self._service.cache.delete(collection, doc_id)
+            if collection == 'orders':
+                self._service.order_versions.invalidate(doc_id, data)
+            collections.add(collection)
+            self.results.append({
+                'op': op,
+                'collection': collection,
+                'id': doc_id,
+                'success': error is None,
+                'error': error
+            })
+        if 'services' in collections and error is None:
+            self._service.catalog.invalidate()
+    
+    def commit(self) -> List[Dict[str, Any]]:
+        """Commit everything still queued and return per-item results"""
+        self._commit_chunk()
+        return self.results
 
 class FirebaseService:
     """
     Firebase service for handling all database operations
     """
     _instance = None
-    _db = None
+    _backend = None
+    _guarded = None
+    _cache = None
+    _catalog = None
+    _resilience = None
+    _write_window = None
+    _write_window_built = False
+    _write_behind = None
+    _write_behind_built = False
+    _order_stats = None
+    _order_versions = None
+    _query_checker = None
+    _bulk_orders = None
+    _init_lock = threading.Lock()
     
     def __new__(cls):
+        # Cheap on purpose: the backend (credentials, gRPC client) is only
+        # created on first use, so importing this module costs nothing
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance._initialize_firebase()
         return cls._instance
     
-    def _initialize_firebase(self):
-        """Initialize Firebase Admin SDK"""
-        if not firebase_admin._apps:
-            try:
-                # Try to get credentials from environment variable (for production)
-                firebase_config = os.environ.get('FIREBASE_CONFIG')
-                if firebase_config:
-                    try:
-                        cred_dict = json.loads(firebase_config)
-                        cred = credentials.Certificate(cred_dict)
-                        print("Using Firebase credentials from environment variable")
-                    except json.JSONDecodeError as e:
-                        print(f"Error parsing FIREBASE_CONFIG JSON: {e}")
-                        raise
-                else:
-                    # Fallback to local file (for development)
-                    from django.conf import settings
-                    cred_path = os.path.join(settings.BASE_DIR, 'firebase_credentials.json')
-                    if os.path.exists(cred_path):
-                        cred = credentials.Certificate(cred_path)
-                        print("Using Firebase credentials from local file")
-                    else:
-                        raise FileNotFoundError("Firebase credentials not found. Please set FIREBASE_CONFIG environment variable or provide firebase_credentials.json file.")
-                
-                firebase_admin.initialize_app(cred)
-                self._db = firestore.client()
-                print("Firebase initialized successfully")
-            except Exception as e:
-                print(f"Error initializing Firebase: {e}")
-                raise
+    def _initialize_backend(self):
+        """Create the storage backend named in settings.FIREBASE_BACKEND"""
+        resilience = self.resilience
+        checker = self.query_checker
+        with self._init_lock:
+            if self._backend is None:
+                backend = get_backend()
+                self._guarded = ResilientBackend(backend, resilience, checker)
+                self._backend = backend
+    
+    @property
+    def backend(self) -> BaseBackend:
+        """
+        Get the storage backend, creating it on first use.
+        
+        Calls go through the resilience policy; the raw backend is
+        available as `backend.inner`.
+        """
+        if self._backend is None:
+            self._initialize_backend()
+        return self._guarded
+    
+    @property
+    def is_initialized(self) -> bool:
+        """Whether the backend has been created yet"""
+        return self._backend is not None
+    
+    def set_backend(self, backend: Optional[BaseBackend]):
+        """Swap the storage backend (tests and benchmarks); None goes back to lazy setup"""
+        if backend is None:
+            self._backend = self._guarded = None
+        else:
+            self._guarded = ResilientBackend(backend, self.resilience, self.query_checker)
+            self._backend = backend
+        self.cache.clear()
+        self.catalog.reset()
+        self.order_versions.clear()
     
     @property
     def db(self):
-        """Get Firestore database instance"""
-        if self._db is None:
-            self._initialize_firebase()
-        return self._db
+        """Get Firestore database instance (None for non-Firestore backends)"""
+        return self.backend.client
+    
+    @property
+    def cache(self) -> DocumentCache:
+        """Get the read-through document cache"""
+        if self._cache is None:
+            with self._init_lock:
+                if self._cache is None:
+                    self._cache = build_cache()
+        return self._cache
+    
+    @property
+    def catalog(self) -> ServiceCatalog:
+        """Get the in-memory services catalog"""
+        if self._catalog is None:
+            with self._init_lock:
+                if self._catalog is None:
+                    self._catalog = build_catalog(self)
+        return self._catalog
+    
+    @property
+    def resilience(self) -> ResiliencePolicy:
+        """Get the deadline/retry/circuit-breaker policy for backend calls"""
+        if self._resilience is None:
+            with self._init_lock:
+                if self._resilience is None:
+                    self._resilience = build_resilience()
+        return self._resilience
+    
+    @property
+    def query_checker(self) -> QueryChecker:
+        """Get the checker that flags queries missing from the query catalogue"""
+        if self._query_checker is None:
+            with self._init_lock:
+                if self._query_checker is None:
+                    self._query_checker = build_query_checker()
+        return self._query_checker
+    
+    @property
+    def order_stats(self) -> OrderStats:
+        """Get the sharded order counters"""
+        if self._order_stats is None:
+            with self._init_lock:
+                if self._order_stats is None:
+                    self._order_stats = build_order_stats(self)
+        return self._order_stats
+    
+    @property
+    def order_versions(self) -> OrderVersions:
+        """Get the cached order version stamps used for conditional GETs"""
+        if self._order_versions is None:
+            with self._init_lock:
+                if self._order_versions is None:
+                    self._order_versions = build_order_versions()
+        return self._order_versions
+    
+    @property
+    def bulk_orders(self) -> BulkOrderJobs:
+        """Get the background writer for bulk orders"""
+        if self._bulk_orders is None:
+            with self._init_lock:
+                if self._bulk_orders is None:
+                    self._bulk_orders = build_bulk_order_jobs(self)
+        return self._bulk_orders
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get document cache hit/miss/eviction counters"""
+        return self.cache.stats()
+    
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Get circuit breaker state and retry/hedge counters"""
+        return self.resilience.stats()
+    
+    def _stale_document(self, collection: str, doc_id: str, fields: List[str], error: Exception):
+        """Serve an expired cached copy when the backend is degraded, else re-raise"""
+        data = self.cache.get_stale(collection, doc_id) if is_degraded(error) else None
+        if data is None:
+            raise error
+        print(f"Serving stale {collection}/{doc_id} after backend error: {error}")
+        return project_fields(data, fields) if fields is not None else data
+    
+    def _read_document(self, collection: str, doc_id: str, fields: List[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Read a document through the cache.
+        
+        With `fields`, a cached full document is projected; otherwise only
+        those fields are fetched, and the partial result is not cached.
+        """
+        self._flush_pending(collection, doc_id)
+        data = self.cache.get(collection, doc_id)
+        if data is not None:
+            return project_fields(data, fields) if fields is not None else data
+        try:
+            if fields is not None:
+                return self.backend.get(collection, doc_id, fields=fields)
+            data = self.backend.get(collection, doc_id)
+        except Exception as e:
+            return self._stale_document(collection, doc_id, fields, e)
+        if data is not None:
+            self.cache.set(collection, doc_id, data)
+        return data
+    
+    def _document_exists(self, collection: str, doc_id: str) -> bool:
+        self._flush_pending(collection, doc_id)
+        if self.cache.get(collection, doc_id) is not None:
+            return True
+        try:
+            return self.backend.exists(collection, doc_id)
+        except Exception as e:
+            return self._stale_document(collection, doc_id, [], e) is not None
+    
+    def _invalidate(self, collection: str, doc_id: str, data: Dict[str, Any] = None):
+        """Drop cached copies of a document (and version stamps, for orders) after a write"""
+        self.cache.delete(collection, doc_id)
+        if collection == 'services':
+            self.catalog.invalidate()
+        elif collection == 'orders':
+            self.order_versions.invalidate(doc_id, data)
+    
+    # Building documents and writes (shared with AsyncFirebaseService, which only adds the awaits)
+    @staticmethod
+    def _new_document(data: Dict[str, Any], doc_id: str = None) -> str:
+        """Stamp the id and timestamps on a document being created; returns its id"""
+        doc_id = doc_id or str(uuid.uuid4())
+        now = datetime.now()
+        data.update({
+            'id': doc_id,
+            'created_at': now,
+            'updated_at': now
+        })
+        return doc_id
+    
+    def _order_create_writes(self, order_data: Dict[str, Any]) -> Tuple[str, List[BufferedWrite]]:
+        """The id of a new order (its own 'id', if it has one) and the writes creating and counting it"""
+        order_id = self._new_document(order_data, order_data.get('id'))
+        order_data['status'] = 'pending'
+        return order_id, ([('set', 'orders', order_id, order_data)]
+                          + self.order_stats.writes([(None, order_stats_key(order_data))]))
+    
+    @staticmethod
+    def _changes_counted_fields(update_data: Dict[str, Any]) -> bool:
+        """Whether an order update can move the order between order stats buckets"""
+        return any(field in update_data for field in ORDER_STATS_FIELDS)
+    
+    def _order_update_writes(self, order_id: str, update_data: Dict[str, Any],
+                             previous: OrderStatsKey) -> List[BufferedWrite]:
+        """The writes updating an order and moving it between order stats buckets"""
+        update_data['updated_at'] = datetime.now()
+        writes = [('update', 'orders', order_id, update_data)]
+        if previous is not None:
+            self.order_versions.note_owner(order_id, previous[0])
+            if self._changes_counted_fields(update_data):
+                writes += self.order_stats.writes([(previous, order_stats_key(update_data, previous))])
+        return writes
+    
+    def _order_transaction(self, order_id: str, build_writes) -> None:
+        """
+        Read an order's counted fields and commit build_writes(key) (key is
+        None if the order is missing) in one transaction, so two concurrent
+        changes can't both take the order out of the same bucket.
+        """
+        self._flush_pending('orders', order_id)
+        
+        def run(transaction):
+            current = transaction.get('orders', order_id, fields=ORDER_STATS_FIELDS)
+            writes = build_writes(order_stats_key(current) if current else None)
+            apply_writes(transaction, writes)
+            return writes
+        
+        for op, collection, doc_id, data in self.backend.run_transaction(run):
+            self._invalidate(collection, doc_id, data)
+    
+    def _cached_many(self, collection: str, doc_ids: List[str],
+                     fields: List[str] = None) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """The documents get_many can serve from the cache, and the ids it must read"""
+        found = {}
+        missing = []
+        for doc_id in dict.fromkeys(doc_ids):
+            data = self.cache.get(collection, doc_id)
+            if data is None:
+                missing.append(doc_id)
+            else:
+                found[doc_id] = project_fields(data, fields) if fields is not None else data
+        return found, missing
+    
+    def _add_fetched(self, collection: str, chunk: List[str], docs, fields: List[str],
+                     found: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Add one chunk read by get_many (or the error reading it) to `found`,
+        caching full documents. False if the error means the other chunks
+        will fail too.
+        """
+        if isinstance(docs, Exception):
+            print(f"Error getting documents from {collection}: {docs}")
+            if not is_degraded(docs):
+                return False
+            for doc_id in chunk:
+                data = self.cache.get_stale(collection, doc_id)
+                if data is not None:
+                    found[doc_id] = project_fields(data, fields) if fields is not None else data
+            return True
+        if fields is None:
+            for doc_id, data in docs.items():
+                self.cache.set(collection, doc_id, data)
+        found.update(docs)
+        return True
+    
+    @staticmethod
+    def _page_query(order_by: List, page_size: Optional[int], page_token: Optional[str]) -> tuple:
+        """(page_size, order_by, cursor) for query_page; raises InvalidPageToken for a bad token"""
+        page_size = clamp_page_size(page_size)
+        order_by = with_id_tiebreak(order_by, DESCENDING)
+        return page_size, order_by, page_cursor(page_token, order_by)
+    
+    def _set_user_orders_version(self, user_id: str, latest: List[Dict[str, Any]],
+                                 counted: Dict[str, Any]) -> Dict[str, Any]:
+        """Stamp a user's listing from the user_orders_latest query and user_orders_count aggregation"""
+        return self.order_versions.set_user_orders(user_id, latest[0].get('updated_at') if latest else None,
+                                                   counted['count'])
+    
+    # Write buffering
+    @property
+    def write_window(self) -> Optional[WindowedWriteBuffer]:
+        """The process-wide coalescing window, if FIREBASE_WRITE_COALESCE_WINDOW is set"""
+        if not self._write_window_built:
+            with self._init_lock:
+                if not self._write_window_built:
+                    from django.conf import settings
+                    window = getattr(settings, 'FIREBASE_WRITE_COALESCE_WINDOW', 0)
+                    if window:
+                        self._write_window = WindowedWriteBuffer(window, self._flush_window)
+                        atexit.register(self._flush_window)
+                    self._write_window_built = True
+        return self._write_window
+    
+    def _write_buffers(self) -> List[WriteBuffer]:
+        # Oldest first: the window holds writes from earlier requests
+        return [buffer for buffer in (self.write_window, current_write_buffer()) if buffer is not None]
+    
+    def _queue_write(self, op: str, collection: str, doc_id: str, data: Dict[str, Any] = None) -> bool:
+        """Queue a write on the active buffer; False if there is none"""
+        return self._queue_writes([(op, collection, doc_id, data)])
+    
+    def _queue_writes(self, writes: List[BufferedWrite]) -> bool:
+        """Queue writes on the active buffer, to be flushed together; False if there is none"""
+        buffer = current_write_buffer()
+        if buffer is None:
+            buffer = self.write_window
+        if buffer is None:
+            return False
+        for op, collection, doc_id, data in writes:
+            buffer.add(op, collection, doc_id, data)
+        return True
+    
+    @property
+    def write_behind(self) -> Optional[WriteBehindQueue]:
+        """The durable write-behind queue, if FIREBASE_WRITE_BEHIND is on"""
+        if not self._write_behind_built:
+            with self._init_lock:
+                if not self._write_behind_built:
+                    self._write_behind = build_write_behind(self)
+                    if self._write_behind is not None:
+                        atexit.register(self._write_behind.close)
+                    self._write_behind_built = True
+        return self._write_behind
+    
+    def write_behind_stats(self) -> Optional[Dict[str, Any]]:
+        """Get write-behind queue depth, lag and throughput, or None if it is off"""
+        queue = self.write_behind
+        return queue.stats() if queue is not None else None
+    
+    def _defer_write(self, op: str, collection: str, doc_id: str, data: Dict[str, Any] = None) -> bool:
+        """Hand a write to the write-behind queue; False if it must be written now"""
+        queue = self.write_behind
+        if queue is None or self.has_pending_writes(collection, doc_id):
+            # Writes already buffered for the document go out with the buffer's flush
+            return False
+        if not queue.enqueue(op, collection, doc_id, data):
+            # Queue full: pay the latency here rather than grow it further
+            return False
+        # Reads in this process see a deferred create straight away
+        if op == 'set':
+            self.cache.set(collection, doc_id, data)
+        else:
+            self.cache.delete(collection, doc_id)
+        return True
+    
+    def _write(self, op: str, collection: str, doc_id: str, data: Dict[str, Any] = None, defer: bool = False):
+        """
+        Write one document now, or queue it if writes are being buffered.
+        
+        With `defer`, the write goes to the write-behind queue (when enabled)
+        and is committed in the background.
+        """
+        if defer and self._defer_write(op, collection, doc_id, data):
+            return
+        if self._queue_write(op, collection, doc_id, data):
+            # Cache and catalog are invalidated when the buffer is flushed
+            return
+        if op in ('set', 'merge'):
+            self.backend.set(collection, doc_id, data, merge=op == 'merge')
+        elif op == 'update':
+            self.backend.update(collection, doc_id, data)
+        else:
+            self.backend.delete(collection, doc_id)
+        self._invalidate(collection, doc_id, data)
+    
+    def _write_many(self, writes: List[BufferedWrite]):
+        """Write several documents in one atomic batch, or queue them if writes are being buffered"""
+        if len(writes) == 1:
+            self._write(*writes[0])
+        elif not self._queue_writes(writes):
+            self._commit_writes(writes)
+    
+    def has_pending_writes(self, collection: str = None, doc_id: str = None) -> bool:
+        """Whether buffered writes are waiting (for a collection, or one document)"""
+        return any(buffer.has_pending(collection, doc_id) for buffer in self._write_buffers())
+    
+    def _commit_writes(self, writes: List[BufferedWrite]) -> List[Dict[str, Any]]:
+        if not writes:
+            return []
+        results = apply_writes(WriteBatch(self), writes).commit()
+        failed = [result for result in results if not result['success']]
+        if failed:
+            raise WriteFlushError(f"{len(failed)} of {len(results)} buffered writes failed", results)
+        return results
+    
+    def flush_writes(self, collection: str = None, doc_id: str = None) -> List[Dict[str, Any]]:
+        """
+        Commit buffered writes now: all of them, one collection's, or one
+        document's. Returns per-write results like WriteBatch.commit and
+        raises WriteFlushError if any failed.
+        """
+        writes = []
+        for buffer in self._write_buffers():
+            writes.extend(buffer.take(collection, doc_id))
+        return self._commit_writes(writes)
+    
+    def flush_buffer(self, buffer: WriteBuffer) -> List[Dict[str, Any]]:
+        """Commit a finished request's buffer, or hand it to the coalescing window"""
+        writes = buffer.take()
+        if self.write_window is not None:
+            self.write_window.absorb(writes)
+            return []
+        return self._commit_writes(writes)
+    
+    def _flush_window(self):
+        if self._write_window is not None:
+            self._commit_writes(self._write_window.take())
+    
+    def _flush_pending(self, collection: str, doc_id: str = None):
+        """Commit buffered writes a read is about to depend on"""
+        if self.has_pending_writes(collection, doc_id):
+            self.flush_writes(collection, doc_id)
+    
+    @contextmanager
+    def buffered_writes(self):
+        """
+        Buffer writes made inside the block and commit them on exit, merged
+        per document, so e.g. create -> update -> update costs one write.
+        
+        Reads of a document (or queries on a collection) with buffered
+        writes flush those first. Nested blocks share the outer buffer. If
+        the block raises, its writes are dropped rather than committed
+        half-done. Commit before building a response that reports them.
+        """
+        buffer = current_write_buffer()
+        if buffer is not None:
+            yield buffer
+            return
+        with write_buffer_scope() as buffer:
+            yield buffer
+            self.flush_buffer(buffer)
     
     # User Operations
-    def create_user(self, user_data: Dict[str, Any]) -> str:
-        """Create a new user"""
-        try:
-            user_id = str(uuid.uuid4())
-            user_data.update({
-                'id': user_id,
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
-            })
-            
-            self.db.collection('users').document(user_id).set(user_data)
+    def create_user(self, user_data: Dict[str, Any], defer: bool = False) -> str:
+        """Create a new user (in the background with defer=True)"""
+        try:
+            user_id = self._new_document(user_data)
+            self._write('set', 'users', user_id, user_data, defer=defer)
             return user_id
         except Exception as e:
             print(f"Error creating user: {e}")
@@ -78,10 +555,7 @@ class FirebaseService:
     def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user by ID"""
         try:
-            doc = self.db.collection('users').document(user_id).get()
-            if doc.exists:
-                return doc.to_dict()
-            return None
+            return self._read_document('users', user_id)
         except Exception as e:
             print(f"Error getting user: {e}")
             return None
@@ -89,19 +563,18 @@ class FirebaseService:
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get user by email"""
         try:
-            users = self.db.collection('users').where('email', '==', email).limit(1).get()
-            for user in users:
-                return user.to_dict()
-            return None
+            self._flush_pending('users')
+            users = self.backend.query('users', filters=[('email', '==', email)], limit=1)
+            return users[0] if users else None
         except Exception as e:
             print(f"Error getting user by email: {e}")
             return None
     
-    def update_user(self, user_id: str, update_data: Dict[str, Any]) -> bool:
-        """Update user data"""
+    def update_user(self, user_id: str, update_data: Dict[str, Any], defer: bool = False) -> bool:
+        """Update user data (in the background with defer=True)"""
         try:
             update_data['updated_at'] = datetime.now()
-            self.db.collection('users').document(user_id).update(update_data)
+            self._write('update', 'users', user_id, update_data, defer=defer)
             return True
         except Exception as e:
             print(f"Error updating user: {e}")
@@ -110,7 +583,7 @@ class FirebaseService:
     def delete_user(self, user_id: str) -> bool:
         """Delete user"""
         try:
-            self.db.collection('users').document(user_id).delete()
+            self._write('delete', 'users', user_id)
             return True
         except Exception as e:
             print(f"Error deleting user: {e}")
@@ -118,75 +591,165 @@ class FirebaseService:
     
     # Order Operations
     def create_order(self, order_data: Dict[str, Any]) -> str:
-        """Create a new order"""
-        try:
-            order_id = str(uuid.uuid4())
-            order_data.update({
-                'id': order_id,
-                'status': 'pending',
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
-            })
-            
-            self.db.collection('orders').document(order_id).set(order_data)
+        """Create a new order (keeping its 'id' if it has one), counting it in the order stats in the same batch"""
+        try:
+            order_id, writes = self._order_create_writes(order_data)
+            self._write_many(writes)
             return order_id
         except Exception as e:
             print(f"Error creating order: {e}")
             raise
     
-    def get_order(self, order_id: str) -> Optional[Dict[str, Any]]:
-        """Get order by ID"""
+    def get_order(self, order_id: str, fields: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Get order by ID, optionally only some fields"""
         try:
-            doc = self.db.collection('orders').document(order_id).get()
-            if doc.exists:
-                return doc.to_dict()
-            return None
+            return self._read_document('orders', order_id, fields=fields)
         except Exception as e:
             print(f"Error getting order: {e}")
             return None
     
-    def get_user_orders(self, user_id: str) -> List[Dict[str, Any]]:
+    def order_exists(self, order_id: str) -> bool:
+        """Check whether an order exists without reading its fields"""
+        return self.document_exists('orders', order_id)
+    
+    def get_user_orders(self, user_id: str, limit: int = None) -> List[Dict[str, Any]]:
         """Get all orders for a user"""
         try:
-            orders = self.db.collection('orders').where('user_id', '==', user_id).order_by('created_at', direction=firestore.Query.DESCENDING).get()
-            return [order.to_dict() for order in orders]
+            self._flush_pending('orders')
+            return self.backend.query(
+                'orders',
+                filters=[('user_id', '==', user_id)],
+                order_by=[('created_at', DESCENDING)],
+                limit=limit
+            )
         except Exception as e:
             print(f"Error getting user orders: {e}")
             return []
     
-    def update_order_status(self, order_id: str, status: str) -> bool:
-        """Update order status"""
+    def get_user_orders_page(self, user_id: str, page_size: int = None, page_token: str = None) -> Page:
+        """Get one page of a user's orders, newest first"""
+        return self.query_page(
+            'orders',
+            filters=[('user_id', '==', user_id)],
+            order_by=[('created_at', DESCENDING)],
+            page_size=page_size,
+            page_token=page_token
+        )
+    
+    def update_order_status(self, order_id: str, status: str, previous: OrderStatsKey = None) -> bool:
+        """Update order status; see update_order for `previous`"""
+        return self.update_order(order_id, {'status': status}, previous=previous)
+    
+    def update_order(self, order_id: str, update_data: Dict[str, Any], previous: OrderStatsKey = None) -> bool:
+        """
+        Update an order. If its user, status or service type changes, the
+        fields it was counted under are read and it is moved between order
+        stats buckets in one transaction, committed now even inside
+        buffered_writes().
+        
+        `previous` is the order's (user_id, status, service_type) as last
+        counted, if known; it only saves looking up the owner of an update
+        that leaves those fields alone.
+        """
         try:
-            self.db.collection('orders').document(order_id).update({
-                'status': status,
-                'updated_at': datetime.now()
-            })
+            if self._changes_counted_fields(update_data):
+                self._order_transaction(
+                    order_id, lambda current: self._order_update_writes(order_id, update_data, current)
+                )
+            else:
+                self._write_many(self._order_update_writes(order_id, update_data, previous))
+            return True
+        except Exception as e:
+            print(f"Error updating order: {e}")
+            return False
+    
+    def delete_order(self, order_id: str) -> bool:
+        """Delete an order, taking it out of its order stats buckets in the same transaction"""
+        def writes(current):
+            if current is None:
+                return []
+            return [('delete', 'orders', order_id, None)] + self.order_stats.writes([(current, None)])
+        
+        try:
+            self._order_transaction(order_id, writes)
             return True
         except Exception as e:
-            print(f"Error updating order status: {e}")
+            print(f"Error deleting order: {e}")
             return False
     
-    def get_all_orders(self) -> List[Dict[str, Any]]:
+    def get_user_orders_version(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The version stamp of a user's order listing (see OrderVersions):
+        cached, or computed with a one-order query and a count.
+        """
+        versions = self.order_versions
+        version = versions.user_orders(user_id)
+        if version is not None:
+            return version
+        filters = [('user_id', '==', user_id)]
+        try:
+            self._flush_pending('orders')
+            latest = self.backend.query('orders', filters=filters, order_by=[('updated_at', DESCENDING)],
+                                        limit=1, select=['updated_at'])
+            counted = self.backend.aggregate('orders', {'count': ('count', None)}, filters=filters)
+        except Exception as e:
+            print(f"Error getting user orders version: {e}")
+            return None
+        return self._set_user_orders_version(user_id, latest, counted)
+    
+    def get_order_items(self, order_id: str) -> List[Dict[str, Any]]:
+        """Get a bulk order's line items, in line order"""
+        try:
+            self._flush_pending(ORDER_ITEMS_COLLECTION)
+            return self.backend.query(
+                ORDER_ITEMS_COLLECTION,
+                filters=[('order_id', '==', order_id)],
+                order_by=[('line', ASCENDING)]
+            )
+        except Exception as e:
+            print(f"Error getting order items: {e}")
+            return []
+    
+    def get_bulk_order_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a bulk order job's status and progress"""
+        try:
+            return self.bulk_orders.get(job_id)
+        except Exception as e:
+            print(f"Error getting bulk order job: {e}")
+            return None
+    
+    def get_order_stats(self, user_id: str = None) -> Optional[Dict[str, Any]]:
+        """Get order counts (total, by_status, by_service_type) for a user, or for all orders"""
+        try:
+            return self.order_stats.read(user_id)
+        except Exception as e:
+            print(f"Error getting order stats: {e}")
+            return None
+    
+    def get_all_orders(self, limit: int = None) -> List[Dict[str, Any]]:
         """Get all orders (admin function)"""
         try:
-            orders = self.db.collection('orders').order_by('created_at', direction=firestore.Query.DESCENDING).get()
-            return [order.to_dict() for order in orders]
+            self._flush_pending('orders')
+            return self.backend.query('orders', order_by=[('created_at', DESCENDING)], limit=limit)
         except Exception as e:
             print(f"Error getting all orders: {e}")
             return []
     
+    def get_all_orders_page(self, page_size: int = None, page_token: str = None) -> Page:
+        """Get one page of all orders, newest first (admin function)"""
+        return self.query_page(
+            'orders',
+            order_by=[('created_at', DESCENDING)],
+            page_size=page_size,
+            page_token=page_token
+        )
+    
     # Service Operations
     def create_service(self, service_data: Dict[str, Any]) -> str:
         """Create a new service"""
         try:
-            service_id = str(uuid.uuid4())
-            service_data.update({
-                'id': service_id,
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
-            })
-            
-            self.db.collection('services').document(service_id).set(service_data)
+            service_id = self._new_document(service_data)
+            self._write('set', 'services', service_id, service_data)
             return service_id
         except Exception as e:
             print(f"Error creating service: {e}")
@@ -195,67 +758,123 @@ class FirebaseService:
     def get_all_services(self) -> List[Dict[str, Any]]:
         """Get all services"""
         try:
-            services = self.db.collection('services').get()
-            return [service.to_dict() for service in services]
+            return self.catalog.all()
         except Exception as e:
             print(f"Error getting services: {e}")
             return []
     
+    def get_active_services(self) -> List[Dict[str, Any]]:
+        """Get active services"""
+        try:
+            return self.catalog.active()
+        except Exception as e:
+            print(f"Error getting active services: {e}")
+            return []
+    
+    def get_services_by_category(self, category: str) -> List[Dict[str, Any]]:
+        """Get active services in a category"""
+        try:
+            return self.catalog.by_category(category)
+        except Exception as e:
+            print(f"Error getting services for category {category}: {e}")
+            return []
+    
+    def get_service_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Get an active service by its display name"""
+        try:
+            return self.catalog.by_name(name)
+        except Exception as e:
+            print(f"Error getting service {name}: {e}")
+            return None
+    
     def get_service(self, service_id: str) -> Optional[Dict[str, Any]]:
         """Get service by ID"""
         try:
-            doc = self.db.collection('services').document(service_id).get()
-            if doc.exists:
-                return doc.to_dict()
-            return None
+            service = self.catalog.get(service_id)
+            if service is not None:
+                return service
+            # Not in this process's snapshot yet (e.g. created elsewhere)
+            return self._read_document('services', service_id)
         except Exception as e:
             print(f"Error getting service: {e}")
             return None
     
     # Generic CRUD Operations
-    def create_document(self, collection: str, data: Dict[str, Any], doc_id: str = None) -> str:
-        """Create a document in any collection"""
+    def create_document(self, collection: str, data: Dict[str, Any], doc_id: str = None,
+                        defer: bool = False) -> str:
+        """Create a document in any collection (in the background with defer=True)"""
         try:
-            if not doc_id:
-                doc_id = str(uuid.uuid4())
-            
-            data.update({
-                'id': doc_id,
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
-            })
-            
-            self.db.collection(collection).document(doc_id).set(data)
+            doc_id = self._new_document(data, doc_id)
+            self._write('set', collection, doc_id, data, defer=defer)
             return doc_id
         except Exception as e:
             print(f"Error creating document in {collection}: {e}")
             raise
     
-    def get_document(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
-        """Get a document from any collection"""
+    def get_document(self, collection: str, doc_id: str, fields: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a document from any collection, optionally only some fields"""
         try:
-            doc = self.db.collection(collection).document(doc_id).get()
-            if doc.exists:
-                return doc.to_dict()
-            return None
+            return self._read_document(collection, doc_id, fields=fields)
         except Exception as e:
             print(f"Error getting document from {collection}: {e}")
             return None
     
-    def update_document(self, collection: str, doc_id: str, update_data: Dict[str, Any]) -> bool:
-        """Update a document in any collection"""
+    def get_many(self, collection: str, doc_ids: List[str],
+                 fields: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Get many documents by id with as few round trips as possible.
+        
+        Cached documents are served from the cache and the rest are read
+        with batched gets. Returns a dict keyed by id; missing documents
+        are left out.
+        """
+        try:
+            self._flush_pending(collection)
+        except Exception as e:
+            print(f"Error flushing writes to {collection}: {e}")
+        found, missing = self._cached_many(collection, doc_ids, fields)
+        
+        for start in range(0, len(missing), GET_MANY_CHUNK_SIZE):
+            chunk = missing[start:start + GET_MANY_CHUNK_SIZE]
+            try:
+                docs = self.backend.get_many(collection, chunk, fields=fields)
+            except Exception as e:
+                docs = e
+            if not self._add_fetched(collection, chunk, docs, fields, found):
+                break
+        return found
+    
+    def document_exists(self, collection: str, doc_id: str) -> bool:
+        """Check whether a document exists without reading its fields"""
+        try:
+            return self._document_exists(collection, doc_id)
+        except Exception as e:
+            print(f"Error checking document in {collection}: {e}")
+            return False
+    
+    def update_document(self, collection: str, doc_id: str, update_data: Dict[str, Any],
+                        defer: bool = False) -> bool:
+        """
+        Update a document in any collection (in the background with
+        defer=True). Orders go through update_order, never deferred, so the
+        order stats stay right.
+        """
+        if collection == 'orders':
+            return self.update_order(doc_id, update_data)
         try:
             update_data['updated_at'] = datetime.now()
-            self.db.collection(collection).document(doc_id).update(update_data)
+            self._write('update', collection, doc_id, update_data, defer=defer)
             return True
         except Exception as e:
             print(f"Error updating document in {collection}: {e}")
             return False
     
     def delete_document(self, collection: str, doc_id: str) -> bool:
-        """Delete a document from any collection"""
+        """Delete a document from any collection (orders through delete_order)"""
+        if collection == 'orders':
+            return self.delete_order(doc_id)
         try:
-            self.db.collection(collection).document(doc_id).delete()
+            self._write('delete', collection, doc_id)
             return True
         except Exception as e:
             print(f"Error deleting document from {collection}: {e}")
@@ -264,20 +883,173 @@ class FirebaseService:
     def get_collection(self, collection: str, limit: int = None, order_by: str = None) -> List[Dict[str, Any]]:
         """Get all documents from a collection"""
         try:
-            query = self.db.collection(collection)
-            
-            if order_by:
-                query = query.order_by(order_by, direction=firestore.Query.DESCENDING)
-            
-            if limit:
-                query = query.limit(limit)
-            
-            docs = query.get()
-            return [doc.to_dict() for doc in docs]
+            self._flush_pending(collection)
+            return self.backend.query(
+                collection,
+                order_by=[(order_by, DESCENDING)] if order_by else None,
+                limit=limit
+            )
         except Exception as e:
             print(f"Error getting collection {collection}: {e}")
             return []
 
 
+    def get_collection_page(self, collection: str, page_size: int = None, page_token: str = None,
+                            order_by: str = None) -> Page:
+        """Get one page of documents from a collection"""
+        return self.query_page(
+            collection,
+            order_by=[(order_by, DESCENDING)] if order_by else None,
+            page_size=page_size,
+            page_token=page_token
+        )
+    
+    def query_page(self, collection: str, filters: List = None, order_by: List = None,
+                   page_size: int = None, page_token: str = None) -> Page:
+        """
+        Run a query one page at a time using start_after cursors.
+        
+        Document id is appended as a final sort key so the cursor is unique
+        even when earlier keys tie. Raises InvalidPageToken for a bad token;
+        other errors are logged and give an empty page.
+        """
+        page_size, order_by, cursor = self._page_query(order_by, page_size, page_token)
+        try:
+            self._flush_pending(collection)
+            # Fetch one extra document to learn whether another page exists
+            docs = self.backend.query(
+                collection,
+                filters=filters,
+                order_by=order_by,
+                limit=page_size + 1,
+                start_after=cursor
+            )
+        except Exception as e:
+            print(f"Error getting page from {collection}: {e}")
+            return Page([])
+        return build_page(docs, page_size, order_by)
+    
+    # Aggregation Operations
+    def aggregate(self, collection: str, aggregations: Dict[str, Aggregation],
+                  filters: List = None) -> Optional[Dict[str, Any]]:
+        """
+        Compute count/sum/avg over matching documents on the server, e.g.
+        aggregate('orders', {'orders': ('count', None), 'revenue': ('sum', 'price')}).
+        
+        Firestore bills one read per 1000 index entries scanned and sends
+        back only the results, instead of every matching document.
+        Raises ValueError for an unknown function; other errors give None.
+        """
+        check_aggregations(aggregations)
+        try:
+            self._flush_pending(collection)
+            return self.backend.aggregate(collection, aggregations, filters=filters)
+        except Exception as e:
+            print(f"Error aggregating {collection}: {e}")
+            return None
+    
+    def count(self, collection: str, filters: List = None) -> Optional[int]:
+        """Count matching documents without reading them"""
+        result = self.aggregate(collection, {'count': ('count', None)}, filters=filters)
+        return result['count'] if result is not None else None
+    
+    def sum(self, collection: str, field: str, filters: List = None) -> Optional[float]:
+        """Sum a numeric field over matching documents"""
+        result = self.aggregate(collection, {'sum': ('sum', field)}, filters=filters)
+        return result['sum'] if result is not None else None
+    
+    def avg(self, collection: str, field: str, filters: List = None) -> Optional[float]:
+        """Average a numeric field over matching documents (None if no values)"""
+        result = self.aggregate(collection, {'avg': ('avg', field)}, filters=filters)
+        return result['avg'] if result is not None else None
+    
+    # Streaming Operations
+    def iter_query(self, collection: str, filters: List = None, order_by: List = None,
+                   fields: List[str] = None, chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every document matching a query in constant memory.
+        
+        Documents are read in chunks of `chunk_size`, each chunk resuming
+        from a cursor after the previous one, so no single stream stays
+        open for the whole scan. With `fields`, only those fields (plus
+        'id') are transferred and yielded.
+        """
+        order_by = with_id_tiebreak(order_by, ASCENDING)
+        cursor_fields = [field for field, _ in order_by]
+        select = None
+        if fields is not None:
+            select = list(dict.fromkeys(list(fields) + cursor_fields))
+            extra_fields = [field for field in cursor_fields if field not in fields and field != 'id']
+        
+        self._flush_pending(collection)
+        cursor = None
+        while True:
+            count = 0
+            last = None
+            for doc in self.backend.stream(collection, filters=filters, order_by=order_by,
+                                           limit=chunk_size, start_after=cursor, select=select):
+                count += 1
+                last = doc
+                if select is not None and extra_fields:
+                    doc = {key: value for key, value in doc.items() if key not in extra_fields}
+                yield doc
+            if count < chunk_size:
+                return
+            cursor = [last.get(field) for field in cursor_fields]
+    
+    def iter_collection(self, collection: str, fields: List[str] = None,
+                        chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Stream every document in a collection, ordered by id"""
+        return self.iter_query(collection, fields=fields, chunk_size=chunk_size)
+    
+    # Batch Operations
+    def batch(self, limit: int = FIRESTORE_BATCH_LIMIT) -> WriteBatch:
+        """Start a batch of writes, committed in chunks of up to `limit`"""
+        # Buffered writes go first so the batch can't be overtaken by them
+        self.flush_writes()
+        return WriteBatch(self, limit)
+    
+    def bulk_create(self, collection: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Create many documents in batched commits.
+        
+        Items keep their own 'id' if they have one. Returns one result per
+        item, in order, with the document id and whether its chunk committed.
+        """
+        now = datetime.now()
+        with self.batch() as batch:
+            for data in items:
+                doc_id = data.get('id') or str(uuid.uuid4())
+                data.update({
+                    'id': doc_id,
+                    'created_at': now,
+                    'updated_at': now
+                })
+                batch.set(collection, doc_id, data)
+        return batch.results
+    
+    def bulk_update(self, collection: str, updates: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply partial updates keyed by document id in batched commits"""
+        now = datetime.now()
+        with self.batch() as batch:
+            for doc_id, update_data in updates.items():
+                update_data['updated_at'] = now
+                batch.update(collection, doc_id, update_data)
+        return batch.results
+    
+    def bulk_create_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create many orders in batched commits, then count the ones that committed"""
+        for order_data in orders:
+            order_data.setdefault('status', 'pending')
+        results = self.bulk_create('orders', orders)
+        created = [order_stats_key(order_data)
+                   for order_data, result in zip(orders, results) if result['success']]
+        try:
+            self._commit_writes(self.order_stats.writes((None, key) for key in created))
+        except Exception as e:
+            print(f"Error counting {len(created)} new orders: {e}")
+        return results
+
+
 # Create a global instance
 firebase_service = FirebaseService()
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+class IdentityMap:
+    """
+    Request-scoped registry of loaded Firebase model instances.
+
+    While a map is active, model lookups hand back the instance already
+    loaded in this request instead of reading Firestore again. Ids queued
+    with queue() are fetched together, in one batched read, the first time
+    any lookup for that model misses the map.
+    """
+
+    def __init__(self):
+        self._instances: Dict[tuple, Any] = {}
+        self._pending: Dict[type, Set[str]] = {}
+
+    def get(self, model: type, field: str, value: Any) -> Optional[Any]:
+        """Instance of model whose `field` equals value, if loaded"""
+        return self._instances.get((model, field, value))
+
+    def add(self, instance: Any, fields: Iterable[str] = ('id',)) -> Any:
+        """Register an instance under each of its lookup fields"""
+        model = type(instance)
+        for field in fields:
+            value = getattr(instance, field, None)
+            if value is not None:
+                self._instances[(model, field, value)] = instance
+        if getattr(instance, 'id', None) is not None:
+            self._pending.get(model, set()).discard(instance.id)
+        return instance
+
+    def forget(self, instance: Any) -> None:
+        """Drop every registration pointing at instance"""
+        for key in [key for key, value in self._instances.items() if value is instance]:
+            del self._instances[key]
+
+    def queue(self, model: type, ids: Iterable[str]) -> None:
+        """Defer loading ids so they can be read in one batch later"""
+        pending = self._pending.setdefault(model, set())
+        pending.update(doc_id for doc_id in ids
+                       if doc_id and (model, 'id', doc_id) not in self._instances)
+
+    def take_pending(self, model: type) -> Set[str]:
+        """Remove and return the ids queued for model"""
+        return self._pending.pop(model, set())
+
+    def __len__(self) -> int:
+        return len({id(instance) for instance in self._instances.values()})
+
+
+_current_identity_map: ContextVar[Optional[IdentityMap]] = ContextVar('firebase_identity_map', default=None)
+
+
+def current_identity_map() -> Optional[IdentityMap]:
+    """The identity map for the current request, or None outside one"""
+    return _current_identity_map.get()
+
+
+@contextmanager
+def identity_map_scope():
+    """Run a block (usually one request) with a fresh identity map"""
+    token = _current_identity_map.set(IdentityMap())
+    try:
+        yield _current_identity_map.get()
+    finally:
+        _current_identity_map.reset(token)
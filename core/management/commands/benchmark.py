@@ -0,0 +1,261 @@
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.firebase_backends import get_backend
+from core.firebase_models import FirebaseUser, FirebaseOrder
+from core.firebase_service import firebase_service
+from core.order_columns import OrderColumns
+from core.order_stats import ORDER_STATS_FIELDS, order_stats_key
+from core.serializers import Serializer, dumps, json_backend
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class BaselineOrder:
+    """FirebaseOrder's hydration and to_dict as hand-written before the model schema, for comparison"""
+
+    def __init__(self, data=None):
+        if data:
+            self.id = data.get('id')
+            self.user_id = data.get('user_id')
+            self.service_type = data.get('service_type')
+            self.description = data.get('description', '')
+            self.pickup_location = data.get('pickup_location', '')
+            self.delivery_location = data.get('delivery_location', '')
+            self.pickup_date = data.get('pickup_date')
+            self.delivery_date = data.get('delivery_date')
+            self.price = data.get('price', 0.0)
+            self.status = data.get('status', 'pending')
+            self.vendor_id = data.get('vendor_id')
+            self.special_instructions = data.get('special_instructions', '')
+            self.contact_phone = data.get('contact_phone', '')
+            self.file_url = data.get('file_url', '')
+            self.created_at = data.get('created_at')
+            self.updated_at = data.get('updated_at')
+        else:
+            self.id = None
+            self.user_id = None
+            self.service_type = None
+            self.description = ''
+            self.pickup_location = ''
+            self.delivery_location = ''
+            self.pickup_date = None
+            self.delivery_date = None
+            self.price = 0.0
+            self.status = 'pending'
+            self.vendor_id = None
+            self.special_instructions = ''
+            self.contact_phone = ''
+            self.file_url = ''
+            self.created_at = None
+            self.updated_at = None
+        if data and all(field in data for field in ORDER_STATS_FIELDS):
+            self._counted = order_stats_key(data)
+        else:
+            self._counted = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'service_type': self.service_type,
+            'description': self.description,
+            'pickup_location': self.pickup_location,
+            'delivery_location': self.delivery_location,
+            'pickup_date': self.pickup_date,
+            'delivery_date': self.delivery_date,
+            'price': self.price,
+            'status': self.status,
+            'vendor_id': self.vendor_id,
+            'special_instructions': self.special_instructions,
+            'contact_phone': self.contact_phone,
+            'file_url': self.file_url,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+
+class Command(BaseCommand):
+    help = 'Time the order code paths (create_order, my_orders, order_status) against a storage backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', nargs='?', default='orders', choices=['orders', 'models', 'serializers'],
+                            help='What to benchmark')
+        parser.add_argument('--backend', default='local',
+                            help="Storage backend to run against ('local', 'firestore' or a dotted path). "
+                                 "Non-local backends receive real writes.")
+        parser.add_argument('--iterations', type=int, default=200,
+                            help='Number of calls per measured operation')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Number of distinct users orders are spread across')
+        parser.add_argument('--documents', type=int, default=10000,
+                            help='Number of order documents per iteration (models and serializers targets)')
+
+    def handle(self, *args, **options):
+        getattr(self, f"bench_{options['target']}")(options)
+
+    def report(self, label, samples):
+        """Print latency stats for a list of durations in seconds"""
+        ms = [s * 1000 for s in samples]
+        self.stdout.write(
+            f"{label:<24} n={len(ms):<6} mean={statistics.mean(ms):8.3f}ms "
+            f"p50={_percentile(ms, 50):8.3f}ms p95={_percentile(ms, 95):8.3f}ms "
+            f"p99={_percentile(ms, 99):8.3f}ms"
+        )
+
+    def timed(self, func, count):
+        """Call func(i) count times and return the individual durations"""
+        samples = []
+        for i in range(count):
+            start = time.perf_counter()
+            func(i)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    def bench_orders(self, options):
+        iterations = options['iterations']
+        run_id = uuid.uuid4().hex[:8]
+        previous_backend = firebase_service._backend
+        firebase_service.set_backend(get_backend(options['backend']))
+        self.stdout.write(f"Backend: {firebase_service.backend.name}")
+
+        try:
+            emails = [f"bench-{run_id}-{n}@example.com" for n in range(options['users'])]
+            for n, email in enumerate(emails):
+                FirebaseUser.create_user(username=f"bench-{run_id}-{n}", email=email)
+
+            order_ids = []
+
+            def create_order(i):
+                # Mirrors views.create_order: resolve the user, then write the order
+                user = FirebaseUser.get_by_email(emails[i % len(emails)])
+                order = FirebaseOrder.create_order(
+                    user_id=user.id,
+                    service_type='tube_laser',
+                    description='Benchmark order',
+                    pickup_location='Pune',
+                    delivery_location='Mumbai',
+                )
+                order_ids.append(order.id)
+
+            def order_lifecycle(i):
+                # create -> attach a file -> status change; buffered, this is one write
+                user = FirebaseUser.get_by_email(emails[i % len(emails)])
+                with firebase_service.buffered_writes():
+                    order = FirebaseOrder.create_order(user_id=user.id, service_type='cnc_machining',
+                                                       description='Benchmark order')
+                    firebase_service.update_document('orders', order.id, {'file_url': '/media/uploads/bench.dxf'})
+                    order.update_status('processing')
+
+            def my_orders(i):
+                user = FirebaseUser.get_by_email(emails[i % len(emails)])
+                FirebaseOrder.get_user_orders(user.id)
+
+            def order_status(i):
+                FirebaseOrder.get_by_id(order_ids[i % len(order_ids)])
+
+            self.report('create_order', self.timed(create_order, iterations))
+            self.report('order_lifecycle', self.timed(order_lifecycle, iterations))
+            self.report('my_orders', self.timed(my_orders, iterations))
+            self.report('order_status', self.timed(order_status, iterations))
+            self.stdout.write(f"Document cache: {firebase_service.cache_stats()}")
+            self.stdout.write(f"Resilience: {firebase_service.resilience_stats()}")
+        finally:
+            firebase_service.set_backend(previous_backend)
+
+    def bench_models(self, options):
+        # Model hydration and serialization only; no backend involved
+        now = datetime.now()
+        docs = [{
+            'id': f"order-{n}",
+            'user_id': f"user-{n % 50}",
+            'service_type': 'tube_laser',
+            'description': 'Benchmark order',
+            'pickup_location': 'Pune',
+            'delivery_location': 'Mumbai',
+            'price': float(n % 2000),
+            'status': ('pending', 'processing', 'completed')[n % 3],
+            'created_at': now - timedelta(minutes=n),
+            'updated_at': now,
+            'schema_version': FirebaseOrder.migrations.version,
+        } for n in range(options['documents'])]
+        iterations = max(1, options['iterations'] // 20)
+        self.stdout.write(f"{len(docs)} order documents, {iterations} iterations")
+
+        for label, model in (('baseline', BaselineOrder), ('schema', FirebaseOrder)):
+            instances = [model(doc) for doc in docs]
+            self.report(f"{label} from_dict", self.timed(lambda i: [model(doc) for doc in docs], iterations))
+            self.report(f"{label} to_dict", self.timed(lambda i: [o.to_dict() for o in instances], iterations))
+
+            tracemalloc.start()
+            instances = [model(doc) for doc in docs]
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f"{label:<24} {size / len(docs):.0f} bytes per instance")
+
+        # A listing: pending orders over 1000, newest first, and their total
+        def with_objects(i):
+            orders = [order for order in map(FirebaseOrder, docs) if order.status == 'pending' and order.price >= 1000]
+            orders.sort(key=lambda order: order.created_at, reverse=True)
+            return sum(order.price for order in orders)
+
+        def with_columns(i):
+            columns = OrderColumns.from_orders(docs).filter(status='pending', min_price=1000)
+            return columns.sort('created_at', descending=True).total_price()
+
+        self.report('objects listing', self.timed(with_objects, iterations))
+        self.report(f"columns listing ({OrderColumns.from_orders([]).backend})", self.timed(with_columns, iterations))
+
+    def bench_serializers(self, options):
+        now = datetime.now()
+        orders = [FirebaseOrder({
+            'id': f"order-{n}",
+            'user_id': f"user-{n % 50}",
+            'service_type': 'tube_laser',
+            'status': 'pending',
+            'description': 'Benchmark order',
+            'pickup_location': 'Pune',
+            'delivery_location': 'Mumbai',
+            'contact_phone': '+91 98765 43210',
+            'created_at': now,
+            'schema_version': FirebaseOrder.migrations.version,
+        }) for n in range(options['documents'])]
+        iterations = max(1, options['iterations'] // 20)
+        fields = ['id', 'service_type', 'status', 'description', 'pickup_location', 'delivery_location',
+                  'contact_phone', 'created_at', 'special_instructions', 'file_url']
+        self.stdout.write(f"{len(orders)} orders, {iterations} iterations, JSON backend: {json_backend()}")
+
+        def by_hand(i):
+            # What order_status did before: a dict built per view, encoded by JsonResponse
+            payloads = [{
+                'id': order.id,
+                'service_type': order.service_type,
+                'status': order.status,
+                'description': order.description,
+                'pickup_location': order.pickup_location,
+                'delivery_location': order.delivery_location,
+                'contact_phone': order.contact_phone,
+                'created_at': order.created_at.isoformat() if order.created_at else None,
+                'special_instructions': order.special_instructions,
+                'file_url': order.file_url,
+            } for order in orders]
+            json.dumps({'success': True, 'orders': payloads}, cls=DjangoJSONEncoder).encode()
+
+        serializer = Serializer('benchmark', fields, model=FirebaseOrder)
+
+        def compiled(i):
+            dumps({'success': True, 'orders': serializer.many(orders)})
+
+        self.report('hand-built dicts', self.timed(by_hand, iterations))
+        self.report('compiled serializer', self.timed(compiled, iterations))
@@ -0,0 +1,102 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules loaded while serving the first request on a fresh instance
+DEFAULT_MODULES = ['mywebsite.urls', 'core.views', 'accounts.views']
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+# Runs in a fresh interpreter so nothing is already imported
+PROBE_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_ms = (time.perf_counter() - start) * 1000
+imports = {}
+for name in sys.argv[2:]:
+    t = time.perf_counter()
+    __import__(name)
+    imports[name] = (time.perf_counter() - t) * 1000
+init_ms = None
+if sys.argv[1] == '1':
+    from core.firebase_service import firebase_service
+    t = time.perf_counter()
+    firebase_service.backend
+    init_ms = (time.perf_counter() - t) * 1000
+print(json.dumps({'setup_ms': setup_ms, 'imports': imports, 'init_ms': init_ms}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Measure cold-start cost: per-module import time (python -X importtime) in a fresh '
+            'interpreter, plus optional Firebase client initialization, checked against a budget')
+
+    def add_arguments(self, parser):
+        parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES,
+                            help='Modules to import after django.setup()')
+        parser.add_argument('--init', action='store_true',
+                            help='Also time the first FirebaseService backend initialization')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Number of slowest modules to list')
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='Fail if total cold start exceeds this (default: settings.COLDSTART_BUDGET_MS)')
+
+    def handle(self, *args, **options):
+        modules = options['modules']
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE_SCRIPT,
+             '1' if options['init'] else '0', *modules],
+            capture_output=True, text=True, env=os.environ.copy(), cwd=settings.BASE_DIR,
+        )
+        if proc.returncode != 0:
+            raise CommandError(f"Cold-start probe failed:\n{proc.stderr[-2000:]}")
+
+        probe = json.loads(proc.stdout.strip().splitlines()[-1])
+        self_times, cumulative_times = self.parse_importtime(proc.stderr)
+
+        self.stdout.write(f"django.setup(): {probe['setup_ms']:.1f}ms")
+        for name, ms in probe['imports'].items():
+            self.stdout.write(f"import {name}: {ms:.1f}ms")
+        if probe['init_ms'] is not None:
+            self.stdout.write(f"FirebaseService backend init: {probe['init_ms']:.1f}ms")
+
+        self.stdout.write("\nSlowest modules (cumulative, including children):")
+        slowest = sorted(cumulative_times.items(), key=lambda item: item[1], reverse=True)
+        for name, us in slowest[:options['top']]:
+            self.stdout.write(f"  {us / 1000:8.1f}ms  {name}")
+
+        self.stdout.write("\nImport time by top-level package (self time):")
+        packages = {}
+        for name, us in self_times.items():
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + us
+        for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options['top']]:
+            self.stdout.write(f"  {us / 1000:8.1f}ms  {package}")
+
+        total_ms = probe['setup_ms'] + sum(probe['imports'].values()) + (probe['init_ms'] or 0)
+        budget_ms = options['budget_ms']
+        if budget_ms is None:
+            budget_ms = getattr(settings, 'COLDSTART_BUDGET_MS', None)
+        self.stdout.write(f"\nTotal cold start: {total_ms:.1f}ms" +
+                          (f" (budget {budget_ms:.0f}ms)" if budget_ms else ''))
+        if budget_ms and total_ms > budget_ms:
+            raise CommandError(f"Cold start {total_ms:.1f}ms exceeds budget of {budget_ms:.0f}ms")
+
+    def parse_importtime(self, output):
+        """Map module name to self and cumulative import time in microseconds"""
+        self_times = {}
+        cumulative_times = {}
+        for line in output.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                name = match.group(4)
+                self_times[name] = self_times.get(name, 0) + int(match.group(1))
+                cumulative_times[name] = max(cumulative_times.get(name, 0), int(match.group(2)))
+        return self_times, cumulative_times
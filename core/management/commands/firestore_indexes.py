@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.firebase_queries import catalogue, indexes_path, load_manifest
+
+
+class Command(BaseCommand):
+    help = 'Generate firestore.indexes.json from the query catalogue (core/firebase_queries.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help='Where to write the manifest (default: FIREBASE_INDEXES_PATH)')
+        parser.add_argument('--check', action='store_true',
+                            help="Don't write anything; fail if the manifest is out of date")
+
+    def handle(self, *args, **options):
+        path = options['output'] or indexes_path()
+        current = load_manifest(path)
+        # Field overrides are maintained by hand; keep them
+        manifest = catalogue.manifest(field_overrides=(current or {}).get('fieldOverrides'))
+
+        if options['check']:
+            if current is None or current.get('indexes') != manifest['indexes']:
+                raise CommandError(f"{path} is out of date; run `python manage.py firestore_indexes`")
+            self.stdout.write(f"{path} is up to date ({len(manifest['indexes'])} composite indexes)")
+            return
+
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.write('\n')
+        for shape in catalogue:
+            fields = shape.index_fields()
+            needs = 'composite index' if fields else 'built-in indexes'
+            self.stdout.write(f"{shape.name}: {shape.describe()} -> {needs}")
+        self.stdout.write(f"Wrote {len(manifest['indexes'])} composite indexes to {path}")
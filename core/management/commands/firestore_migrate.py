@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from core.doc_migrations import registry
+from core.firebase_service import FIRESTORE_BATCH_LIMIT
+
+
+class Command(BaseCommand):
+    help = ('Upgrade Firestore documents still on an old schema version, a batch at a time. '
+            'Documents are also upgraded as they are read; this catches the ones nobody reads.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('collections', nargs='*',
+                            help='Collections to migrate (default: every collection with migrations)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Documents read per round trip')
+        parser.add_argument('--batch-size', type=int, default=FIRESTORE_BATCH_LIMIT,
+                            help='Updates committed per batch')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep after each batch, to leave capacity for live traffic')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the outdated documents')
+
+    def handle(self, *args, **options):
+        # Registers the models' migrations
+        from core import firebase_models
+
+        collections = options['collections'] or sorted(registry)
+        for collection in collections:
+            migrations = registry.get(collection)
+            if migrations is None:
+                self.stderr.write(f"{collection}: no migrations registered")
+                continue
+            # Read first: a clean run clears the record
+            recorded = migrations.recorded_failures()
+            result = migrations.migrate(chunk_size=options['chunk_size'], batch_size=options['batch_size'],
+                                        pause=options['pause'], dry_run=options['dry_run'])
+            self.stdout.write(
+                f"{collection} (version {migrations.version}): scanned {result['scanned']}, "
+                f"outdated {result['outdated']}, migrated {result['migrated']}, failed {result['failed']}"
+            )
+            if recorded:
+                self.stderr.write(
+                    f"{collection}: lazy upgrades failed {recorded.get('upgrade_failures', 0)} times and "
+                    f"write-backs {recorded.get('write_back_failures', 0)} times since the last clean run; "
+                    f"last on {recorded.get('last_doc_id')}: {recorded.get('last_error')}"
+                )
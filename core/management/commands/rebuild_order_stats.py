@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.firebase_service import firebase_service
+
+
+class Command(BaseCommand):
+    help = 'Recount every order and rewrite the order stats counters (run while order traffic is quiet)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Orders read per round trip')
+
+    def handle(self, *args, **options):
+        result = firebase_service.order_stats.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Counted {result['orders']} orders across {result['scopes']} scopes")
+        stats = firebase_service.get_order_stats()
+        if stats is not None:
+            for status, count in sorted(stats['by_status'].items()):
+                self.stdout.write(f"{status}: {count}")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.firebase_service import firebase_service
+
+
+class Command(BaseCommand):
+    help = 'Show write-behind queue depth and lag, drain it, or requeue writes that ran out of attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drain', action='store_true',
+                            help='Commit every queued write before exiting')
+        parser.add_argument('--timeout', type=float, default=None,
+                            help='Give up draining after this many seconds')
+        parser.add_argument('--dead', action='store_true',
+                            help='List writes that ran out of attempts')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Give dead writes a fresh set of attempts')
+
+    def handle(self, *args, **options):
+        queue = firebase_service.write_behind
+        if queue is None:
+            raise CommandError('Write-behind is disabled (set FIREBASE_WRITE_BEHIND=True)')
+
+        if options['requeue_dead']:
+            self.stdout.write(f"Requeued {queue.requeue_dead()} dead writes")
+        if options['drain']:
+            drained = queue.drain(options['timeout'])
+            queue.close()
+            if not drained:
+                raise CommandError(f"Timed out with writes still queued: {queue.stats()}")
+            self.stdout.write('Queue drained')
+        if options['dead']:
+            for write in queue.dead_writes():
+                self.stdout.write(
+                    f"#{write['seq']} {write['op']} {write['collection']}/{write['id']} "
+                    f"attempts={write['attempts']} error={write['error']}"
+                )
+
+        stats = queue.stats()
+        self.stdout.write(
+            f"depth={stats['depth']} dead={stats['dead']} lag={stats['lag_seconds']:.1f}s "
+            f"max_depth={stats['max_depth']}"
+        )
@@ -0,0 +1,35 @@
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .firebase_resilience import request_budget
+from .identity_map import identity_map_scope
+
+
+@sync_and_async_middleware
+def firebase_identity_map_middleware(get_response):
+    """Give each request its own Firebase model identity map"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with identity_map_scope():
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with identity_map_scope():
+                return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def firebase_request_budget_middleware(get_response):
+    """Cap the total time each request may spend waiting on Firestore"""
+    budget = getattr(settings, 'FIREBASE_REQUEST_BUDGET', None)
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with request_budget(budget):
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with request_budget(budget):
+                return get_response(request)
+    return middleware
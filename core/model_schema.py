@@ -0,0 +1,190 @@
+import copy
+from typing import Any, Callable, Dict, Tuple
+
+_MUTABLE_DEFAULTS = (list, dict, set)
+
+
+class Field:
+    """
+    One stored attribute of a schema model.
+
+    `default` is used when the document lacks the field; it must be an
+    instance of `type` (or None). Mutable defaults are copied per
+    instance. Read-only fields (id, timestamps) are set by the service
+    and left out of the data a model saves.
+    """
+
+    def __init__(self, type: type = object, default: Any = None, read_only: bool = False):
+        if default is not None and not isinstance(default, type):
+            raise TypeError(f"Default {default!r} is not a {type.__name__}")
+        self.type = type
+        self.default = default
+        self.read_only = read_only
+        self.name = None
+
+
+def _compile(name: str, source: str, namespace: Dict[str, Any]) -> Callable:
+    exec(compile(source, f"<schema {name}>", 'exec'), namespace)
+    return namespace[name]
+
+
+def _default_expr(field: Field, index: int, namespace: Dict[str, Any]) -> str:
+    """Source for a field's default, registering the value in namespace"""
+    if field.default is None or isinstance(field.default, (str, int, float, bool)):
+        return repr(field.default)
+    namespace[f'_default_{index}'] = field.default
+    if isinstance(field.default, _MUTABLE_DEFAULTS):
+        namespace['_deepcopy'] = copy.deepcopy
+        return f"_deepcopy(_default_{index})"
+    return f'_default_{index}'
+
+
+def build_converters(model_name: str, fields: Tuple[Field, ...], migrations=None) -> Dict[str, Callable]:
+    """
+    Generate __init__, to_dict, _save_data and _changed_data for a field list.
+
+    The functions are compiled from source with one statement per field,
+    so hydrating a document is a straight run of attribute stores with no
+    loop over the schema or per-field lookups. With `migrations` (see
+    doc_migrations.DocumentMigrations), outdated documents are upgraded
+    before they're loaded.
+    """
+    namespace = {'_migrations': migrations}
+    load, reset, dump, save, snapshot, changed = [], [], [], [], [], []
+    for index, field in enumerate(fields):
+        default = _default_expr(field, index, namespace)
+        if field.default is None:
+            load.append(f"        self.{field.name} = get({field.name!r})")
+        elif isinstance(field.default, _MUTABLE_DEFAULTS):
+            # Only copy the default when it's needed
+            load.append(f"        self.{field.name} = get({field.name!r}) if {field.name!r} in data else {default}")
+        else:
+            load.append(f"        self.{field.name} = get({field.name!r}, {default})")
+        reset.append(f"        self.{field.name} = {default}")
+        dump.append(f"        {field.name!r}: self.{field.name},")
+        if not field.read_only:
+            save.append(f"        {field.name!r}: self.{field.name},")
+            changed.append(f"    if self.{field.name} != saved[{len(snapshot)}]:")
+            changed.append(f"        changes[{field.name!r}] = self.{field.name}")
+            snapshot.append(f"self.{field.name},")
+
+    init_source = '\n'.join([
+        'def __init__(self, data=None, partial=False):',
+        '    if data:',
+        *(['        if _migrations.outdated(data):', '            data = _migrations.upgrade(data, write_back=not partial)']
+          if migrations is not None else []),
+        '        get = data.get',
+        *load,
+        f"        self._saved = ({' '.join(snapshot)})",
+        '    else:',
+        *reset,
+        '        self._saved = None',
+        '    self._loaded(data)',
+    ])
+    to_dict_source = '\n'.join(['def to_dict(self):', '    return {', *dump, '    }'])
+    save_source = '\n'.join(['def _save_data(self):', '    return {', *save, '    }'])
+    changed_source = '\n'.join([
+        'def _changed_data(self):',
+        '    saved = self._saved',
+        '    if saved is None:',
+        '        return self._save_data()',
+        '    changes = {}',
+        *changed,
+        '    return changes',
+    ])
+
+    init = _compile('__init__', init_source, namespace)
+    init.__qualname__ = f"{model_name}.__init__"
+    to_dict = _compile('to_dict', to_dict_source, namespace)
+    to_dict.__qualname__ = f"{model_name}.to_dict"
+    to_dict.__doc__ = 'Convert to dictionary'
+    save_data = _compile('_save_data', save_source, namespace)
+    save_data.__qualname__ = f"{model_name}._save_data"
+    changed_data = _compile('_changed_data', changed_source, namespace)
+    changed_data.__qualname__ = f"{model_name}._changed_data"
+    return {'__init__': init, 'to_dict': to_dict, '_save_data': save_data, '_changed_data': changed_data}
+
+
+class SchemaMeta(type):
+    """
+    Builds schema models: Field class attributes become __slots__, and the
+    constructor and converters are generated from them (see build_converters).
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        fields = tuple(
+            value for value in namespace.values() if isinstance(value, Field)
+        )
+        for key, value in list(namespace.items()):
+            if isinstance(value, Field):
+                value.name = key
+                del namespace[key]
+        if fields:
+            namespace['__slots__'] = (tuple(namespace.get('__slots__', ())) + ('_saved',)
+                                      + tuple(field.name for field in fields))
+            namespace['fields'] = fields
+            namespace['field_names'] = tuple(field.name for field in fields)
+            namespace['_saved_fields'] = {
+                field.name: index for index, field in enumerate(field for field in fields if not field.read_only)
+            }
+            migrations = namespace.get('migrations')
+            for key, function in build_converters(name, fields, migrations).items():
+                namespace.setdefault(key, function)
+        else:
+            namespace.setdefault('__slots__', ())
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class SchemaModel(metaclass=SchemaMeta):
+    """
+    Base class for models declared as Field attributes:
+
+        class FirebaseService(SchemaModel):
+            id = Field(str, read_only=True)
+            name = Field(str)
+            is_active = Field(bool, True)
+
+    Instances are slotted (no per-instance __dict__). `Model(data)`
+    hydrates from a Firestore dict, `Model()` gives the defaults; pass
+    partial=True for a dict read with a field projection.
+
+    A hydrated instance remembers the values it was loaded with, so
+    `_changed_data()` returns only the writable fields assigned a different
+    value since (everything, for an instance that was never saved). Values
+    are compared, not watched: reassign a mutable field rather than
+    changing it in place.
+
+    Set `migrations` to a DocumentMigrations to upgrade old documents as
+    they're loaded.
+    """
+    fields: Tuple[Field, ...] = ()
+    field_names: Tuple[str, ...] = ()
+    # Writable field name -> position in the saved-values snapshot
+    _saved_fields: Dict[str, int] = {}
+    migrations = None
+
+    def _loaded(self, data):
+        """Hook run after __init__ has set the fields"""
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """Hydrate an instance from a Firestore document"""
+        return cls(data)
+
+    def _mark_saved(self, *names: str):
+        """Record the current values of `names` (default: every field) as saved"""
+        if not names:
+            self._saved = tuple(getattr(self, name) for name in self._saved_fields)
+        elif self._saved is not None:
+            saved = list(self._saved)
+            for name in names:
+                saved[self._saved_fields[name]] = getattr(self, name)
+            self._saved = tuple(saved)
+
+    @classmethod
+    def _build(cls, **values):
+        """New, unsaved instance with the given writable fields set and defaults for the rest"""
+        instance = cls({field.name: values[field.name] for field in cls.fields
+                        if not field.read_only and field.name in values})
+        instance._saved = None
+        return instance
@@ -0,0 +1,276 @@
+import itertools
+import math
+import sys
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Order fields kept as columns; read these (with `fields=`) to skip the rest
+ORDER_COLUMN_FIELDS = ['id', 'user_id', 'status', 'service_type', 'price', 'created_at']
+
+CATEGORY_COLUMNS = ('user_id', 'status', 'service_type')
+NUMBER_COLUMNS = ('price', 'created_at')
+
+_numpy = None
+
+
+def _load_numpy():
+    """numpy if it's installed, else False; imported on first use"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+def _timestamp(value) -> float:
+    return value.timestamp() if isinstance(value, datetime) else math.nan
+
+
+class _ArrayOps:
+    """Column kernels over the standard library `array` module"""
+    name = 'array'
+
+    def floats(self, values: array):
+        return values
+
+    def codes(self, values: array):
+        return values
+
+    def eq_mask(self, codes, wanted: Sequence[int]) -> bytes:
+        if codes.typecode == 'B':
+            table = bytearray(256)
+            for code in wanted:
+                table[code] = 1
+            return codes.tobytes().translate(table)
+        wanted = set(wanted)
+        return bytes(code in wanted for code in codes)
+
+    def range_mask(self, column, low: Optional[float], high: Optional[float]) -> bytes:
+        # NaN (a missing value) fails both comparisons, so it never matches
+        if low is None:
+            return bytes(value < high for value in column)
+        if high is None:
+            return bytes(value >= low for value in column)
+        return bytes(low <= value < high for value in column)
+
+    def and_masks(self, first: bytes, second: bytes) -> bytes:
+        # One big-int AND instead of a loop over the rows
+        size = len(first)
+        return (int.from_bytes(first, 'little') & int.from_bytes(second, 'little')).to_bytes(size, 'little')
+
+    def indices(self, mask: bytes) -> List[int]:
+        return list(itertools.compress(range(len(mask)), mask))
+
+    def take(self, column, indices):
+        if isinstance(column, array):
+            return array(column.typecode, map(column.__getitem__, indices))
+        return list(map(column.__getitem__, indices))
+
+    def argsort(self, column, descending: bool) -> List[int]:
+        # sorted() is stable either way; NaNs are moved to the end first
+        present = [i for i in range(len(column)) if column[i] == column[i]]
+        missing = [i for i in range(len(column)) if column[i] != column[i]]
+        return sorted(present, key=column.__getitem__, reverse=descending) + missing
+
+    def total(self, column) -> float:
+        return math.fsum(value for value in column if value == value)
+
+    def counts(self, codes) -> Dict[int, int]:
+        return Counter(codes)
+
+
+class _NumpyOps(_ArrayOps):
+    """Column kernels over numpy arrays"""
+    name = 'numpy'
+
+    def __init__(self, numpy):
+        self.np = numpy
+
+    def floats(self, values: array):
+        return self.np.frombuffer(values, dtype=self.np.float64)
+
+    def codes(self, values: array):
+        return self.np.frombuffer(values, dtype=self.np.dtype(values.typecode))
+
+    def eq_mask(self, codes, wanted: Sequence[int]):
+        return self.np.isin(codes, list(wanted))
+
+    def range_mask(self, column, low: Optional[float], high: Optional[float]):
+        mask = self.np.ones(len(column), dtype=bool)
+        if low is not None:
+            mask &= column >= low
+        if high is not None:
+            mask &= column < high
+        return mask
+
+    def and_masks(self, first, second):
+        return first & second
+
+    def indices(self, mask):
+        return self.np.flatnonzero(mask)
+
+    def take(self, column, indices):
+        if isinstance(column, list):
+            return [column[i] for i in indices]
+        return column[indices]
+
+    def argsort(self, column, descending: bool):
+        # NaNs sort last either way
+        order = self.np.argsort(-column if descending else column, kind='stable')
+        return order
+
+    def total(self, column) -> float:
+        return float(self.np.nansum(column))
+
+    def counts(self, codes) -> Dict[int, int]:
+        return {code: int(count) for code, count in enumerate(self.np.bincount(codes)) if count}
+
+
+def _ops(use_numpy: Optional[bool]):
+    numpy = _load_numpy() if use_numpy is not False else False
+    if use_numpy and not numpy:
+        raise ImportError('numpy is not installed')
+    return _NumpyOps(numpy) if numpy else _ArrayOps()
+
+
+class OrderColumns:
+    """
+    Column-oriented snapshot of many orders, for listings, exports and
+    reports over thousands of orders.
+
+    Each field in ORDER_COLUMN_FIELDS is one column instead of one
+    attribute per order object: price and created_at (as a POSIX timestamp,
+    NaN when missing) are float arrays, and user_id, status and
+    service_type are small integer codes into a list of interned category
+    strings. Filtering, sorting and totals then run over whole columns:
+    with numpy if it's installed (or use_numpy=True), otherwise with the
+    `array` module and C-level builtins. Operations return new
+    OrderColumns and leave this one unchanged.
+    """
+
+    def __init__(self, ids: List[str], columns: Dict[str, Any], categories: Dict[str, List[str]], ops):
+        self.ids = ids
+        self._columns = columns
+        self._categories = categories
+        self._ops = ops
+
+    @classmethod
+    def from_orders(cls, orders: Iterable[Dict[str, Any]], use_numpy: bool = None) -> 'OrderColumns':
+        """Build from a stream of order dicts (e.g. FirebaseOrder.iter_orders(hydrate=False)), in one pass"""
+        ids = []
+        prices = array('d')
+        created = array('d')
+        codes = {name: array('B') for name in CATEGORY_COLUMNS}
+        lookups = {name: {} for name in CATEGORY_COLUMNS}
+
+        add_id, add_price, add_created = ids.append, prices.append, created.append
+        for order in orders:
+            get = order.get
+            add_id(get('id'))
+            price = get('price')
+            add_price(math.nan if price is None else price)
+            add_created(_timestamp(get('created_at')))
+            for name in CATEGORY_COLUMNS:
+                lookup = lookups[name]
+                value = get(name)
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(lookup)
+                    if code == 256:
+                        codes[name] = array('I', codes[name])
+                codes[name].append(code)
+
+        ops = _ops(use_numpy)
+        columns = {'price': ops.floats(prices), 'created_at': ops.floats(created)}
+        categories = {}
+        for name in CATEGORY_COLUMNS:
+            columns[name] = ops.codes(codes[name])
+            categories[name] = [sys.intern(value) if isinstance(value, str) else value for value in lookups[name]]
+        return cls(ids, columns, categories, ops)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def backend(self) -> str:
+        """'numpy' or 'array'"""
+        return self._ops.name
+
+    def column(self, name: str) -> list:
+        """A column's values as a list (category columns decoded)"""
+        if name == 'id':
+            return list(self.ids)
+        values = self._columns[name]
+        if name in CATEGORY_COLUMNS:
+            return list(map(self._categories[name].__getitem__, values))
+        return [None if value != value else float(value) for value in values]
+
+    def _take(self, indices) -> 'OrderColumns':
+        ops = self._ops
+        columns = {name: ops.take(column, indices) for name, column in self._columns.items()}
+        return OrderColumns(ops.take(self.ids, indices), columns, self._categories, ops)
+
+    def filter(self, status=None, service_type=None, user_id=None,
+               created_from: datetime = None, created_before: datetime = None,
+               min_price: float = None, max_price: float = None) -> 'OrderColumns':
+        """
+        Orders matching every given condition. status, service_type and
+        user_id take one value or a list; the ranges include their lower
+        bound and exclude their upper one.
+        """
+        ops = self._ops
+        masks = []
+        for name, wanted in (('status', status), ('service_type', service_type), ('user_id', user_id)):
+            if wanted is None:
+                continue
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            categories = self._categories[name]
+            codes = [categories.index(value) for value in wanted if value in categories]
+            masks.append(ops.eq_mask(self._columns[name], codes))
+        if created_from is not None or created_before is not None:
+            masks.append(ops.range_mask(
+                self._columns['created_at'],
+                created_from.timestamp() if created_from else None,
+                created_before.timestamp() if created_before else None,
+            ))
+        if min_price is not None or max_price is not None:
+            # max_price is inclusive for prices
+            high = math.nextafter(max_price, math.inf) if max_price is not None else None
+            masks.append(ops.range_mask(self._columns['price'], min_price, high))
+        if not masks:
+            return self
+        mask = masks[0]
+        for other in masks[1:]:
+            mask = ops.and_masks(mask, other)
+        return self._take(ops.indices(mask))
+
+    def sort(self, by: str = 'created_at', descending: bool = False) -> 'OrderColumns':
+        """Orders sorted by price or created_at; orders missing the field go last"""
+        if by not in NUMBER_COLUMNS:
+            raise ValueError(f"Can only sort by {', '.join(NUMBER_COLUMNS)}, not {by!r}")
+        return self._take(self._ops.argsort(self._columns[by], descending))
+
+    def head(self, count: int) -> 'OrderColumns':
+        return self._take(range(min(count, len(self))))
+
+    def total_price(self) -> float:
+        """Sum of prices, ignoring orders without one"""
+        return self._ops.total(self._columns['price'])
+
+    def count_by(self, name: str) -> Dict[Any, int]:
+        """Number of orders per status, service_type or user_id"""
+        if name not in CATEGORY_COLUMNS:
+            raise ValueError(f"Can only count by {', '.join(CATEGORY_COLUMNS)}, not {name!r}")
+        categories = self._categories[name]
+        return {categories[code]: count for code, count in self._ops.counts(self._columns[name]).items()}
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """The orders as dicts of the column fields (created_at as a POSIX timestamp)"""
+        columns = [self.column(name) for name in ORDER_COLUMN_FIELDS]
+        return [dict(zip(ORDER_COLUMN_FIELDS, values)) for values in zip(*columns)]
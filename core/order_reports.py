@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .firebase_async import async_firebase_service
+from .models import Order
+
+REPORT_BUCKETS = ('day', 'week', 'month')
+
+# Periods shown when the report isn't given a start date
+DEFAULT_PERIODS = {'day': 30, 'week': 12, 'month': 12}
+
+# Most date buckets in one report; each is an aggregation query
+MAX_REPORT_BUCKETS = 366
+
+# Aggregation queries a report keeps in flight at once
+REPORT_CONCURRENCY = 10
+
+# Computed for every row of the report
+REPORT_AGGREGATIONS = {
+    'orders': ('count', None),
+    'revenue': ('sum', 'price'),
+    'average_price': ('avg', 'price'),
+}
+
+
+def bucket_start(moment: datetime, bucket: str) -> datetime:
+    """Start of the day, week (Monday) or month containing moment"""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        return day
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_bucket(start: datetime, bucket: str) -> datetime:
+    if bucket == 'day':
+        return start + timedelta(days=1)
+    if bucket == 'week':
+        return start + timedelta(weeks=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def default_start(end: datetime, bucket: str) -> datetime:
+    """Start of the report period covering DEFAULT_PERIODS buckets up to end"""
+    start = bucket_start(end, bucket)
+    for _ in range(DEFAULT_PERIODS[bucket] - 1):
+        start = bucket_start(start - timedelta(days=1), bucket)
+    return start
+
+
+def bucket_ranges(start: datetime, end: datetime, bucket: str,
+                  limit: int = None) -> List[Tuple[datetime, datetime]]:
+    """
+    [start, end) split into day/week/month buckets, the first and last
+    clipped to the range. Raises ValueError past `limit` buckets.
+    """
+    if bucket not in REPORT_BUCKETS:
+        raise ValueError(f"Unknown bucket {bucket!r}")
+    ranges = []
+    lower = start
+    while lower < end:
+        if limit is not None and len(ranges) >= limit:
+            raise ValueError(f"More than {limit} {bucket}s in range; choose a shorter range or a longer bucket")
+        upper = min(next_bucket(bucket_start(lower, bucket), bucket), end)
+        ranges.append((lower, upper))
+        lower = upper
+    return ranges
+
+
+def bucket_label(start: datetime, bucket: str) -> str:
+    if bucket == 'month':
+        return start.strftime('%Y-%m')
+    if bucket == 'week':
+        return f"Week of {start:%Y-%m-%d}"
+    return start.strftime('%Y-%m-%d')
+
+
+def _row(label: str, result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    row = {'label': label, 'orders': None, 'revenue': None, 'average_price': None}
+    if result is not None:
+        row.update(result)
+    return row
+
+
+async def build_order_report(start: datetime, end: datetime, bucket: str = 'month') -> Dict[str, Any]:
+    """
+    Order counts and revenue between start and end, by status, by service
+    type and by date bucket.
+
+    Every row is one Firestore aggregation query (REPORT_CONCURRENCY run
+    at a time), so the cost doesn't grow with the number of orders.
+    Statuses come from Order.STATUS_CHOICES plus any others seen by the
+    order stats counters, which also supply the service types. Raises
+    ValueError for more than MAX_REPORT_BUCKETS date buckets.
+    """
+    ranges = bucket_ranges(start, end, bucket, limit=MAX_REPORT_BUCKETS)
+    in_range = [('created_at', '>=', start), ('created_at', '<', end)]
+
+    statuses = dict(Order.STATUS_CHOICES)
+    counted = await async_firebase_service.get_order_stats() or {}
+    for status in counted.get('by_status', {}):
+        statuses.setdefault(status, status.replace('_', ' ').title())
+    service_types = sorted(counted.get('by_service_type', {}))
+    # Missing fields can't be matched by an equality filter
+    statuses.pop('unknown', None)
+    if 'unknown' in service_types:
+        service_types.remove('unknown')
+
+    rows = [('totals', 'All orders', in_range)]
+    rows += [('by_status', label, [('status', '==', status)] + in_range) for status, label in statuses.items()]
+    rows += [('by_service_type', service_type, [('service_type', '==', service_type)] + in_range)
+             for service_type in service_types]
+    rows += [('by_period', bucket_label(lower, bucket), [('created_at', '>=', lower), ('created_at', '<', upper)])
+             for lower, upper in ranges]
+
+    in_flight = asyncio.Semaphore(REPORT_CONCURRENCY)
+
+    async def aggregate(filters):
+        async with in_flight:
+            return await async_firebase_service.aggregate('orders', REPORT_AGGREGATIONS, filters=filters)
+
+    results = await asyncio.gather(*(aggregate(filters) for _, _, filters in rows))
+    report = {'start': start, 'end': end, 'bucket': bucket,
+              'totals': None, 'by_status': [], 'by_service_type': [], 'by_period': []}
+    for (section, label, _), result in zip(rows, results):
+        if section == 'totals':
+            report['totals'] = _row(label, result)
+        else:
+            report[section].append(_row(label, result))
+    return report
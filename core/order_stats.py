@@ -0,0 +1,158 @@
+import random
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .firebase_backends import Increment
+
+ORDER_STATS_COLLECTION = 'order_stats'
+GLOBAL_SCOPE = 'global'
+
+# Order fields the counters are keyed on, in key order
+ORDER_STATS_FIELDS = ['user_id', 'status', 'service_type']
+
+# Counter bucket for orders without a status or service type
+UNKNOWN = 'unknown'
+
+# (user_id, status, service_type)
+OrderStatsKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def order_stats_key(order: Dict[str, Any], previous: OrderStatsKey = None) -> OrderStatsKey:
+    """The counter key of an order, taking fields missing from `order` from `previous`"""
+    base = dict(zip(ORDER_STATS_FIELDS, previous)) if previous else {}
+    return tuple(order.get(field, base.get(field)) for field in ORDER_STATS_FIELDS)
+
+
+def user_scope(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def empty_stats() -> Dict[str, Any]:
+    return {'total': 0, 'by_status': {}, 'by_service_type': {}}
+
+
+def _bump(counts: Dict[str, int], key: Optional[str], delta: int):
+    key = key or UNKNOWN
+    counts[key] = counts.get(key, 0) + delta
+
+
+class OrderStats:
+    """
+    Materialized order counts: total, by status and by service type, for
+    all orders and for each user.
+
+    Each scope's counts are spread over `shards` documents in the
+    order_stats collection ('global:0', 'user:<id>:0', ...). A write bumps
+    one shard picked at random with Increment, so concurrent orders don't
+    contend on one document; a read sums the scope's shards, which costs
+    the same however many orders there are. Counter writes are returned
+    for the caller to commit in the same batch as the order itself.
+    """
+
+    def __init__(self, service, shards: int = 10, user_shards: int = 1):
+        self._service = service
+        self.shards = max(1, shards)
+        self.user_shards = max(1, user_shards)
+
+    def _shard_count(self, scope: str) -> int:
+        return self.shards if scope == GLOBAL_SCOPE else self.user_shards
+
+    def shard_ids(self, scope: str) -> List[str]:
+        """Ids of the documents holding a scope's counts"""
+        return [f"{scope}:{shard}" for shard in range(self._shard_count(scope))]
+
+    def read_ids(self, user_id: str = None) -> List[str]:
+        """Ids of the documents to sum for one user's counts, or for all orders"""
+        return self.shard_ids(user_scope(user_id) if user_id else GLOBAL_SCOPE)
+
+    def _scopes(self, user_id: Optional[str]) -> List[str]:
+        return [GLOBAL_SCOPE, user_scope(user_id)] if user_id else [GLOBAL_SCOPE]
+
+    def writes(self, changes: Iterable[Tuple[Optional[OrderStatsKey], Optional[OrderStatsKey]]]) -> List[tuple]:
+        """
+        Counter writes for orders changing from `before` to `after` keys
+        (None for an order being created or deleted), summed per scope.
+        """
+        deltas = {}
+        for before, after in changes:
+            for key, sign in ((before, -1), (after, 1)):
+                if key is None:
+                    continue
+                user_id, status, service_type = key
+                for scope in self._scopes(user_id):
+                    delta = deltas.setdefault(scope, empty_stats())
+                    delta['total'] += sign
+                    _bump(delta['by_status'], status, sign)
+                    _bump(delta['by_service_type'], service_type, sign)
+
+        writes = []
+        for scope, delta in deltas.items():
+            data = {}
+            if delta['total']:
+                data['total'] = Increment(delta['total'])
+            for group in ('by_status', 'by_service_type'):
+                counts = {key: Increment(count) for key, count in delta[group].items() if count}
+                if counts:
+                    data[group] = counts
+            if data:
+                doc_id = f"{scope}:{random.randrange(self._shard_count(scope))}"
+                data.update({'id': doc_id, 'scope': scope})
+                writes.append(('merge', ORDER_STATS_COLLECTION, doc_id, data))
+        return writes
+
+    def combine(self, shards: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Sum shard documents into one set of counts, leaving out zeros"""
+        stats = empty_stats()
+        for shard in shards:
+            stats['total'] += shard.get('total', 0)
+            for group in ('by_status', 'by_service_type'):
+                for key, count in (shard.get(group) or {}).items():
+                    stats[group][key] = stats[group].get(key, 0) + count
+        for group in ('by_status', 'by_service_type'):
+            stats[group] = {key: count for key, count in stats[group].items() if count}
+        return stats
+
+    def read(self, user_id: str = None) -> Dict[str, Any]:
+        """Counts for one user's orders, or for all orders"""
+        service = self._service
+        service._flush_pending(ORDER_STATS_COLLECTION)
+        # Straight from the backend: cached shards could be another process's counts behind
+        docs = service.backend.get_many(ORDER_STATS_COLLECTION, self.read_ids(user_id))
+        return self.combine(docs.values())
+
+    def rebuild(self, chunk_size: int = 500) -> Dict[str, Any]:
+        """
+        Recount every order and rewrite the counters from scratch.
+
+        Orders created or changed while this runs may be missed; run it
+        when order traffic is quiet (see the rebuild_order_stats command).
+        """
+        service = self._service
+        counts = {}
+        for order in service.iter_collection('orders', fields=ORDER_STATS_FIELDS, chunk_size=chunk_size):
+            user_id, status, service_type = order_stats_key(order)
+            for scope in self._scopes(user_id):
+                stats = counts.setdefault(scope, empty_stats())
+                stats['total'] += 1
+                _bump(stats['by_status'], status, 1)
+                _bump(stats['by_service_type'], service_type, 1)
+
+        stale = {doc['id'] for doc in service.iter_collection(ORDER_STATS_COLLECTION, fields=['scope'])}
+        with service.batch() as batch:
+            for scope, stats in counts.items():
+                doc_id = self.shard_ids(scope)[0]
+                batch.set(ORDER_STATS_COLLECTION, doc_id, dict(stats, id=doc_id, scope=scope))
+                stale.discard(doc_id)
+            for doc_id in stale:
+                # The other shards, and scopes with no orders left
+                batch.delete(ORDER_STATS_COLLECTION, doc_id)
+        return {'scopes': len(counts), 'orders': counts.get(GLOBAL_SCOPE, empty_stats())['total']}
+
+
+def build_order_stats(service) -> OrderStats:
+    """Build the counters configured by the FIREBASE_ORDER_STATS_* settings"""
+    from django.conf import settings
+    return OrderStats(
+        service,
+        shards=getattr(settings, 'FIREBASE_ORDER_STATS_SHARDS', 10),
+        user_shards=getattr(settings, 'FIREBASE_ORDER_STATS_USER_SHARDS', 1),
+    )
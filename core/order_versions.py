@@ -0,0 +1,126 @@
+import hashlib
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .firebase_cache import DjangoDocumentCache, DocumentCache
+
+# Namespaces in the version cache (not Firestore collections)
+ORDER_VERSIONS = 'order_versions'
+ORDER_OWNERS = 'order_owners'
+USER_ORDERS_VERSIONS = 'user_orders_versions'
+GENERATION = 'user_orders_generation'
+
+# Order fields a version stamp is computed from
+ORDER_VERSION_FIELDS = ['user_id', 'updated_at']
+
+
+def etag(*parts: Any) -> str:
+    """Strong ETag (quoted) for a representation identified by `parts`"""
+    digest = hashlib.md5(':'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def timestamp(value: Optional[datetime]) -> Optional[int]:
+    """Whole seconds since the epoch, for Last-Modified"""
+    return int(value.timestamp()) if value is not None else None
+
+
+class OrderVersions:
+    """
+    Version stamps for conditional GETs of orders.
+
+    An order's stamp is its updated_at; a user's listing stamp is the
+    latest updated_at of their orders and how many there are (so deleting
+    an older order changes it too). Views build ETags and Last-Modified
+    from a stamp and answer a matching If-None-Match with 304. Stamps are
+    computed from the document being read anyway for an order, or with a
+    one-document query and a count for a listing.
+
+    With a `cache` shared by every process, stamps are kept there and a
+    304 needs no Firestore read. Writes through FirebaseService drop the
+    stamps of the orders they touch and of their owners' listings. When a
+    write doesn't say whose order it was and the owner isn't remembered,
+    every listing stamp is dropped at once by moving to a new generation.
+    Without a cache (None) nothing is kept: a stamp held by one process
+    would miss writes handled by the others.
+    """
+
+    def __init__(self, cache: Optional[DocumentCache]):
+        self.cache = cache
+
+    def order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """An order's cached stamp ({'updated_at': ...}), or None"""
+        if self.cache is None:
+            return None
+        return self.cache.get(ORDER_VERSIONS, order_id)
+
+    def set_order(self, order_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Stamp an order from a document read with ORDER_VERSION_FIELDS; None if it has no updated_at"""
+        self.note_owner(order_id, data.get('user_id'))
+        if data.get('updated_at') is None:
+            return None
+        version = {'updated_at': data['updated_at']}
+        if self.cache is not None:
+            self.cache.set(ORDER_VERSIONS, order_id, version)
+        return version
+
+    def note_owner(self, order_id: str, user_id: Optional[str]):
+        """Remember whose order this is, so its writes only drop that user's listing stamp"""
+        if user_id and self.cache is not None:
+            self.cache.set(ORDER_OWNERS, order_id, {'user_id': user_id})
+
+    def _generation(self) -> str:
+        current = self.cache.get(GENERATION, GENERATION)
+        if current is None:
+            current = {'value': uuid.uuid4().hex}
+            self.cache.set(GENERATION, GENERATION, current)
+        return current['value']
+
+    def user_orders(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """A user's cached listing stamp ({'updated_at': ..., 'count': ...}), or None"""
+        if self.cache is None:
+            return None
+        version = self.cache.get(USER_ORDERS_VERSIONS, user_id)
+        if version is None or version.pop('generation', None) != self._generation():
+            return None
+        return version
+
+    def set_user_orders(self, user_id: str, updated_at: Optional[datetime], count: int) -> Dict[str, Any]:
+        version = {'updated_at': updated_at, 'count': count}
+        if self.cache is None:
+            return version
+        self.cache.set(USER_ORDERS_VERSIONS, user_id, dict(version, generation=self._generation()))
+        return version
+
+    def invalidate(self, order_id: str, data: Dict[str, Any] = None):
+        """Drop the stamps an order write makes stale; `data` is what was written, if anything"""
+        if self.cache is None:
+            return
+        owners = set()
+        if data and data.get('user_id'):
+            owners.add(data['user_id'])
+        owner = self.cache.get(ORDER_OWNERS, order_id)
+        if owner is not None:
+            owners.add(owner['user_id'])
+        self.cache.delete(ORDER_VERSIONS, order_id)
+        if not owners:
+            self.cache.set(GENERATION, GENERATION, {'value': uuid.uuid4().hex})
+        for user_id in owners:
+            self.cache.delete(USER_ORDERS_VERSIONS, user_id)
+
+    def clear(self):
+        if self.cache is not None:
+            self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats() if self.cache is not None else {}
+
+
+def build_order_versions() -> OrderVersions:
+    """Build the version stamps: kept in FIREBASE_CACHE_ALIAS when it's set, else not kept"""
+    from django.conf import settings
+    alias = getattr(settings, 'FIREBASE_CACHE_ALIAS', None)
+    if alias:
+        return OrderVersions(DjangoDocumentCache(alias, ttl=getattr(settings, 'FIREBASE_ORDER_VERSION_TTL', 30)))
+    return OrderVersions(None)
@@ -0,0 +1,212 @@
+import itertools
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, Iterator, List, Sequence, Union
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+# Objects encoded per chunk of a streamed list
+STREAM_CHUNK_SIZE = 100
+
+_orjson = None
+
+
+def _load_orjson():
+    """orjson if it's installed, else False; imported on first use"""
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson
+            _orjson = orjson
+        except ImportError:
+            _orjson = False
+    return _orjson
+
+
+def to_json_value(value: Any) -> Any:
+    """A value JSON can hold: dates as ISO 8601 strings, Decimals as strings"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _datetime(value):
+    return value.isoformat() if value is not None else None
+
+
+def _json_default(value):
+    converted = to_json_value(value)
+    if converted is value:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return converted
+
+
+def dumps(data: Any) -> bytes:
+    """Encode to compact UTF-8 JSON, with orjson when it's installed"""
+    orjson = _load_orjson()
+    if orjson:
+        return orjson.dumps(data, default=_json_default)
+    return json.dumps(data, default=_json_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def json_backend() -> str:
+    return 'orjson' if _load_orjson() else 'json'
+
+
+class Serializer:
+    """
+    Compiled encoder from an object to a JSON-ready dict.
+
+    `fields` are attribute names read from the object; `computed` maps
+    output keys to functions of the object. Given a schema `model`, fields
+    are checked against it when the serializer is built, and fields typed
+    str/int/float/bool are copied without conversion; everything else goes
+    through to_json_value. The encoder is generated once, with one line per
+    field, like the model converters in model_schema.
+    """
+
+    def __init__(self, name: str, fields: Sequence[str], model=None,
+                 computed: Dict[str, Callable[[Any], Any]] = None):
+        self.name = name
+        self.fields = list(fields)
+        self.computed = dict(computed or {})
+        types = {}
+        if model is not None:
+            types = {field.name: field.type for field in model.fields}
+            unknown = [field for field in self.fields if field not in types]
+            if unknown:
+                raise ValueError(f"{model.__name__} has no field(s) {', '.join(unknown)}")
+        self.encode = self._compile(types)
+
+    def _compile(self, types: Dict[str, type]) -> Callable[[Any], Dict[str, Any]]:
+        namespace = {'_value': to_json_value, '_datetime': _datetime}
+        lines = ['def encode(obj):', '    return {']
+        for field in self.fields:
+            field_type = types.get(field)
+            if field_type in (str, int, float, bool):
+                expr = f"obj.{field}"
+            elif field_type is datetime:
+                expr = f"_datetime(obj.{field})"
+            else:
+                expr = f"_value(obj.{field})"
+            lines.append(f"        {field!r}: {expr},")
+        for index, (key, function) in enumerate(self.computed.items()):
+            namespace[f'_computed_{index}'] = function
+            lines.append(f"        {key!r}: _value(_computed_{index}(obj)),")
+        lines.append('    }')
+        exec(compile('\n'.join(lines), f"<serializer {self.name}>", 'exec'), namespace)
+        return namespace['encode']
+
+    def many(self, objects: Iterable[Any]) -> List[Dict[str, Any]]:
+        return list(map(self.encode, objects))
+
+
+_registry: Dict[str, Serializer] = {}
+
+
+def register(name: str, fields: Sequence[str], model=None,
+             computed: Dict[str, Callable[[Any], Any]] = None) -> Serializer:
+    """Compile and register a serializer; registering a name again replaces it"""
+    serializer = Serializer(name, fields, model=model, computed=computed)
+    _registry[name] = serializer
+    return serializer
+
+
+def get_serializer(name: str) -> Serializer:
+    try:
+        return _registry[name]
+    except KeyError:
+        raise KeyError(f"No serializer registered as {name!r}") from None
+
+
+def serialize(name: str, obj: Any) -> Dict[str, Any]:
+    return get_serializer(name).encode(obj)
+
+
+def json_response(data: Any, status: int = 200) -> HttpResponse:
+    """JsonResponse, encoded with dumps()"""
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+
+async def _aiter(objects: Union[Iterable[Any], AsyncIterable[Any]], chunk_size: int):
+    if hasattr(objects, '__aiter__'):
+        async for obj in objects:
+            yield obj
+    elif isinstance(objects, (list, tuple)):
+        for obj in objects:
+            yield obj
+    else:
+        # Iterators may block on Firestore reads (e.g. iter_orders), so pull them in a worker thread
+        iterator = iter(objects)
+        next_chunk = sync_to_async(lambda: list(itertools.islice(iterator, chunk_size)))
+        while True:
+            chunk = await next_chunk()
+            if not chunk:
+                return
+            for obj in chunk:
+                yield obj
+
+
+def _list_head(envelope: Dict[str, Any], key: str) -> bytes:
+    envelope = {name: value for name, value in envelope.items() if name != key}
+    # The list goes last, so the envelope ends with '[]}' and the items go in between
+    return dumps(dict(envelope, **{key: []}))[:-2]
+
+
+def _list_items(encoded: List[Any], first: bool) -> bytes:
+    return (b'' if first else b',') + dumps(encoded)[1:-1]
+
+
+def iter_json(envelope: Dict[str, Any], key: str, objects: Iterable[Any], serializer: Serializer,
+              chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield `envelope` as JSON with `objects`, encoded by `serializer`, as a
+    list under `key`, a chunk of objects at a time.
+    """
+    yield _list_head(envelope, key)
+    iterator = iter(objects)
+    first = True
+    while True:
+        chunk = [serializer.encode(obj) for obj in itertools.islice(iterator, chunk_size)]
+        if not chunk:
+            break
+        yield _list_items(chunk, first)
+        first = False
+    yield b']}'
+
+
+async def stream_json(envelope: Dict[str, Any], key: str, objects: Union[Iterable[Any], AsyncIterable[Any]],
+                      serializer: Serializer, chunk_size: int = STREAM_CHUNK_SIZE):
+    """iter_json as an async generator, for responses served under ASGI"""
+    yield _list_head(envelope, key)
+    chunk = []
+    first = True
+    async for obj in _aiter(objects, chunk_size):
+        chunk.append(serializer.encode(obj))
+        if len(chunk) >= chunk_size:
+            yield _list_items(chunk, first)
+            chunk = []
+            first = False
+    if chunk:
+        yield _list_items(chunk, first)
+    yield b']}'
+
+
+def streaming_json_response(request, envelope: Dict[str, Any], key: str, objects: Iterable[Any],
+                            serializer: Serializer, chunk_size: int = STREAM_CHUNK_SIZE) -> StreamingHttpResponse:
+    """
+    Stream a JSON object with a long list under `key` (see iter_json).
+
+    The body matches the server: WSGI can only send a sync iterator (Django
+    would collect an async one into memory first), ASGI an async one.
+    """
+    if isinstance(request, ASGIRequest):
+        content = stream_json(envelope, key, objects, serializer, chunk_size)
+    else:
+        content = iter_json(envelope, key, objects, serializer, chunk_size)
+    return StreamingHttpResponse(content, content_type='application/json')
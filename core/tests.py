@@ -1,3 +1,576 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, override_settings
+
+from .bulk_orders import (
+    BULK_ORDER_JOBS_COLLECTION, COMPLETED, FAILED, ORDER_ITEMS_COLLECTION, RUNNING, BulkOrderJobs,
+    csv_rows, text_lines, validate_items
+)
+from .doc_migrations import SCHEMA_VERSION_FIELD, DocumentMigrations
+from .firebase_async import async_firebase_service
+from .firebase_backends import DESCENDING, DocumentNotFound, Increment, LocalBackend
+from .firebase_models import FirebaseOrder, FirebaseService, FirebaseUser, order_migrations
+from .firebase_pagination import InvalidPageToken, decode_page_token, encode_page_token, page_cursor
+from .firebase_service import firebase_service
+from .order_reports import REPORT_CONCURRENCY, build_order_report
+from .serializers import Serializer, streaming_json_response
+from .write_behind import WriteBehindQueue, decode_data, encode_data
+from .write_buffer import WriteBuffer
+from .views import order_report
+
+
+class LocalBackendMixin:
+    """Runs FirebaseService against a fresh in-memory backend"""
+
+    def setUp(self):
+        super().setUp()
+        self.backend = LocalBackend()
+        firebase_service.set_backend(self.backend)
+        # The service reports failures with print(); keep them out of the test output
+        quiet = contextlib.redirect_stdout(io.StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def store_order(self, order_id, **data):
+        """Put an order straight into the backend, past the service"""
+        now = datetime.now()
+        self.backend.set('orders', order_id, dict({
+            'id': order_id, 'user_id': 'u1', 'service_type': 'cnc_machining', 'status': 'pending',
+            'created_at': now, 'updated_at': now, SCHEMA_VERSION_FIELD: order_migrations.version,
+        }, **data))
+
+
+class LocalBackendTestCase(LocalBackendMixin, SimpleTestCase):
+    """LocalBackendMixin for tests that don't touch the database"""
+
+
+class LocalBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        self.backend = LocalBackend()
+
+    def test_update_needs_a_document(self):
+        with self.assertRaises(DocumentNotFound):
+            self.backend.update('widgets', 'w1', {'size': 1})
+
+    def test_merge_keeps_other_fields(self):
+        self.backend.set('widgets', 'w1', {'size': 1, 'meta': {'a': 1}})
+        self.backend.set('widgets', 'w1', {'meta': {'b': 2}}, merge=True)
+        self.backend.update('widgets', 'w1', {'size': Increment(2), 'meta.c': 3})
+        self.assertEqual(self.backend.get('widgets', 'w1'), {'size': 3, 'meta': {'a': 1, 'b': 2, 'c': 3}})
+
+    def test_reads_are_copies(self):
+        self.backend.set('widgets', 'w1', {'tags': ['a']})
+        self.backend.get('widgets', 'w1')['tags'].append('b')
+        self.assertEqual(self.backend.get('widgets', 'w1'), {'tags': ['a']})
+
+    def test_query_filters_orders_and_projects(self):
+        for doc_id, size in [('w1', 3), ('w2', 1), ('w3', 2)]:
+            self.backend.set('widgets', doc_id, {'id': doc_id, 'kind': 'bolt', 'size': size})
+        self.backend.set('widgets', 'w4', {'id': 'w4', 'kind': 'bolt'})
+        docs = self.backend.query('widgets', filters=[('kind', '==', 'bolt')], order_by=[('size', DESCENDING)],
+                                  limit=2, select=['id'])
+        # Ordering by a field drops documents that don't have it, as Firestore does
+        self.assertEqual(docs, [{'id': 'w1'}, {'id': 'w3'}])
+
+
+class SetBackendTests(SimpleTestCase):
+
+    @override_settings(FIREBASE_BACKEND='local')
+    def test_restoring_an_unset_backend(self):
+        # What the benchmark command does around its runs
+        firebase_service.set_backend(None)
+        previous = firebase_service._backend
+        firebase_service.set_backend(LocalBackend())
+        firebase_service.set_backend(previous)
+        self.assertFalse(firebase_service.is_initialized)
+        firebase_service.get_document('widgets', 'w1')
+        self.assertIsInstance(firebase_service._backend, LocalBackend)
+
+
+class DocumentCacheTests(LocalBackendTestCase):
+
+    def test_reads_are_cached(self):
+        firebase_service.create_document('widgets', {'name': 'a'}, doc_id='w1')
+        self.assertEqual(firebase_service.get_document('widgets', 'w1')['name'], 'a')
+        # A change that skips the service isn't seen until the entry goes
+        self.backend.update('widgets', 'w1', {'name': 'b'})
+        self.assertEqual(firebase_service.get_document('widgets', 'w1')['name'], 'a')
+
+    def test_writes_invalidate(self):
+        firebase_service.create_document('widgets', {'name': 'a'}, doc_id='w1')
+        firebase_service.get_document('widgets', 'w1')
+        firebase_service.update_document('widgets', 'w1', {'name': 'b'})
+        self.assertEqual(firebase_service.get_document('widgets', 'w1')['name'], 'b')
+        firebase_service.delete_document('widgets', 'w1')
+        self.assertIsNone(firebase_service.get_document('widgets', 'w1'))
+
+    def test_order_update_invalidates(self):
+        self.store_order('o1')
+        firebase_service.get_order('o1')
+        firebase_service.update_order('o1', {'status': 'confirmed'})
+        self.assertEqual(firebase_service.get_order('o1')['status'], 'confirmed')
+
+
+class PaginationTests(LocalBackendTestCase):
+
+    def test_token_round_trip(self):
+        cursor = [datetime(2024, 5, 1, 12, 30, 15, 250), 'order-7', 3]
+        self.assertEqual(decode_page_token(encode_page_token(cursor)), cursor)
+
+    def test_bad_tokens(self):
+        with self.assertRaises(InvalidPageToken):
+            decode_page_token('not a token')
+        with self.assertRaises(InvalidPageToken):
+            page_cursor(encode_page_token(['only-one-key']), [('created_at', 'DESCENDING'), ('id', 'DESCENDING')])
+
+    def test_ties_are_broken_by_id(self):
+        created_at = datetime(2024, 1, 1)
+        for order_id in ['o3', 'o1', 'o5', 'o2', 'o4']:
+            self.store_order(order_id, created_at=created_at)
+        seen = []
+        token = None
+        while True:
+            page = FirebaseOrder.get_user_orders_page('u1', page_size=2, page_token=token)
+            seen.extend(order.id for order in page)
+            if not page.has_next:
+                break
+            token = page.next_token
+        self.assertEqual(seen, ['o5', 'o4', 'o3', 'o2', 'o1'])
+
+
+class WriteBufferTests(LocalBackendTestCase):
+
+    def test_update_folds_into_set(self):
+        buffer = WriteBuffer()
+        buffer.set('widgets', 'w1', {'name': 'a', 'size': 1})
+        buffer.update('widgets', 'w1', {'size': 2})
+        self.assertEqual(buffer.take(), [('set', 'widgets', 'w1', {'name': 'a', 'size': 2})])
+        self.assertEqual(buffer.merged, 1)
+
+    def test_nested_updates_merge(self):
+        buffer = WriteBuffer()
+        buffer.update('widgets', 'w1', {'dims': {'w': 1}})
+        buffer.update('widgets', 'w1', {'dims.h': 2})
+        self.assertEqual(buffer.take(), [('update', 'widgets', 'w1', {'dims': {'w': 1, 'h': 2}})])
+
+    def test_set_and_delete_replace(self):
+        buffer = WriteBuffer()
+        buffer.update('widgets', 'w1', {'size': 2})
+        buffer.delete('widgets', 'w1')
+        self.assertEqual(buffer.take(), [('delete', 'widgets', 'w1', None)])
+        buffer.delete('widgets', 'w1')
+        with self.assertRaises(DocumentNotFound):
+            buffer.update('widgets', 'w1', {'size': 3})
+
+    def test_update_and_merge_kept_apart(self):
+        buffer = WriteBuffer()
+        buffer.update('widgets', 'w1', {'size': 2})
+        buffer.merge('widgets', 'w1', {'name': 'b'})
+        self.assertEqual([write[0] for write in buffer.take()], ['update', 'merge'])
+
+    def test_caller_dicts_are_copied(self):
+        buffer = WriteBuffer()
+        data = {'size': 1}
+        buffer.set('widgets', 'w1', data)
+        data['size'] = 2
+        self.assertEqual(buffer.take()[0][3], {'size': 1})
+
+    def test_buffered_writes_commit_on_exit(self):
+        with firebase_service.buffered_writes():
+            firebase_service.create_document('widgets', {'name': 'a'}, doc_id='w1')
+            firebase_service.update_document('widgets', 'w1', {'name': 'b'})
+            self.assertIsNone(self.backend.get('widgets', 'w1'))
+        self.assertEqual(self.backend.get('widgets', 'w1')['name'], 'b')
+
+    def test_buffered_writes_dropped_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with firebase_service.buffered_writes():
+                firebase_service.create_document('widgets', {'name': 'a'}, doc_id='w1')
+                raise RuntimeError('view failed')
+        self.assertIsNone(self.backend.get('widgets', 'w1'))
+
+
+@mock.patch('core.write_behind.random.uniform', return_value=0)
+class WriteBehindTests(LocalBackendTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.queue = WriteBehindQueue(os.path.join(directory.name, 'journal.sqlite3'), firebase_service,
+                                      max_attempts=3, poll_interval=0.01)
+        self.addCleanup(self.queue.close)
+
+    def test_writes_are_committed(self, uniform):
+        self.assertTrue(self.queue.enqueue('set', 'widgets', 'w1', {'name': 'a', 'at': datetime(2024, 1, 1)}))
+        self.assertTrue(self.queue.enqueue('update', 'widgets', 'w1', {'count': Increment(2)}))
+        self.assertTrue(self.queue.drain(timeout=5))
+        self.assertEqual(self.backend.get('widgets', 'w1'),
+                         {'name': 'a', 'at': datetime(2024, 1, 1), 'count': 2})
+
+    def test_failed_writes_are_retried_then_dead(self, uniform):
+        self.queue.enqueue('update', 'widgets', 'missing', {'name': 'a'})
+        self.assertTrue(self.queue.drain(timeout=5))
+        dead = self.queue.dead_writes()
+        self.assertEqual(len(dead), 1)
+        self.assertEqual((dead[0]['id'], dead[0]['attempts']), ('missing', 3))
+        self.assertIn('missing', dead[0]['error'])
+        self.assertEqual(self.queue.stats()['dead'], 1)
+
+        self.backend.set('widgets', 'missing', {'name': 'old'})
+        self.assertEqual(self.queue.requeue_dead(), 1)
+        self.assertTrue(self.queue.drain(timeout=5))
+        self.assertEqual(self.backend.get('widgets', 'missing')['name'], 'a')
+        self.assertEqual(self.queue.dead_writes(), [])
+
+    def test_full_queue_refuses(self, uniform):
+        self.queue.max_depth = 0
+        self.assertFalse(self.queue.enqueue('set', 'widgets', 'w1', {'name': 'a'}))
+        self.assertEqual(self.queue.stats()['rejected'], 1)
+
+    def test_unjournalable_data_refused(self, uniform):
+        self.assertFalse(self.queue.enqueue('set', 'widgets', 'w1', {'blob': object()}))
+
+    def test_journal_encoding(self, uniform):
+        data = {'at': datetime(2024, 1, 1, 9), 'count': Increment(1), 'tags': ['a'], 'nested': {'n': None}}
+        self.assertEqual(decode_data(encode_data(data)), data)
+
+
+class ChangedDataTests(LocalBackendTestCase):
+
+    def test_loaded_order_has_no_changes(self):
+        self.store_order('o1')
+        order = FirebaseOrder.get_by_id('o1')
+        self.assertEqual(order._changed_data(), {})
+        order.status = 'confirmed'
+        order.description = 'steel'
+        self.assertEqual(order._changed_data(), {'status': 'confirmed', 'description': 'steel'})
+
+    def test_unsaved_order_writes_everything(self):
+        order = FirebaseOrder._build(user_id='u1', service_type='cnc_machining')
+        self.assertEqual(order._changed_data(), order._save_data())
+        self.assertNotIn('id', order._changed_data())
+
+    def test_save_writes_only_changes(self):
+        self.store_order('o1')
+        order = FirebaseOrder.get_by_id('o1')
+        order.price = 12.5
+        with mock.patch.object(firebase_service, 'update_order', wraps=firebase_service.update_order) as update:
+            order.save()
+            order.save()
+        self.assertEqual(update.call_count, 1)
+        # update_order stamps updated_at on the dict it's given
+        self.assertEqual(set(update.call_args[0][1]), {'price', 'updated_at'})
+        self.assertEqual(order._changed_data(), {})
+
+
+class AsyncUserTests(LocalBackendTestCase):
+
+    def test_asave_updates_through_update_user(self):
+        user = FirebaseUser.create_user(username='asha', email='asha@example.com')
+        user.phone = '555'
+        update_user = async_firebase_service.update_user
+        with mock.patch.object(async_firebase_service, 'update_user', wraps=update_user) as update:
+            async_to_sync(user.asave)()
+        update.assert_called_once()
+        self.assertEqual(self.backend.get('users', user.id)['phone'], '555')
+
+
+class MigrationTests(LocalBackendTestCase):
+
+    def test_only_missing_fields_are_filled(self):
+        changes = order_migrations.changes({'order_type': 'bulk', 'contact_name': 'Asha'})
+        self.assertEqual(changes, {'contact_email': '', SCHEMA_VERSION_FIELD: order_migrations.version})
+
+    def test_upgraded_on_read_and_written_back(self):
+        self.store_order('o1', contact_name='Asha')
+        self.backend.update('orders', 'o1', {SCHEMA_VERSION_FIELD: 0})
+        with firebase_service.buffered_writes():
+            order = FirebaseOrder.get_by_id('o1')
+        self.assertEqual((order.contact_name, order.order_type), ('Asha', 'small'))
+        stored = self.backend.get('orders', 'o1')
+        self.assertEqual(stored[SCHEMA_VERSION_FIELD], order_migrations.version)
+        self.assertEqual(stored['contact_name'], 'Asha')
+
+    def test_projected_reads_are_not_written_back(self):
+        self.store_order('o1')
+        self.backend.update('orders', 'o1', {SCHEMA_VERSION_FIELD: 0})
+        with firebase_service.buffered_writes():
+            FirebaseOrder.get_by_id('o1', fields=['status'])
+        self.assertEqual(self.backend.get('orders', 'o1')[SCHEMA_VERSION_FIELD], 0)
+
+    def test_failures_are_recorded_and_cleared(self):
+        migrations = DocumentMigrations('widgets')
+
+        @migrations.register
+        def broken(doc):
+            raise KeyError('size')
+
+        with mock.patch.object(self.backend, 'set', wraps=self.backend.set) as write:
+            self.assertEqual(migrations.upgrade({'id': 'w1'}), {'id': 'w1'})
+        # Not written during the read; kept for the next chance
+        write.assert_not_called()
+        self.assertIsNone(migrations.recorded_failures())
+        with firebase_service.buffered_writes():
+            migrations.upgrade({'id': 'w2'})
+        self.assertEqual(migrations.failures['upgrade'], 2)
+        recorded = migrations.recorded_failures()
+        self.assertEqual((recorded['upgrade_failures'], recorded['last_doc_id']), (2, 'w2'))
+        migrations.upgrade({'id': 'w3'})
+        self.assertTrue(migrations.record_failures())
+        self.assertEqual(migrations.recorded_failures()['upgrade_failures'], 3)
+
+        firebase_service.create_document('widgets', {'name': 'a'}, doc_id='w1')
+        self.assertEqual(migrations.migrate()['failed'], 1)
+        self.assertIsNotNone(migrations.recorded_failures())
+
+        migrations._steps[0] = lambda doc: {'size': 1}
+        result = migrations.migrate()
+        self.assertEqual((result['migrated'], result['failed']), (1, 0))
+        self.assertEqual(self.backend.get('widgets', 'w1')['size'], 1)
+        self.assertIsNone(migrations.recorded_failures())
+
+
+class BulkOrderTests(LocalBackendTestCase):
+
+    def test_valid_rows_are_normalized(self):
+        items, errors = validate_items([
+            {'service_type': 'CNC Machining', 'quantity': '3', 'unit_price': '2.5'},
+            {'service_type': 'tube_laser'},
+        ], max_items=10)
+        self.assertEqual(errors, [])
+        self.assertEqual(items[0]['service_type'], 'cnc_machining')
+        self.assertEqual((items[0]['quantity'], items[0]['total_price']), (3, 7.5))
+        self.assertEqual((items[1]['quantity'], items[1]['unit_price']), (1, None))
+
+    def test_errors_are_reported_per_line(self):
+        items, errors = validate_items([
+            {'service_type': 'welding'},
+            {'service_type': 'cnc_machining', 'quantity': '0'},
+            {'service_type': 'cnc_machining', 'unit_price': '0'},
+            {'service_type': 'cnc_machining', 'unit_price': 'free'},
+            {'service_type': 'cnc_machining'},
+        ], max_items=10)
+        self.assertEqual([error['line'] for error in errors], [1, 2, 3, 4])
+        self.assertIn('positive', errors[2]['error'])
+        self.assertEqual(len(items), 1)
+
+    def test_too_many_items(self):
+        _, errors = validate_items([{'service_type': 'cnc_machining'}] * 3, max_items=2)
+        self.assertEqual(errors, [{'line': 3, 'error': 'at most 2 items per bulk order'}])
+
+    def test_csv_is_parsed_as_it_streams(self):
+        body = ('﻿Service_Type,Description,Quantity\r\n'
+                'cnc_machining,"two\nlines, quoted",2\r\n'
+                '\r\n'
+                '3d_printing,brackets é,1\r\n').encode('utf-8')
+        rows = list(csv_rows(text_lines(io.BytesIO(body), chunk_size=5)))
+        self.assertEqual(rows, [
+            {'service_type': 'cnc_machining', 'description': 'two\nlines, quoted', 'quantity': '2'},
+            {'service_type': '3d_printing', 'description': 'brackets é', 'quantity': '1'},
+        ])
+
+    def test_job_writes_items_then_order(self):
+        jobs = BulkOrderJobs(firebase_service, workers=1, batch_size=2)
+        self.addCleanup(jobs.shutdown)
+        items, _ = validate_items([{'service_type': 'cnc_machining', 'unit_price': '4'}] * 3, max_items=10)
+        job_id = jobs.submit('u1', {'user_id': 'u1', 'order_type': 'bulk'}, items)
+        jobs.shutdown()
+        job = jobs.get(job_id)
+        self.assertEqual((job['status'], job['written']), (COMPLETED, 3))
+        self.assertEqual(self.backend.get('orders', job['order_id'])['order_type'], 'bulk')
+        self.assertEqual(len(self.backend.query(ORDER_ITEMS_COLLECTION)), 3)
+
+    def test_stale_job_is_failed(self):
+        jobs = BulkOrderJobs(firebase_service, stale_after=60)
+        firebase_service.create_document(BULK_ORDER_JOBS_COLLECTION, {'status': RUNNING}, doc_id='j1')
+        self.assertEqual(jobs.get('j1')['status'], RUNNING)
+        self.backend.update(BULK_ORDER_JOBS_COLLECTION, 'j1', {'updated_at': datetime.now() - timedelta(minutes=5)})
+        self.assertEqual(jobs.get('j1')['status'], FAILED)
+        self.assertEqual(self.backend.get(BULK_ORDER_JOBS_COLLECTION, 'j1')['status'], FAILED)
+
+
+# Client tests serve static files from the apps, as in development, so they run without collectstatic
+serve_uncollected_static = override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage', WHITENOISE_AUTOREFRESH=True,
+)
+
+
+@serve_uncollected_static
+class ConditionalGetTests(LocalBackendTestCase):
+
+    def get_status(self, order_id, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(f'/order-status/{order_id}/', **headers)
+
+    def test_unchanged_order_is_not_modified(self):
+        self.store_order('o1')
+        response = self.get_status('o1')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        response = self.get_status('o1', response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_order_is_sent_again(self):
+        self.store_order('o1')
+        etag = self.get_status('o1')['ETag']
+        firebase_service.update_order('o1', {'status': 'confirmed'})
+        response = self.get_status('o1', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_write_by_another_process_is_seen(self):
+        # Without a shared cache nothing is kept between requests
+        self.store_order('o1')
+        etag = self.get_status('o1')['ETag']
+        self.backend.update('orders', 'o1', {'status': 'confirmed', 'updated_at': datetime.now() + timedelta(seconds=1)})
+        self.assertEqual(self.get_status('o1', etag).status_code, 200)
+
+    def test_missing_order(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.get_status('missing').status_code, 404)
+
+    @override_settings(FIREBASE_CACHE_ALIAS='default')
+    def test_shared_stamps_answer_without_a_read(self):
+        firebase_service._order_versions = None
+        self.addCleanup(setattr, firebase_service, '_order_versions', None)
+        self.addCleanup(caches['default'].clear)
+        self.store_order('o1')
+        etag = self.get_status('o1')['ETag']
+        with mock.patch.object(self.backend, 'get', wraps=self.backend.get) as get:
+            self.assertEqual(self.get_status('o1', etag).status_code, 304)
+        get.assert_not_called()
+        firebase_service.update_order('o1', {'status': 'confirmed'})
+        self.assertEqual(self.get_status('o1', etag).status_code, 200)
+
+
+@serve_uncollected_static
+class ServiceCatalogTests(LocalBackendTestCase):
+
+    def setUp(self):
+        super().setUp()
+        FirebaseService.bulk_create_services([
+            {'name': 'Waterjet Cutting', 'category': 'Cutting', 'service_type': 'cnc_machining',
+             'base_price': 65.0},
+            {'name': 'Anodizing', 'category': 'Finishing', 'is_active': False},
+        ])
+        firebase_service.catalog.snapshot()
+        self.reads = mock.patch.object(self.backend, 'query', wraps=self.backend.query).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def assertCatalogNotRead(self):
+        self.assertNotIn('services', [call.args[0] for call in self.reads.call_args_list])
+
+    def test_services_page_lists_the_catalog(self):
+        response = self.client.get('/services/')
+        self.assertContains(response, 'Waterjet Cutting')
+        self.assertContains(response, 'From 65.00')
+        self.assertNotContains(response, 'Anodizing')
+        self.assertCatalogNotRead()
+
+    def test_order_takes_its_service_type_from_the_catalog(self):
+        response = self.client.post('/create-order/', {'service_type': 'Waterjet Cutting'},
+                                    content_type='application/json')
+        order = firebase_service.get_order(response.json()['order_id'])
+        self.assertEqual(order['service_type'], 'cnc_machining')
+        self.assertCatalogNotRead()
+
+    def test_unknown_service_falls_back_to_the_form_labels(self):
+        response = self.client.post('/create-order/', {'service_type': 'Sheet Laser Cutting'},
+                                    content_type='application/json')
+        order = firebase_service.get_order(response.json()['order_id'])
+        self.assertEqual(order['service_type'], 'sheet_laser')
+
+
+class StreamingJsonTests(SimpleTestCase):
+
+    def setUp(self):
+        self.serializer = Serializer('widget', ['name'])
+        self.widgets = [SimpleNamespace(name=f'w{n}') for n in range(5)]
+
+    def test_wsgi_gets_a_sync_stream(self):
+        response = streaming_json_response(RequestFactory().get('/'), {'ok': True}, 'widgets',
+                                           iter(self.widgets), self.serializer, chunk_size=2)
+        self.assertFalse(response.is_async)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)),
+                         {'ok': True, 'widgets': [{'name': f'w{n}'} for n in range(5)]})
+
+    def test_asgi_gets_an_async_stream(self):
+        response = streaming_json_response(AsyncRequestFactory().get('/'), {'ok': True}, 'widgets',
+                                           self.widgets, self.serializer, chunk_size=2)
+        self.assertTrue(response.is_async)
+
+        async def body():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(async_to_sync(body)())['widgets'][4], {'name': 'w4'})
+
+    def test_empty_list(self):
+        response = streaming_json_response(RequestFactory().get('/'), {}, 'widgets', [], self.serializer)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), {'widgets': []})
+
+
+class OrderReportTests(LocalBackendTestCase):
+
+    def test_long_ranges_are_refused(self):
+        request = RequestFactory().get('/reports/orders/', {'bucket': 'day', 'start': '1990-01-01'})
+        request.user = SimpleNamespace(is_authenticated=True, is_active=True, is_staff=True)
+        with mock.patch.object(async_firebase_service, 'aggregate') as aggregate:
+            self.assertEqual(async_to_sync(order_report)(request).status_code, 400)
+        aggregate.assert_not_called()
+
+    def test_queries_in_flight_are_capped(self):
+        running = peak = 0
+
+        async def aggregate(collection, aggregations, filters=None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0)
+            running -= 1
+            return {'orders': 0, 'revenue': 0, 'average_price': None}
+
+        with mock.patch.object(async_firebase_service, 'aggregate', aggregate):
+            report = async_to_sync(build_order_report)(datetime(2024, 1, 1), datetime(2024, 12, 31), 'day')
+        self.assertEqual(len(report['by_period']), 365)
+        self.assertEqual(peak, REPORT_CONCURRENCY)
+
+
+class OrderStatsTests(LocalBackendTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.order_id = firebase_service.create_order({'user_id': 'u1', 'service_type': 'cnc_machining'})
+
+    def assertCounts(self, total, **by_status):
+        stats = firebase_service.get_order_stats()
+        self.assertEqual(stats['total'], total)
+        self.assertEqual({status: count for status, count in stats['by_status'].items() if count}, by_status)
+
+    def test_stale_previous_key_is_not_counted_twice(self):
+        counted = ('u1', 'pending', 'cnc_machining')
+        self.assertTrue(firebase_service.update_order_status(self.order_id, 'confirmed', previous=counted))
+        self.assertTrue(firebase_service.update_order_status(self.order_id, 'completed', previous=counted))
+        self.assertCounts(1, completed=1)
+
+    def test_generic_writes_keep_counts(self):
+        firebase_service.update_document('orders', self.order_id, {'status': 'confirmed'})
+        self.assertCounts(1, confirmed=1)
+        firebase_service.delete_document('orders', self.order_id)
+        self.assertCounts(0)
+        self.assertIsNone(firebase_service.get_order(self.order_id))
+
+    def test_missing_order_changes_nothing(self):
+        self.assertFalse(firebase_service.update_order_status('missing', 'confirmed'))
+        self.assertTrue(firebase_service.delete_order('missing'))
+        self.assertCounts(1, pending=1)
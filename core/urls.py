@@ -9,5 +9,10 @@ urlpatterns = [
     path('create-order/', views.create_order, name='create_order'),
     path('upload-file/', views.upload_file, name='upload_file'),
     path('my-orders/', views.my_orders, name='my_orders'),
+    path('orders/bulk/', views.create_bulk_order, name='create_bulk_order'),
+    path('orders/bulk/<str:job_id>/', views.bulk_order_job, name='bulk_order_job'),
+    path('order-status/', views.order_statuses, name='order_statuses'),
     path('order-status/<str:order_id>/', views.order_status, name='order_status'),
+    path('reports/orders/', views.order_report, name='order_report'),
+    path('reports/orders/export/', views.export_orders, name='export_orders'),
 ] 
\ No newline at end of file
@@ -1,21 +1,38 @@
-from django.shortcuts import render
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from django.contrib.auth.decorators import login_required
+from django.shortcuts import render, redirect
+from django.http import HttpResponseBadRequest
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from asgiref.sync import sync_to_async
+from .decorators import (
+    async_csrf_exempt, async_require_http_methods, async_login_required, async_staff_member_required,
+    is_authenticated, is_staff
+)
 from .firebase_models import FirebaseUser, FirebaseOrder, FirebaseService
+from .firebase_async import async_firebase_service
 from .firebase_service import firebase_service
+from .models import OrderItem
+from .bulk_orders import BULK_ORDER_FIELDS, csv_rows, text_lines, validate_items
+from .order_reports import REPORT_BUCKETS, build_order_report, default_start
+from .order_versions import ORDER_VERSION_FIELDS, etag, timestamp
+from .serializers import json_response, register, streaming_json_response
+from .write_buffer import WriteFlushError
+from accounts.firebase_link import get_firebase_user_id
 import json
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Create your views here.
 
+# Form labels to order service types, for services missing from the catalog (or seeded without a type)
+SERVICE_TYPES = {label: service_type for service_type, label in OrderItem.SERVICE_CHOICES}
+
 def home(request):
     return render(request, 'core/home.html')
 
 def services(request):
-    return render(request, 'core/services.html')
+    # Names, categories and prices come from the in-memory services catalog
+    return render(request, 'core/services.html', {'services': FirebaseService.get_all_services()})
 
 def how_it_works(request):
     return render(request, 'core/how_it_works.html')
@@ -23,9 +40,9 @@ def how_it_works(request):
 def become_vendor(request):
     return render(request, 'core/become_vendor.html')
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def create_order(request):
+@async_csrf_exempt
+@async_require_http_methods(["POST"])
+async def create_order(request):
     """Create a new order from the guided form"""
     try:
         data = json.loads(request.body)
@@ -41,40 +58,26 @@ def create_order(request):
         special_instructions = data.get('special_instructions', '')
         
         # Check authentication for bulk orders
-        if order_type == 'bulk' and not request.user.is_authenticated:
-            return JsonResponse({
+        if order_type == 'bulk' and not await is_authenticated(request):
+            return json_response({
                 'success': False, 
                 'message': 'Login required for bulk orders',
                 'require_login': True
             }, status=401)
         
-        # Get user ID if authenticated
-        user_id = None
-        if request.user.is_authenticated:
-            # Try to get Firebase user or create one
-            firebase_user = FirebaseUser.get_by_email(request.user.email)
-            if not firebase_user:
-                firebase_user = FirebaseUser.create_user(
-                    username=request.user.username,
-                    email=request.user.email,
-                    first_name=getattr(request.user, 'first_name', ''),
-                    last_name=getattr(request.user, 'last_name', '')
-                )
-            user_id = firebase_user.id
+        # Get Firebase user ID if authenticated (from the session, created on first use)
+        user_id = await sync_to_async(get_firebase_user_id)(request)
         
-        # Service type mapping
-        service_mapping = {
-            'Tube Laser Cutting': 'tube_laser',
-            'Sheet Laser Cutting': 'sheet_laser',
-            'CNC Machining': 'cnc_machining',
-            'VMC Machining': 'vmc_machining',
-            '3D Printing': '3d_printing',
-        }
+        # The service picked on the form, from the in-memory services catalog
+        service = await sync_to_async(FirebaseService.get_by_name)(service_type)
         
         # Create Firebase order
-        order = FirebaseOrder.create_order(
+        order = await FirebaseOrder.acreate_order(
             user_id=user_id,
-            service_type=service_mapping.get(service_type, 'tube_laser'),
+            service_type=(service and service.service_type) or SERVICE_TYPES.get(service_type, 'tube_laser'),
+            order_type=order_type,
+            contact_name=contact_name,
+            contact_email=contact_email,
             description=f"Order for {service_type}",
             pickup_location=pickup_location,
             delivery_location=delivery_location,
@@ -82,57 +85,62 @@ def create_order(request):
             special_instructions=special_instructions
         )
         
-        return JsonResponse({
+        return json_response({
             'success': True,
             'order_id': order.id,
             'message': 'Order created successfully'
         })
         
     except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        return json_response({'success': False, 'message': str(e)}, status=400)
+
+def _save_upload(file):
+    """Store an uploaded file under MEDIA_ROOT and return its URL"""
+    # For now, we'll store the file locally and save the path
+    # In a production environment, you'd want to upload to Firebase Storage or similar
+    import os
+    from django.conf import settings
+    
+    # Create uploads directory if it doesn't exist
+    upload_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+    os.makedirs(upload_dir, exist_ok=True)
+    
+    # Save file with unique name
+    file_extension = os.path.splitext(file.name)[1]
+    unique_filename = f"{uuid.uuid4()}{file_extension}"
+    file_path = os.path.join(upload_dir, unique_filename)
+    
+    with open(file_path, 'wb+') as destination:
+        for chunk in file.chunks():
+            destination.write(chunk)
+    
+    return f"/media/uploads/{unique_filename}"
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def upload_file(request):
+@async_csrf_exempt
+@async_require_http_methods(["POST"])
+async def upload_file(request):
     """Handle file upload for orders"""
     try:
         if 'file' not in request.FILES:
-            return JsonResponse({'success': False, 'message': 'No file provided'}, status=400)
+            return json_response({'success': False, 'message': 'No file provided'}, status=400)
         
         file = request.FILES['file']
         order_id = request.POST.get('order_id')
         
         if not order_id:
-            return JsonResponse({'success': False, 'message': 'Order ID required'}, status=400)
-        
-        # Get Firebase order
-        order = FirebaseOrder.get_by_id(order_id)
-        if not order:
-            return JsonResponse({'success': False, 'message': 'Order not found'}, status=404)
-        
-        # For now, we'll store the file locally and save the path
-        # In a production environment, you'd want to upload to Firebase Storage or similar
-        import os
-        from django.conf import settings
+            return json_response({'success': False, 'message': 'Order ID required'}, status=400)
         
-        # Create uploads directory if it doesn't exist
-        upload_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
+        # Only existence matters here, so skip reading the order's fields
+        if not await FirebaseOrder.aexists(order_id):
+            return json_response({'success': False, 'message': 'Order not found'}, status=404)
         
-        # Save file with unique name
-        file_extension = os.path.splitext(file.name)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        with open(file_path, 'wb+') as destination:
-            for chunk in file.chunks():
-                destination.write(chunk)
+        # Disk writes happen in a worker thread, off the event loop
+        file_url = await sync_to_async(_save_upload)(file)
         
         # Update order with file URL
-        file_url = f"/media/uploads/{unique_filename}"
-        firebase_service.update_document('orders', order_id, {'file_url': file_url})
+        await async_firebase_service.update_document('orders', order_id, {'file_url': file_url})
         
-        return JsonResponse({
+        return json_response({
             'success': True,
             'file_url': file_url,
             'filename': file.name,
@@ -140,39 +148,250 @@ def upload_file(request):
         })
         
     except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        return json_response({'success': False, 'message': str(e)}, status=400)
+
+def _with_validators(response, validators):
+    """Set ETag and Last-Modified; clients keep a private copy and revalidate it on every use"""
+    etag_value, last_modified = validators
+    response.headers['ETag'] = etag_value
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def _not_modified(request, validators):
+    """A 304 if the client's copy (If-None-Match / If-Modified-Since) is current, else None"""
+    response = get_conditional_response(request, etag=validators[0], last_modified=validators[1])
+    return _with_validators(response, validators) if response is not None else None
 
-@login_required
-def my_orders(request):
-    """View user's orders"""
-    # Get Firebase user
-    firebase_user = FirebaseUser.get_by_email(request.user.email)
+@async_login_required
+async def my_orders(request):
+    """View user's orders, one page at a time; answers conditional GETs from the listing's version stamp"""
+    page_token = request.GET.get('page')
+    page_size = request.GET.get('page_size')
+    
+    firebase_user_id = await sync_to_async(get_firebase_user_id)(request)
     orders = []
+    next_page_token = None
+    validators = None
     
-    if firebase_user:
-        orders = FirebaseOrder.get_user_orders(firebase_user.id)
+    if firebase_user_id:
+        version = await async_firebase_service.get_user_orders_version(firebase_user_id)
+        if version is not None:
+            validators = (
+                etag('my_orders', firebase_user_id, version['updated_at'], version['count'], page_token, page_size),
+                timestamp(version['updated_at']),
+            )
+            not_modified = _not_modified(request, validators)
+            if not_modified is not None:
+                return not_modified
+        try:
+            # Batch the write-backs of any orders upgraded while reading the
+            # page, and commit them before rendering it
+            async with async_firebase_service.buffered_writes():
+                page = await FirebaseOrder.aget_user_orders_page(
+                    firebase_user_id,
+                    page_size=page_size,
+                    page_token=page_token
+                )
+        except ValueError:
+            # Bad page token or page size: start again from the newest orders
+            return redirect('my_orders')
+        except WriteFlushError as e:
+            # The orders were read; they are upgraded again on their next read
+            print(f"Error writing back upgraded orders: {e}")
+        orders = page.items
+        next_page_token = page.next_token
     
-    return render(request, 'core/my_orders.html', {'orders': orders})
+    response = render(request, 'core/my_orders.html', {
+        'orders': orders,
+        'next_page_token': next_page_token,
+        'page_size': page_size,
+        'is_first_page': not page_token,
+    })
+    return _with_validators(response, validators) if validators is not None else response
+
+# Fields returned by order_status; only these are read from Firestore
+ORDER_STATUS_FIELDS = [
+    'service_type', 'status', 'description', 'pickup_location', 'delivery_location',
+    'contact_phone', 'created_at', 'special_instructions', 'file_url',
+]
+
+# Most order ids accepted by one batch status request
+MAX_ORDER_STATUS_IDS = 100
+
+order_status_serializer = register('order_status', ['id'] + ORDER_STATUS_FIELDS, model=FirebaseOrder)
+order_export_serializer = register('order_export', FirebaseOrder.field_names, model=FirebaseOrder)
 
-def order_status(request, order_id):
-    """Get order status by order ID"""
-    order = FirebaseOrder.get_by_id(order_id)
+def _order_status_validators(order_id, version):
+    return etag(order_status_serializer.name, order_id, version['updated_at']), timestamp(version['updated_at'])
+
+async def order_status(request, order_id):
+    """
+    Get order status by order ID. Pollers sending If-None-Match get a 304,
+    without a Firestore read when the order's version stamp is cached.
+    """
+    versions = firebase_service.order_versions
+    version = versions.order(order_id)
+    if version is not None:
+        not_modified = _not_modified(request, _order_status_validators(order_id, version))
+        if not_modified is not None:
+            return not_modified
+    
+    order_data = await async_firebase_service.get_order(order_id, fields=ORDER_STATUS_FIELDS + ORDER_VERSION_FIELDS)
+    if not order_data:
+        return json_response({'success': False, 'message': 'Order not found'}, status=404)
     
-    if not order:
-        return JsonResponse({'success': False, 'message': 'Order not found'}, status=404)
+    version = versions.set_order(order_id, order_data)
+    validators = _order_status_validators(order_id, version) if version is not None else None
+    if validators is not None:
+        not_modified = _not_modified(request, validators)
+        if not_modified is not None:
+            return not_modified
     
-    return JsonResponse({
+    order = FirebaseOrder(order_data, partial=True)
+    response = json_response({
         'success': True,
-        'order': {
-            'id': order.id,
-            'service_type': order.service_type,
-            'status': order.status,
-            'description': order.description,
-            'pickup_location': order.pickup_location,
-            'delivery_location': order.delivery_location,
-            'contact_phone': order.contact_phone,
-            'created_at': order.created_at.isoformat() if order.created_at else None,
-            'special_instructions': order.special_instructions,
-            'file_url': order.file_url
-        }
+        'order': order_status_serializer.encode(order)
     })
+    return _with_validators(response, validators) if validators is not None else response
+
+def _read_bulk_order(request):
+    """
+    Order fields, validated items and row errors of a bulk order: a JSON
+    body with an 'items' list, a CSV body (fields in the query string), or
+    a form upload with a CSV 'file'. CSV is decoded, parsed and validated
+    as it's read from the request; a JSON body is parsed whole, so it is
+    capped by DATA_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    from django.conf import settings
+    max_items = getattr(settings, 'FIREBASE_BULK_ORDER_MAX_ITEMS', 10000)
+    
+    if request.content_type == 'application/json':
+        data = json.loads(request.body)
+        if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+            raise ValueError("Expected a JSON object with an 'items' list")
+        fields, rows = data, data['items']
+    elif request.content_type == 'text/csv':
+        fields, rows = request.GET, csv_rows(text_lines(request))
+    elif 'file' in request.FILES:
+        fields, rows = request.POST, csv_rows(text_lines(request.FILES['file']))
+    else:
+        raise ValueError('Send JSON, a CSV body, or a CSV file upload')
+    
+    items, errors = validate_items(rows, max_items)
+    order_fields = {field: str(fields[field]) for field in BULK_ORDER_FIELDS if fields.get(field)}
+    return order_fields, items, errors
+
+@async_csrf_exempt
+@async_require_http_methods(["POST"])
+async def create_bulk_order(request):
+    """Submit a bulk order of many line items; it's written in the background, poll progress_url"""
+    if not await is_authenticated(request):
+        return json_response({
+            'success': False,
+            'message': 'Login required for bulk orders',
+            'require_login': True
+        }, status=401)
+    
+    try:
+        order_fields, items, errors = await sync_to_async(_read_bulk_order)(request)
+    except (ValueError, UnicodeDecodeError) as e:
+        return json_response({'success': False, 'message': str(e)}, status=400)
+    if errors:
+        return json_response({'success': False, 'message': 'Invalid line items', 'errors': errors}, status=400)
+    if not items:
+        return json_response({'success': False, 'message': 'No line items'}, status=400)
+    
+    user_id = await sync_to_async(get_firebase_user_id)(request)
+    job_id = await sync_to_async(FirebaseOrder.submit_bulk_order)(user_id, items, **order_fields)
+    return json_response({
+        'success': True,
+        'job_id': job_id,
+        'items': len(items),
+        'progress_url': reverse('bulk_order_job', args=[job_id])
+    }, status=202)
+
+async def bulk_order_job(request, job_id):
+    """Progress of a bulk order submitted by this user"""
+    job = await sync_to_async(FirebaseOrder.bulk_order_job)(job_id)
+    user_id = await sync_to_async(get_firebase_user_id)(request)
+    owner = job.get('user_id') if job else None
+    if not job or not ((owner and owner == user_id) or await is_staff(request)):
+        return json_response({'success': False, 'message': 'Job not found'}, status=404)
+    
+    return json_response({
+        'success': True,
+        'job': {field: job.get(field) for field in ('id', 'status', 'total', 'written', 'order_id', 'error')}
+    })
+
+async def order_statuses(request):
+    """Get the status of several orders at once: ?ids=a,b,c (or repeated ids=)"""
+    order_ids = [
+        order_id.strip()
+        for value in request.GET.getlist('ids')
+        for order_id in value.split(',')
+        if order_id.strip()
+    ]
+    order_ids = list(dict.fromkeys(order_ids))
+    
+    if not order_ids:
+        return json_response({'success': False, 'message': 'ids parameter required'}, status=400)
+    if len(order_ids) > MAX_ORDER_STATUS_IDS:
+        return json_response({
+            'success': False,
+            'message': f'At most {MAX_ORDER_STATUS_IDS} ids per request'
+        }, status=400)
+    
+    orders = await FirebaseOrder.aget_many(order_ids, fields=ORDER_STATUS_FIELDS)
+    
+    return json_response({
+        'success': True,
+        'orders': {order_id: order_status_serializer.encode(order) for order_id, order in orders.items()},
+        'missing': [order_id for order_id in order_ids if order_id not in orders]
+    })
+
+
+@async_staff_member_required
+async def order_report(request):
+    """Order counts and revenue by status, service type and period: ?bucket=&start=&end= (YYYY-MM-DD)"""
+    bucket = request.GET.get('bucket', 'month')
+    if bucket not in REPORT_BUCKETS:
+        return HttpResponseBadRequest(f"bucket must be one of {', '.join(REPORT_BUCKETS)}")
+    try:
+        if request.GET.get('end'):
+            # The end date is inclusive
+            end = datetime.strptime(request.GET['end'], '%Y-%m-%d') + timedelta(days=1)
+        else:
+            end = datetime.now()
+        if request.GET.get('start'):
+            start = datetime.strptime(request.GET['start'], '%Y-%m-%d')
+        else:
+            start = default_start(end, bucket)
+    except ValueError:
+        return HttpResponseBadRequest('start and end must be dates (YYYY-MM-DD)')
+    if start >= end:
+        return HttpResponseBadRequest('start must be before end')
+    
+    try:
+        report = await build_order_report(start, end, bucket)
+    except ValueError as e:
+        # Too many buckets for the range
+        return HttpResponseBadRequest(str(e))
+    return render(request, 'core/order_report.html', {
+        'report': report,
+        'buckets': REPORT_BUCKETS,
+        'last_day': end - timedelta(days=1),
+    })
+
+
+@async_staff_member_required
+async def export_orders(request):
+    """Every order as JSON, streamed in constant memory"""
+    return streaming_json_response(
+        request,
+        {'success': True, 'exported_at': datetime.now()},
+        'orders',
+        FirebaseOrder.iter_orders(),
+        order_export_serializer,
+    )
@@ -0,0 +1,319 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .firebase_backends import Increment, apply_writes
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    data TEXT,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    dead INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS journal_live ON journal (dead, seq);
+'''
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, Increment):
+        return {'__increment__': value.value}
+    raise TypeError(f"Can't journal a {type(value).__name__}")
+
+
+def _decode_value(obj: Dict[str, Any]):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    if '__increment__' in obj:
+        return Increment(obj['__increment__'])
+    return obj
+
+
+def encode_data(data: Dict[str, Any]) -> str:
+    """Journal form of a write's data: JSON, with datetimes and Increments tagged"""
+    return json.dumps(data, default=_encode_value)
+
+
+def decode_data(payload: str) -> Dict[str, Any]:
+    return json.loads(payload, object_hook=_decode_value)
+
+
+class WriteBehindQueue:
+    """
+    Durable write-behind queue for writes that needn't block a response.
+
+    Writes are appended to a SQLite journal and drained in the background:
+    a dispatcher thread claims up to `batch_size` journaled writes at a time
+    and a pool of `workers` threads commits each claim as one WriteBatch.
+    Writes to the same document are committed in the order they were
+    queued. A claim is a lease, so writes claimed by a process that died
+    are replayed once it expires, by this or any other process sharing the
+    journal. Failed writes back off and are retried; after `max_attempts`
+    they are set aside as dead for inspection.
+
+    Once `max_depth` writes are waiting, enqueue() refuses new ones and the
+    caller writes synchronously instead; so does data the journal can't
+    store as JSON.
+
+    The journal only protects writes while its file survives: it needs
+    persistent local disk, which serverless hosts don't have.
+    """
+
+    def __init__(self, path: str, service, workers: int = 2, batch_size: int = 100,
+                 max_depth: int = 10000, max_attempts: int = 5, lease: float = 60,
+                 poll_interval: float = 1.0):
+        self.path = path
+        self._service = service
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._slots = threading.Semaphore(workers)
+        self._inflight = set()
+        self._stopping = threading.Event()
+        self._dispatcher = None
+        self._executor = None
+        self.enqueued = 0
+        self.committed = 0
+        self.batches = 0
+        self.failures = 0
+        self.rejected = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    # Producer side
+
+    def enqueue(self, op: str, collection: str, doc_id: str, data: Optional[Dict[str, Any]] = None) -> bool:
+        """Journal a write; False if the queue is full and the caller should write it itself"""
+        if self.depth() >= self.max_depth:
+            self.rejected += 1
+            return False
+        try:
+            payload = encode_data(data) if data is not None else None
+        except (TypeError, ValueError) as e:
+            print(f"Error journaling write to {collection}/{doc_id}: {e}")
+            self.rejected += 1
+            return False
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO journal (op, collection, doc_id, data, enqueued_at) VALUES (?, ?, ?, ?, ?)',
+                (op, collection, doc_id, payload, time.time())
+            )
+        self.enqueued += 1
+        self.start()
+        self._notify()
+        return True
+
+    # Draining
+
+    def start(self):
+        """Start draining in the background (replaying anything left from earlier runs)"""
+        if self._dispatcher is not None:
+            return
+        with self._lock:
+            if self._dispatcher is None:
+                self._stopping.clear()
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='firebase-write-behind')
+                self._dispatcher = threading.Thread(target=self._run, name='firebase-write-behind-dispatch',
+                                                    daemon=True)
+                self._dispatcher.start()
+
+    def _notify(self):
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            try:
+                rows = self._claim()
+            except Exception as e:
+                print(f"Error claiming write-behind batch: {e}")
+                rows = []
+            if not rows:
+                self._slots.release()
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            self._executor.submit(self._commit, rows)
+
+    def _claim(self) -> List[tuple]:
+        """Lease the next batch of writes, keeping each document's writes in order"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                candidates = self._conn.execute(
+                    'SELECT seq, op, collection, doc_id, data, attempts, available_at FROM journal '
+                    'WHERE dead = 0 ORDER BY seq LIMIT ?', (self.batch_size * 4,)
+                ).fetchall()
+                blocked = set(self._inflight)
+                rows = []
+                for row in candidates:
+                    key = (row[2], row[3])
+                    if row[6] > now or key in blocked:
+                        # Leased elsewhere or backing off: later writes to the document wait too
+                        blocked.add(key)
+                        continue
+                    rows.append(row[:6])
+                    if len(rows) >= self.batch_size:
+                        break
+                if rows:
+                    self._conn.executemany('UPDATE journal SET available_at = ? WHERE seq = ?',
+                                           [(now + self.lease, row[0]) for row in rows])
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._inflight.update((row[2], row[3]) for row in rows)
+        return rows
+
+    def _commit(self, rows: List[tuple]):
+        from .firebase_service import WriteBatch
+        try:
+            writes = [(op, collection, doc_id, decode_data(data) if data is not None else None)
+                      for seq, op, collection, doc_id, data, attempts in rows]
+            results = apply_writes(WriteBatch(self._service), writes).commit()
+            error = next((result['error'] for result in results if not result['success']), None)
+            self.batches += 1
+            if error is None:
+                with self._lock:
+                    self._conn.executemany('DELETE FROM journal WHERE seq = ?', [(row[0],) for row in rows])
+                self.committed += len(rows)
+            else:
+                self._retry_later(rows, error)
+        except Exception as e:
+            print(f"Error committing write-behind batch: {e}")
+            self._retry_later(rows, str(e))
+        finally:
+            with self._lock:
+                self._inflight.difference_update((row[2], row[3]) for row in rows)
+            self._slots.release()
+            self._notify()
+
+    def _retry_later(self, rows: List[tuple], error: str):
+        self.failures += 1
+        now = time.time()
+        updates = []
+        for seq, op, collection, doc_id, data, attempts in rows:
+            attempts += 1
+            backoff = random.uniform(0, min(60, 0.5 * 2 ** attempts))
+            updates.append((attempts, now + backoff, error, int(attempts >= self.max_attempts), seq))
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE journal SET attempts = ?, available_at = ?, last_error = ?, dead = ? WHERE seq = ?',
+                updates
+            )
+
+    def drain(self, timeout: float = None) -> bool:
+        """Wait until every live write is committed; False on timeout"""
+        self.start()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.depth():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._notify()
+            with self._wakeup:
+                self._wakeup.wait(0.1)
+        return True
+
+    def close(self, timeout: float = 5):
+        """Stop draining after in-flight batches finish; journaled writes are replayed next start"""
+        if self._dispatcher is None:
+            return
+        self._stopping.set()
+        self._notify()
+        self._dispatcher.join(timeout)
+        self._executor.shutdown(wait=True)
+        self._dispatcher = None
+
+    # Dead writes
+
+    def dead_writes(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Writes that ran out of attempts, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, op, collection, doc_id, enqueued_at, attempts, last_error FROM journal '
+                'WHERE dead = 1 ORDER BY seq LIMIT ?', (limit,)
+            ).fetchall()
+        return [dict(zip(('seq', 'op', 'collection', 'id', 'enqueued_at', 'attempts', 'error'), row))
+                for row in rows]
+
+    def requeue_dead(self) -> int:
+        """Give dead writes a fresh set of attempts"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE journal SET dead = 0, attempts = 0, available_at = 0 WHERE dead = 1'
+            )
+        self._notify()
+        return cursor.rowcount
+
+    # Metrics
+
+    def depth(self) -> int:
+        """Writes waiting to be committed (not counting dead ones)"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM journal WHERE dead = 0').fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, lag and throughput counters"""
+        with self._lock:
+            depth, oldest = self._conn.execute(
+                'SELECT COUNT(*), MIN(enqueued_at) FROM journal WHERE dead = 0'
+            ).fetchone()
+            dead = self._conn.execute('SELECT COUNT(*) FROM journal WHERE dead = 1').fetchone()[0]
+        return {
+            'depth': depth,
+            'dead': dead,
+            'lag_seconds': time.time() - oldest if oldest is not None else 0.0,
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'committed': self.committed,
+            'batches': self.batches,
+            'failed_batches': self.failures,
+            'rejected': self.rejected,
+        }
+
+
+def build_write_behind(service) -> Optional[WriteBehindQueue]:
+    """Build the queue configured by the FIREBASE_WRITE_BEHIND* settings, or None if disabled"""
+    from django.conf import settings
+    if not getattr(settings, 'FIREBASE_WRITE_BEHIND', False):
+        return None
+    path = getattr(settings, 'FIREBASE_WRITE_BEHIND_PATH', None) \
+        or os.path.join(tempfile.gettempdir(), 'firebase_write_behind.sqlite3')
+    return WriteBehindQueue(
+        str(path),
+        service,
+        workers=getattr(settings, 'FIREBASE_WRITE_BEHIND_WORKERS', 2),
+        batch_size=getattr(settings, 'FIREBASE_WRITE_BEHIND_BATCH_SIZE', 100),
+        max_depth=getattr(settings, 'FIREBASE_WRITE_BEHIND_MAX_DEPTH', 10000),
+        max_attempts=getattr(settings, 'FIREBASE_WRITE_BEHIND_MAX_ATTEMPTS', 5),
+    )
@@ -0,0 +1,176 @@
+import copy
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .firebase_backends import DocumentNotFound, apply_update, merge_fields
+
+# (op, collection, doc_id, data), as queued on a WriteBatch
+BufferedWrite = Tuple[str, str, str, Optional[Dict[str, Any]]]
+
+
+class WriteFlushError(Exception):
+    """Raised when buffered writes fail to commit; `results` has one entry per write"""
+
+    def __init__(self, message: str, results: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.results = results
+
+
+def merge_update(pending: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """Fold the update `data` into the pending update `pending`, as if applied after it"""
+    for field, value in data.items():
+        # A later write to 'a' replaces anything queued under 'a.*'
+        for key in [key for key in pending if key.startswith(field + '.')]:
+            del pending[key]
+        parts = field.split('.')
+        for i in range(1, len(parts)):
+            ancestor = '.'.join(parts[:i])
+            if ancestor in pending:
+                # A write to 'a.b' after one to 'a' lands inside the queued value
+                base = pending[ancestor]
+                base = copy.deepcopy(base) if isinstance(base, dict) else {}
+                apply_update(base, {'.'.join(parts[i:]): value})
+                pending[ancestor] = base
+                break
+        else:
+            pending[field] = value
+
+
+class WriteBuffer:
+    """
+    Pending writes, merged per document.
+
+    Several writes to one document collapse into one: updates are folded
+    into an earlier set or update, merges into an earlier set or merge, and
+    a set or delete replaces whatever was queued. The only writes kept
+    apart are an update and a merge in either order, which can't be
+    combined without knowing the stored document. Nothing reaches the
+    backend until the buffer is flushed; see FirebaseService.buffered_writes.
+    """
+
+    def __init__(self):
+        # (collection, doc_id) -> [[op, data], ...], committed in order
+        self._writes: 'OrderedDict[tuple, list]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.merged = 0
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        """Queue a create/overwrite"""
+        self.add('set', collection, doc_id, data)
+
+    def update(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        """Queue a partial update"""
+        self.add('update', collection, doc_id, data)
+
+    def merge(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        """Queue a set(merge=True)"""
+        self.add('merge', collection, doc_id, data)
+
+    def delete(self, collection: str, doc_id: str):
+        """Queue a delete"""
+        self.add('delete', collection, doc_id, None)
+
+    def add(self, op: str, collection: str, doc_id: str, data: Optional[Dict[str, Any]]):
+        """Queue a write, merging it with anything already queued for the document"""
+        # Callers may keep mutating their dicts after the write "returns"
+        data = copy.deepcopy(data)
+        key = (collection, doc_id)
+        with self._lock:
+            queued = self._writes.get(key)
+            if queued is None:
+                self._writes[key] = [[op, data]]
+                return
+            pending = queued[-1]
+            if op == 'update' and pending[0] == 'delete':
+                raise DocumentNotFound(f"No document to update: {collection}/{doc_id}")
+            if (op, pending[0]) in (('update', 'merge'), ('merge', 'update')):
+                queued.append([op, data])
+                return
+            self.merged += 1
+            if op in ('set', 'delete'):
+                queued[:] = [[op, data]]
+            elif op == 'merge' and pending[0] == 'delete':
+                pending[:] = ['set', merge_fields({}, data)]
+            elif op == 'merge':
+                merge_fields(pending[1], data, partial=pending[0] == 'merge')
+            elif pending[0] == 'set':
+                apply_update(pending[1], data)
+            else:
+                merge_update(pending[1], data)
+
+    def absorb(self, writes: List[BufferedWrite]):
+        """Queue writes taken from another buffer"""
+        for op, collection, doc_id, data in writes:
+            self.add(op, collection, doc_id, data)
+
+    def _matches(self, key, collection, doc_id) -> bool:
+        return (collection is None or key[0] == collection) and (doc_id is None or key[1] == doc_id)
+
+    def has_pending(self, collection: str = None, doc_id: str = None) -> bool:
+        """Whether anything is queued (for a collection, or one document)"""
+        with self._lock:
+            if collection is not None and doc_id is not None:
+                return (collection, doc_id) in self._writes
+            return any(self._matches(key, collection, doc_id) for key in self._writes)
+
+    def take(self, collection: str = None, doc_id: str = None) -> List[BufferedWrite]:
+        """Remove and return queued writes (all, for a collection, or for one document)"""
+        with self._lock:
+            writes = []
+            for key in [key for key in self._writes if self._matches(key, collection, doc_id)]:
+                for op, data in self._writes.pop(key):
+                    writes.append((op, key[0], key[1], data))
+            return writes
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+
+class WindowedWriteBuffer(WriteBuffer):
+    """
+    Process-wide write buffer flushed `window` seconds after its first
+    queued write, so writes from back-to-back requests can merge too.
+    """
+
+    def __init__(self, window: float, flush: Callable[[], Any]):
+        super().__init__()
+        self.window = window
+        self._flush = flush
+        self._timer = None
+
+    def add(self, op, collection, doc_id, data):
+        super().add(op, collection, doc_id, data)
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self._flush()
+        except Exception as e:
+            print(f"Error flushing buffered writes: {e}")
+
+
+_current_write_buffer: ContextVar[Optional[WriteBuffer]] = ContextVar('firebase_write_buffer', default=None)
+
+
+def current_write_buffer() -> Optional[WriteBuffer]:
+    """The write buffer for the current request or block, or None outside one"""
+    return _current_write_buffer.get()
+
+
+@contextmanager
+def write_buffer_scope():
+    """Run a block with a fresh write buffer; flushing it is up to the caller"""
+    token = _current_write_buffer.set(WriteBuffer())
+    try:
+        yield _current_write_buffer.get()
+    finally:
+        _current_write_buffer.reset(token)
@@ -20,6 +20,7 @@ def initialize_services():
             'name': 'Tube Laser Cutting',
             'description': 'Precision tube laser cutting services for various materials',
             'category': 'Laser Cutting',
+            'service_type': 'tube_laser',
             'base_price': 50.0,
             'icon': '🔥'
         },
@@ -27,6 +28,7 @@ def initialize_services():
             'name': 'Sheet Laser Cutting',
             'description': 'High-quality sheet laser cutting for metal fabrication',
             'category': 'Laser Cutting',
+            'service_type': 'sheet_laser',
             'base_price': 40.0,
             'icon': '⚡'
         },
@@ -34,6 +36,7 @@ def initialize_services():
             'name': 'CNC Machining',
             'description': 'Computer-controlled machining for precise parts',
             'category': 'Machining',
+            'service_type': 'cnc_machining',
             'base_price': 75.0,
             'icon': '⚙️'
         },
@@ -41,6 +44,7 @@ def initialize_services():
             'name': 'VMC Machining',
             'description': 'Vertical machining center services',
             'category': 'Machining',
+            'service_type': 'vmc_machining',
             'base_price': 80.0,
             'icon': '🔧'
         },
@@ -48,6 +52,7 @@ def initialize_services():
             'name': '3D Printing',
             'description': 'Additive manufacturing and rapid prototyping',
             'category': '3D Printing',
+            'service_type': '3d_printing',
             'base_price': 30.0,
             'icon': '🖨️'
         }
@@ -55,12 +60,12 @@ def initialize_services():
     
     print("Initializing services in Firebase...")
     
-    for service_data in default_services:
-        try:
-            service = FirebaseService.create_service(**service_data)
-            print(f"✅ Created service: {service_data['name']} (ID: {service.id})")
-        except Exception as e:
-            print(f"❌ Error creating service {service_data['name']}: {e}")
+    results = FirebaseService.bulk_create_services(default_services)
+    for service_data, result in zip(default_services, results):
+        if result['success']:
+            print(f"✅ Created service: {service_data['name']} (ID: {result['id']})")
+        else:
+            print(f"❌ Error creating service {service_data['name']}: {result['error']}")
     
     print("Service initialization complete!")
 
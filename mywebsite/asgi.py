@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mywebsite.settings')
+# One long-lived event loop: async views can use Firestore's AsyncClient
+os.environ.setdefault('FIREBASE_ASYNC_CLIENT', 'True')
 
 application = get_asgi_application()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.firebase_request_budget_middleware',
+    'core.middleware.firebase_identity_map_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -143,6 +146,103 @@ GOOGLE_OAUTH2_REDIRECT_URI = os.environ.get('GOOGLE_OAUTH2_REDIRECT_URI', 'http:
 
 # Firebase Settings
 FIREBASE_CONFIG = os.environ.get('FIREBASE_CONFIG')
+# 'firestore', 'local' (in-process, for development and benchmarks) or a dotted backend class path
+FIREBASE_BACKEND = os.environ.get('FIREBASE_BACKEND', 'firestore')
+# Async views use Firestore's gRPC AsyncClient only under ASGI (mywebsite/asgi.py
+# turns this on). Under WSGI each async view runs in its own event loop, so they
+# share the synchronous client on a worker thread instead.
+FIREBASE_ASYNC_CLIENT = os.environ.get('FIREBASE_ASYNC_CLIENT', 'False').lower() == 'true'
+
+# Read-through document cache for FirebaseService lookups by id.
+# TTL is in seconds (0 disables it). Set FIREBASE_CACHE_ALIAS to one of CACHES
+# to share entries between processes instead of using a per-process LRU.
+FIREBASE_CACHE_TTL = int(os.environ.get('FIREBASE_CACHE_TTL', '30'))
+FIREBASE_CACHE_MAX_ENTRIES = int(os.environ.get('FIREBASE_CACHE_MAX_ENTRIES', '1024'))
+FIREBASE_CACHE_ALIAS = os.environ.get('FIREBASE_CACHE_ALIAS')
+# Expired entries are kept this much longer and served if Firestore is unavailable
+FIREBASE_CACHE_STALE_TTL = int(os.environ.get('FIREBASE_CACHE_STALE_TTL', '300'))
+
+# Firestore call resilience (seconds). Each request may spend at most
+# FIREBASE_REQUEST_BUDGET waiting on Firestore (the platform kills it at 10s),
+# and each call at most FIREBASE_CALL_TIMEOUT of that. Reads are retried
+# FIREBASE_READ_RETRIES times with jittered exponential backoff; writes never are.
+# FIREBASE_HEDGE_DELAY, when set, sends a duplicate read if the first hasn't
+# answered in that time. After FIREBASE_BREAKER_THRESHOLD consecutive failures
+# calls fail fast (serving stale cache) for FIREBASE_BREAKER_RESET seconds.
+FIREBASE_REQUEST_BUDGET = float(os.environ.get('FIREBASE_REQUEST_BUDGET', '8'))
+FIREBASE_CALL_TIMEOUT = float(os.environ.get('FIREBASE_CALL_TIMEOUT', '3'))
+FIREBASE_READ_RETRIES = int(os.environ.get('FIREBASE_READ_RETRIES', '2'))
+FIREBASE_RETRY_BASE_DELAY = float(os.environ.get('FIREBASE_RETRY_BASE_DELAY', '0.05'))
+FIREBASE_RETRY_MAX_DELAY = float(os.environ.get('FIREBASE_RETRY_MAX_DELAY', '1'))
+FIREBASE_HEDGE_DELAY = float(os.environ['FIREBASE_HEDGE_DELAY']) if os.environ.get('FIREBASE_HEDGE_DELAY') else None
+FIREBASE_HEDGE_WORKERS = int(os.environ.get('FIREBASE_HEDGE_WORKERS', '8'))
+FIREBASE_BREAKER_THRESHOLD = int(os.environ.get('FIREBASE_BREAKER_THRESHOLD', '5'))
+FIREBASE_BREAKER_RESET = float(os.environ.get('FIREBASE_BREAKER_RESET', '30'))
+
+# Writes made inside firebase_service.buffered_writes() are merged per document
+# and committed when the block exits. A non-zero FIREBASE_WRITE_COALESCE_WINDOW
+# (seconds) holds them, and any other writes, in a process-wide buffer for that
+# long so back-to-back requests merge too; leave it at 0 on serverless hosts,
+# which may freeze the process after a response.
+FIREBASE_WRITE_COALESCE_WINDOW = float(os.environ.get('FIREBASE_WRITE_COALESCE_WINDOW', '0'))
+
+# Opt-in write-behind queue for writes made with defer=True (e.g. creating the
+# Firebase user on first login). They are journaled to a local SQLite file and
+# committed in the background by FIREBASE_WRITE_BEHIND_WORKERS threads, in
+# batches of up to FIREBASE_WRITE_BEHIND_BATCH_SIZE (max 500). Past
+# FIREBASE_WRITE_BEHIND_MAX_DEPTH queued writes, callers write synchronously.
+# Inspect or drain it with `manage.py writebehind`. The journal must be on
+# persistent local disk that the app can write to; the default under the
+# temp directory is wiped on reboot. Don't enable it on serverless hosts
+# (e.g. Vercel), whose filesystem is read-only or lost between invocations.
+FIREBASE_WRITE_BEHIND = os.environ.get('FIREBASE_WRITE_BEHIND', 'False').lower() == 'true'
+FIREBASE_WRITE_BEHIND_PATH = os.environ.get('FIREBASE_WRITE_BEHIND_PATH',
+                                            os.path.join(tempfile.gettempdir(), 'firebase_write_behind.sqlite3'))
+FIREBASE_WRITE_BEHIND_WORKERS = int(os.environ.get('FIREBASE_WRITE_BEHIND_WORKERS', '2'))
+FIREBASE_WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('FIREBASE_WRITE_BEHIND_BATCH_SIZE', '100'))
+FIREBASE_WRITE_BEHIND_MAX_DEPTH = int(os.environ.get('FIREBASE_WRITE_BEHIND_MAX_DEPTH', '10000'))
+FIREBASE_WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('FIREBASE_WRITE_BEHIND_MAX_ATTEMPTS', '5'))
+
+# Order counts by status and service type (overall and per user) are kept in
+# the order_stats collection. Each global count is spread over
+# FIREBASE_ORDER_STATS_SHARDS documents (per user: _USER_SHARDS) so busy
+# periods don't contend on one document. Recount with
+# `manage.py rebuild_order_stats`.
+FIREBASE_ORDER_STATS_SHARDS = int(os.environ.get('FIREBASE_ORDER_STATS_SHARDS', '10'))
+FIREBASE_ORDER_STATS_USER_SHARDS = int(os.environ.get('FIREBASE_ORDER_STATS_USER_SHARDS', '1'))
+
+# Every Firestore query shape is listed in core/firebase_queries.py, and
+# `manage.py firestore_indexes` writes the composite indexes they need to
+# FIREBASE_INDEXES_PATH. Queries with a shape that isn't listed are logged
+# once when they run ('warn'; 'off' to skip the check).
+FIREBASE_QUERY_CHECK = os.environ.get('FIREBASE_QUERY_CHECK', 'warn')
+FIREBASE_INDEXES_PATH = os.environ.get('FIREBASE_INDEXES_PATH', str(BASE_DIR / 'firestore.indexes.json'))
+
+# Bulk orders (POST /orders/bulk/) take up to FIREBASE_BULK_ORDER_MAX_ITEMS
+# line items. They are written by FIREBASE_BULK_ORDER_WORKERS background
+# threads, FIREBASE_BULK_ORDER_BATCH_SIZE items per commit. A job that makes
+# no progress for FIREBASE_BULK_ORDER_STALE_AFTER seconds (say, because the
+# host froze the process after responding) is reported as failed.
+FIREBASE_BULK_ORDER_MAX_ITEMS = int(os.environ.get('FIREBASE_BULK_ORDER_MAX_ITEMS', '10000'))
+FIREBASE_BULK_ORDER_WORKERS = int(os.environ.get('FIREBASE_BULK_ORDER_WORKERS', '2'))
+FIREBASE_BULK_ORDER_BATCH_SIZE = int(os.environ.get('FIREBASE_BULK_ORDER_BATCH_SIZE', '500'))
+FIREBASE_BULK_ORDER_STALE_AFTER = float(os.environ.get('FIREBASE_BULK_ORDER_STALE_AFTER', '600'))
+
+# /my-orders/ and /order-status/<id>/ send ETag and Last-Modified and answer
+# If-None-Match with 304, from version stamps (each order's updated_at, and per
+# user the latest updated_at and order count). With FIREBASE_CACHE_ALIAS set the
+# stamps are cached there for FIREBASE_ORDER_VERSION_TTL seconds and a 304 needs
+# no Firestore read; otherwise they're read from Firestore on every request.
+FIREBASE_ORDER_VERSION_TTL = int(os.environ.get('FIREBASE_ORDER_VERSION_TTL', '30'))
+
+# The services catalog is served from an in-process snapshot. After
+# FIREBASE_CATALOG_TTL seconds it is revalidated against a version stamp;
+# FIREBASE_CATALOG_LISTEN also attaches a Firestore snapshot listener.
+FIREBASE_CATALOG_TTL = int(os.environ.get('FIREBASE_CATALOG_TTL', '300'))
+FIREBASE_CATALOG_LISTEN = os.environ.get('FIREBASE_CATALOG_LISTEN', 'False').lower() == 'true'
+
+# Cold-start budget checked by `manage.py coldstart` (django.setup + app imports), in milliseconds
+COLDSTART_BUDGET_MS = float(os.environ.get('COLDSTART_BUDGET_MS', '1500'))
 
 # Media files (Uploaded files)
 MEDIA_URL = '/media/'